@@ -1,9 +1,13 @@
+import importlib
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-import random
-from pages import flight_search, booking, seat_selection, passenger_info, confirmation, flight_status, check_in, manage_booking
-from utils.session import initialize_session
+from utils.session import initialize_session, get_session_state_size
+from utils.profiling import profile_block, profile_rerun, slowest_calls
+from utils.metrics import start_exporters_from_env
+from utils.alerts import get_alert_dispatcher
+from data.status_feed import get_status_feed
+
+# Reruns kept in the diagnostics history of a session
+DIAGNOSTICS_HISTORY = 20
 
 # Page configuration
 st.set_page_config(
@@ -13,6 +17,15 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Start the Prometheus exporters configured by METRICS_PORT / METRICS_TEXTFILE (once per process)
+start_exporters_from_env()
+
+# Deliver flight alerts and ingest the STATUS_FEED operations feed from startup,
+# not only once the Flight Status page is opened (once per process; the
+# dispatcher first, so it sees every change the feed applies)
+get_alert_dispatcher()
+get_status_feed()
+
 # Initialize session state
 initialize_session()
 
@@ -65,41 +78,111 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Navigation
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
-    "🔍 Search Flights", 
-    "✈️ Book Flight", 
-    "💺 Select Seats", 
-    "👤 Passenger Info", 
-    "✅ Confirmation", 
-    "📊 Flight Status", 
-    "🎫 Check-In", 
-    "📝 Manage Booking"
-])
-
-with tab1:
-    flight_search.show()
-
-with tab2:
-    booking.show()
-
-with tab3:
-    seat_selection.show()
-
-with tab4:
-    passenger_info.show()
-
-with tab5:
-    confirmation.show()
-
-with tab6:
-    flight_status.show()
-
-with tab7:
-    check_in.show()
+# Navigation: only the active page's module is imported and run on each rerun
+def lazy_page(module_name):
+    """Wrap a page module so it is imported and shown only when its page is active"""
+    def show_page():
+        with profile_block(f"pages.{module_name}.show"):
+            importlib.import_module(f"pages.{module_name}").show()
+    
+    show_page.__name__ = f"show_{module_name}"
+    return show_page
+
+# (page module, title, icon, URL path); the first is the default page. URL
+# paths differ from module names, which AppTest would otherwise resolve to
+# the module file itself
+PAGE_ROUTES = (
+    ("flight_search", "Search Flights", "🔍", "search"),
+    ("booking", "Book Flight", "✈️", "book"),
+    ("seat_selection", "Select Seats", "💺", "seats"),
+    ("passenger_info", "Passenger Info", "👤", "passengers"),
+    ("confirmation", "Confirmation", "✅", "confirmed"),
+    ("flight_status", "Flight Status", "📊", "status"),
+    ("check_in", "Check-In", "🎫", "check-in"),
+    ("manage_booking", "Manage Booking", "📝", "manage")
+)
 
-with tab8:
-    manage_booking.show()
+PAGES_BY_URL_PATH = {
+    url_path: st.Page(lazy_page(module_name), title=title, icon=icon, url_path=url_path, default=index == 0)
+    for index, (module_name, title, icon, url_path) in enumerate(PAGE_ROUTES)
+}
+PAGES = list(PAGES_BY_URL_PATH.values())
+
+page = st.navigation(PAGES, position="top")
+
+# ?page=<url path> opens a page directly, e.g. from a link or a scripted session
+requested_page = PAGES_BY_URL_PATH.get(st.query_params.get("page"))
+if requested_page is not None:
+    del st.query_params["page"]
+    if requested_page is not page:
+        st.switch_page(requested_page)
+
+# Diagnostics are opt-in per session: open the app with ?diagnostics=1
+if st.query_params.get("diagnostics") == "1":
+    st.session_state.diagnostics_enabled = True
+
+if st.session_state.get("diagnostics_enabled"):
+    size_before = get_session_state_size()['total']
+    use_cprofile = st.session_state.get("diagnostics_cprofile", False)
+    profile = None
+    try:
+        with profile_rerun(
+            page.title,
+            use_cprofile=use_cprofile,
+            trace_memory=st.session_state.get("diagnostics_tracemalloc", False)
+        ) as profile:
+            page.run()
+    finally:
+        # Recorded even when the page calls st.rerun() part-way through
+        if profile is not None:
+            summary = profile.summary()
+            summary['session_state_delta_kb'] = (get_session_state_size()['total'] - size_before) / 1024
+            history = st.session_state.setdefault('profile_history', [])
+            history.append(summary)
+            del history[:-DIAGNOSTICS_HISTORY]
+        # cProfile is captured for one rerun only; the checkbox is cleared before it is drawn again
+        if use_cprofile:
+            st.session_state.diagnostics_cprofile = False
+else:
+    page.run()
+
+def show_diagnostics():
+    """Display per-session timings and memory deltas collected by the profiling hooks"""
+    history = st.session_state.get('profile_history', [])
+    
+    with st.expander("🛠️ Diagnostics", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.checkbox("Capture cProfile on next rerun", key="diagnostics_cprofile")
+        with col2:
+            st.checkbox("Trace memory (tracemalloc, process-wide)", key="diagnostics_tracemalloc")
+        
+        if not history:
+            st.info("No reruns profiled yet")
+            return
+        
+        st.markdown(f"**Slowest calls over the last {len(history)} reruns**")
+        st.dataframe(slowest_calls(history), hide_index=True, use_container_width=True)
+        
+        st.markdown("**Recent reruns**")
+        st.dataframe([
+            {
+                "page": summary['name'],
+                "started": summary['started_at'][11:],
+                "wall_ms": summary['wall_ms'],
+                "memory_delta_kb": summary['memory_delta_kb'],
+                "memory_peak_kb": summary['memory_peak_kb'],
+                "session_state_delta_kb": summary['session_state_delta_kb']
+            }
+            for summary in reversed(history)
+        ], hide_index=True, use_container_width=True)
+        
+        if history[-1]['cprofile_report']:
+            st.markdown("**cProfile (last rerun)**")
+            st.code(history[-1]['cprofile_report'], language=None)
+
+if st.session_state.get("diagnostics_enabled"):
+    show_diagnostics()
 
 # Footer
 st.markdown("---")
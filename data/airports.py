@@ -1,9 +1,14 @@
-# Airport information for Kenya Airways destinations
+import csv
+import os
+from bisect import insort
+
+# Airports in the Kenya Airways network, in route order
 AIRPORTS = {
     "NBO": {
         "name": "Jomo Kenyatta International Airport",
         "city": "Nairobi",
         "country": "Kenya",
+        "timezone": "+3",
         "terminals": ["1A", "1B", "1C"],
         "facilities": ["Duty Free", "Restaurants", "Lounges", "WiFi", "ATM"],
         "image": "https://pixabay.com/get/g380a79f1050757a2fc8256ee8a9300119973c75c0ee0cf0107c374f4f963a99f7ded031ea55820175003d05b356bca7171d803303442003d93e89db31825b09d_1280.jpg"
@@ -12,6 +17,7 @@ AIRPORTS = {
         "name": "London Gatwick Airport",
         "city": "London",
         "country": "United Kingdom",
+        "timezone": "+0",
         "terminals": ["North", "South"],
         "facilities": ["Duty Free", "Restaurants", "Lounges", "WiFi", "ATM", "Shopping"],
         "image": "https://pixabay.com/get/gbbb9b6cfb99dff26bc7c17a14392438dd5d489e4a361969f09a8607efe530d94da9dd9dde3c87574f3e578e9c640e67c61d986029f936560735bef213a8bfc94_1280.jpg"
@@ -20,6 +26,7 @@ AIRPORTS = {
         "name": "Dubai International Airport",
         "city": "Dubai",
         "country": "UAE",
+        "timezone": "+4",
         "terminals": ["1", "2", "3"],
         "facilities": ["Duty Free", "Restaurants", "Lounges", "WiFi", "ATM", "Shopping", "Spa"],
         "image": "https://pixabay.com/get/gf37067b7e8e7dfa9059940d47e20102a00ff70125daf78c5632f21651774e966b7cfc2e451ae6b5991ad9d053b4db02c91b48af1fa148803ee56468b7af8fc8f_1280.jpg"
@@ -28,19 +35,149 @@ AIRPORTS = {
         "name": "Amsterdam Airport Schiphol",
         "city": "Amsterdam",
         "country": "Netherlands",
+        "timezone": "+1",
         "terminals": ["1", "2", "3"],
         "facilities": ["Duty Free", "Restaurants", "Lounges", "WiFi", "ATM", "Shopping"],
         "image": "https://pixabay.com/get/g6b41d6a12ff6c318e50a5db59ad9518154d8e2977fb1d303fe75d2cd204145648e0413c7015c45c4877cc61e46f71d65f356de720e7ad1c66aac5b16058d40e0_1280.jpg"
-    }
+    },
+    "CDG": {"name": "Paris Charles de Gaulle Airport", "city": "Paris", "country": "France", "timezone": "+1"},
+    "BOM": {"name": "Chhatrapati Shivaji Maharaj International Airport", "city": "Mumbai", "country": "India", "timezone": "+5:30"},
+    "BKK": {"name": "Suvarnabhumi Airport", "city": "Bangkok", "country": "Thailand", "timezone": "+7"},
+    "ACC": {"name": "Kotoka International Airport", "city": "Accra", "country": "Ghana", "timezone": "+0"},
+    "LOS": {"name": "Murtala Muhammed International Airport", "city": "Lagos", "country": "Nigeria", "timezone": "+1"},
+    "FIH": {"name": "N'djili International Airport", "city": "Kinshasa", "country": "DR Congo", "timezone": "+1"},
+    "ADD": {"name": "Addis Ababa Bole International Airport", "city": "Addis Ababa", "country": "Ethiopia", "timezone": "+3"},
+    "DAR": {"name": "Julius Nyerere International Airport", "city": "Dar es Salaam", "country": "Tanzania", "timezone": "+3"},
+    "EBB": {"name": "Entebbe International Airport", "city": "Entebbe", "country": "Uganda", "timezone": "+3"},
+    "KGL": {"name": "Kigali International Airport", "city": "Kigali", "country": "Rwanda", "timezone": "+2"},
+    "JNB": {"name": "O. R. Tambo International Airport", "city": "Johannesburg", "country": "South Africa", "timezone": "+2"},
+    "CPT": {"name": "Cape Town International Airport", "city": "Cape Town", "country": "South Africa", "timezone": "+2"},
+    "ZNZ": {"name": "Abeid Amani Karume International Airport", "city": "Zanzibar", "country": "Tanzania", "timezone": "+3"},
+    "MRU": {"name": "Sir Seewoosagur Ramgoolam International Airport", "city": "Mauritius", "country": "Mauritius", "timezone": "+4"},
+    "JFK": {"name": "John F. Kennedy International Airport", "city": "New York", "country": "USA", "timezone": "-5"},
+    "FCO": {"name": "Leonardo da Vinci-Fiumicino Airport", "city": "Rome", "country": "Italy", "timezone": "+1"}
 }
 
+# Optional CSV of the wider airport network (columns: code, name, city, country, timezone)
+AIRPORTS_FILE = os.environ.get("AIRPORTS_FILE", os.path.join(os.path.dirname(__file__), "airports.csv"))
+
+# Suggestions kept per trie node
+MAX_SUGGESTIONS = 10
+
+DEFAULT_TERMINALS = ["Main"]
+DEFAULT_FACILITIES = ["Basic Services"]
+DEFAULT_IMAGE = AIRPORTS["NBO"]["image"]
+
+
+class PrefixTrie:
+    """Prefix trie returning the best-ranked values for a typed prefix"""
+
+    def __init__(self, max_suggestions=MAX_SUGGESTIONS):
+        self.max_suggestions = max_suggestions
+        self._root = {}
+
+    def insert(self, text, value, rank):
+        """Index a value under every prefix of text"""
+        node = self._root
+        for char in text.lower():
+            node = node.setdefault(char, {})
+            suggestions = node.setdefault(None, [])
+            if (rank, value) in suggestions:
+                continue
+            insort(suggestions, (rank, value))
+            del suggestions[self.max_suggestions:]
+
+    def complete(self, prefix):
+        """Get the best-ranked values indexed under a prefix"""
+        node = self._root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+
+        values = []
+        for _, value in node.get(None, []):
+            if value not in values:
+                values.append(value)
+        return values
+
+
+class AirportRegistry:
+    """Airports indexed by IATA code, city and country, with type-ahead over city, code and name"""
+
+    def __init__(self):
+        self.by_code = {}
+        self.by_city = {}
+        self.by_country = {}
+        self._trie = PrefixTrie()
+        self._served_trie = PrefixTrie()
+
+    def add(self, code, airport, served=False):
+        """Add an airport to every index"""
+        airport = {"code": code, "served": served, **airport}
+        self.by_code[code] = airport
+        self.by_city.setdefault(airport["city"].lower(), []).append(code)
+        self.by_country.setdefault(airport["country"].lower(), []).append(code)
+
+        # Served airports rank first, then exact code matches, then name order
+        for trie in ([self._trie, self._served_trie] if served else [self._trie]):
+            trie.insert(code, code, (not served, 0, airport["city"]))
+            trie.insert(airport["city"], code, (not served, 1, airport["city"]))
+            for word in airport["name"].split():
+                trie.insert(word, code, (not served, 2, airport["city"]))
+
+    def get(self, code):
+        """Get an airport by IATA code"""
+        return self.by_code.get(code.upper())
+
+    def in_city(self, city):
+        """Get every airport serving a city"""
+        return [self.by_code[code] for code in self.by_city.get(city.lower(), [])]
+
+    def in_country(self, country):
+        """Get every airport in a country"""
+        return [self.by_code[code] for code in self.by_country.get(country.lower(), [])]
+
+    def complete(self, prefix, served_only=False):
+        """Suggest airports whose city, code or name starts with prefix"""
+        trie = self._served_trie if served_only else self._trie
+        return [self.by_code[code] for code in trie.complete(prefix.strip())]
+
+
+def load_airport_registry(path=AIRPORTS_FILE):
+    """Build the registry from the network airports plus the optional airports file"""
+    registry = AirportRegistry()
+    for code, airport in AIRPORTS.items():
+        registry.add(code, airport, served=True)
+
+    if path and os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as airports_file:
+            for row in csv.DictReader(airports_file):
+                code = row["code"].strip().upper()
+                if code and code not in registry.by_code:
+                    registry.add(code, {
+                        "name": row["name"],
+                        "city": row["city"],
+                        "country": row["country"],
+                        "timezone": row.get("timezone") or "+0"
+                    })
+
+    return registry
+
+
+# Loaded once per process and shared read-only
+AIRPORT_REGISTRY = load_airport_registry()
+
+
 def get_airport_info(airport_code):
     """Get detailed airport information"""
-    return AIRPORTS.get(airport_code, {
-        "name": f"Airport {airport_code}",
-        "city": "Unknown",
-        "country": "Unknown",
-        "terminals": ["Main"],
-        "facilities": ["Basic Services"],
-        "image": "https://pixabay.com/get/g380a79f1050757a2fc8256ee8a9300119973c75c0ee0cf0107c374f4f963a99f7ded031ea55820175003d05b356bca7171d803303442003d93e89db31825b09d_1280.jpg"
-    })
+    airport = AIRPORT_REGISTRY.get(airport_code)
+    if airport is None:
+        airport = {"code": airport_code, "name": f"Airport {airport_code}", "city": "Unknown", "country": "Unknown"}
+
+    return {
+        "terminals": DEFAULT_TERMINALS,
+        "facilities": DEFAULT_FACILITIES,
+        "image": DEFAULT_IMAGE,
+        **airport
+    }
@@ -0,0 +1,185 @@
+import threading
+from dataclasses import replace
+from datetime import datetime
+
+from data.models import AncillaryItem
+
+# Bookings shared by every session and the service API, keyed by booking reference
+_bookings_lock = threading.Lock()
+_bookings = {}
+
+# Booking references holding each flight key
+_bookings_by_flight = {}
+
+# (booking reference, line) of ancillary lines already reversed
+_reversed_lines = set()
+
+
+def save_booking(booking):
+    """Add a booking to the store"""
+    with _bookings_lock:
+        if booking.booking_reference in _bookings:
+            raise ValueError(f"Booking {booking.booking_reference} already exists")
+        _bookings[booking.booking_reference] = booking
+        for key in booking.flights:
+            _bookings_by_flight.setdefault(tuple(key), set()).add(booking.booking_reference)
+    return booking
+
+
+def get_booking(booking_reference):
+    """Get a booking by reference, or None"""
+    with _bookings_lock:
+        return _bookings.get(booking_reference.strip().upper())
+
+
+def bookings_on_flight(key):
+    """Bookings holding a flight key, in creation order"""
+    with _bookings_lock:
+        bookings = [_bookings[reference] for reference in _bookings_by_flight.get(tuple(key), ())]
+    return sorted(bookings, key=lambda booking: booking.created_at)
+
+
+def rebook_flights(changes, disrupted=()):
+    """Swap flights on many bookings in one step
+
+    ``changes`` maps booking reference to (old flight key, replacement keys);
+    each booking's old flight is replaced in place and its status set to
+    "Rebooked". Bookings in ``disrupted`` are marked "Disrupted". Every
+    booking is re-checked under the lock: one that has been cancelled or no
+    longer holds the old flight (e.g. moved by another run) is left alone.
+    Returns the references that were left alone.
+    """
+    skipped = []
+    with _bookings_lock:
+        for reference, (old_key, new_keys) in changes.items():
+            booking = _bookings[reference]
+            flights = [tuple(key) for key in booking.flights]
+            if booking.status == "Cancelled" or tuple(old_key) not in flights:
+                skipped.append(reference)
+                continue
+            position = flights.index(tuple(old_key))
+            booking.flights[position:position + 1] = [tuple(key) for key in new_keys]
+            booking.status = "Rebooked"
+            # Seats on tickets were for the first flight, which no longer exists
+            if position == 0:
+                for passenger in booking.passengers:
+                    passenger.seat = None
+                booking.tickets = [replace(ticket, seat="Not assigned") for ticket in booking.tickets]
+            _bookings_by_flight.get(tuple(old_key), set()).discard(reference)
+            for key in new_keys:
+                _bookings_by_flight.setdefault(tuple(key), set()).add(reference)
+
+        for reference, old_key in disrupted:
+            booking = _bookings[reference]
+            if booking.status == "Cancelled" or tuple(old_key) not in [tuple(key) for key in booking.flights]:
+                skipped.append(reference)
+                continue
+            booking.status = "Disrupted"
+
+    return skipped
+
+
+def check_in_booking(booking_reference, seats, statuses):
+    """Seat passengers and mark a booking "Checked In" in one step, if its status allows
+
+    ``seats`` maps passenger index to seat id; each passenger's ticket gets
+    the seat too. Nothing changes unless the booking's status is in
+    ``statuses``. Returns the status the booking had, or None if it does not
+    exist.
+    """
+    with _bookings_lock:
+        booking = _bookings.get(booking_reference.strip().upper())
+        if booking is None or booking.status not in statuses:
+            return booking and booking.status
+        for index, seat_id in seats.items():
+            booking.passengers[index].seat = seat_id
+            if index < len(booking.tickets):
+                booking.tickets[index] = replace(booking.tickets[index], seat=seat_id)
+        previous, booking.status = booking.status, "Checked In"
+        return previous
+
+
+def set_booking_status(booking_reference, status):
+    """Change a booking's status; returns the booking, or None if it does not exist"""
+    with _bookings_lock:
+        booking = _bookings.get(booking_reference.strip().upper())
+        if booking is not None:
+            booking.status = status
+        return booking
+
+
+def cancel_booking(booking_reference, refund_amount):
+    """Mark a booking cancelled with its refund atomically; returns the previous status, or None if it does not exist
+
+    A booking that is already cancelled keeps its original refund.
+    """
+    with _bookings_lock:
+        booking = _bookings.get(booking_reference.strip().upper())
+        if booking is None or booking.status == "Cancelled":
+            return booking and booking.status
+        previous, booking.status = booking.status, "Cancelled"
+        booking.refund_amount = refund_amount
+        if refund_amount:
+            booking.payment_status = "Refunded"
+        return previous
+
+
+def post_ancillaries(orders):
+    """Append priced lines to many bookings' ancillary ledgers in one step
+
+    ``orders`` maps booking reference to (code, description, quantity,
+    amount, passenger index) tuples. Each booking's lines are appended
+    together and its totals moved by their sum, so earlier lines are never
+    re-priced. Returns ({reference: new AncillaryItems}, {reference:
+    reason}); bookings that do not exist or are cancelled are left unchanged.
+    """
+    posted, rejected = {}, {}
+    created_at = datetime.now().isoformat()
+    with _bookings_lock:
+        for reference, lines in orders.items():
+            booking = _bookings.get(reference.strip().upper())
+            if booking is None:
+                rejected[reference] = "Booking not found"
+                continue
+            if booking.status == "Cancelled":
+                rejected[reference] = "Booking is cancelled"
+                continue
+            items = [
+                AncillaryItem(line=len(booking.ancillaries) + offset, code=code, description=description,
+                              quantity=quantity, amount=amount, created_at=created_at, passenger_index=passenger_index)
+                for offset, (code, description, quantity, amount, passenger_index) in enumerate(lines, 1)
+            ]
+            _append_ancillaries(booking, items)
+            posted[booking.booking_reference] = items
+    return posted, rejected
+
+
+def reverse_ancillary(booking_reference, line):
+    """Append a line cancelling an earlier ancillary line; returns it
+
+    Raises KeyError if the booking or line does not exist and ValueError if
+    the line is itself a reversal or was already reversed.
+    """
+    with _bookings_lock:
+        booking = _bookings[booking_reference.strip().upper()]
+        if not 1 <= line <= len(booking.ancillaries):
+            raise KeyError(line)
+        original = booking.ancillaries[line - 1]
+        if original.reverses is not None:
+            raise ValueError(f"Line {line} is a removal and cannot be reversed")
+        if (booking.booking_reference, line) in _reversed_lines:
+            raise ValueError(f"Line {line} was already removed")
+        item = AncillaryItem(line=len(booking.ancillaries) + 1, code=original.code, description=original.description,
+                             quantity=-original.quantity, amount=-original.amount, created_at=datetime.now().isoformat(),
+                             passenger_index=original.passenger_index, reverses=line)
+        _append_ancillaries(booking, [item])
+        _reversed_lines.add((booking.booking_reference, line))
+        return item
+
+
+def _append_ancillaries(booking, items):
+    """Add lines to a booking's ledger and move its totals by their sum (caller holds the lock)"""
+    amount = sum(item.amount for item in items)
+    booking.ancillaries.extend(items)
+    booking.ancillary_total += amount
+    booking.total_price += amount
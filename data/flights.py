@@ -1,31 +1,25 @@
 import pandas as pd
 from datetime import datetime, timedelta
 import random
+import time
+from data.airports import AIRPORTS
+from data.inventory import find_route, flight_key, iter_bookable, register_route, route_keys
+from data.models import Flight
+from data.schedule_time import compute_schedule, format_local_time, format_local_times
+from data.timetable import get_timetable
+from utils.metrics import REGISTRY
+from utils.profiling import profiled
 
-# Real Kenya Airways destinations based on web data
+# Kenya Airways destinations by city, derived from the airport registry
 DESTINATIONS = {
-    "Nairobi": {"code": "NBO", "country": "Kenya", "timezone": "+3"},
-    "London": {"code": "LGW", "country": "United Kingdom", "timezone": "+0"},
-    "Dubai": {"code": "DXB", "country": "UAE", "timezone": "+4"},
-    "Amsterdam": {"code": "AMS", "country": "Netherlands", "timezone": "+1"},
-    "Paris": {"code": "CDG", "country": "France", "timezone": "+1"},
-    "Mumbai": {"code": "BOM", "country": "India", "timezone": "+5:30"},
-    "Bangkok": {"code": "BKK", "country": "Thailand", "timezone": "+7"},
-    "Accra": {"code": "ACC", "country": "Ghana", "timezone": "+0"},
-    "Lagos": {"code": "LOS", "country": "Nigeria", "timezone": "+1"},
-    "Kinshasa": {"code": "FIH", "country": "DR Congo", "timezone": "+1"},
-    "Addis Ababa": {"code": "ADD", "country": "Ethiopia", "timezone": "+3"},
-    "Dar es Salaam": {"code": "DAR", "country": "Tanzania", "timezone": "+3"},
-    "Entebbe": {"code": "EBB", "country": "Uganda", "timezone": "+3"},
-    "Kigali": {"code": "KGL", "country": "Rwanda", "timezone": "+2"},
-    "Johannesburg": {"code": "JNB", "country": "South Africa", "timezone": "+2"},
-    "Cape Town": {"code": "CPT", "country": "South Africa", "timezone": "+2"},
-    "Zanzibar": {"code": "ZNZ", "country": "Tanzania", "timezone": "+3"},
-    "Mauritius": {"code": "MRU", "country": "Mauritius", "timezone": "+4"},
-    "New York": {"code": "JFK", "country": "USA", "timezone": "-5"},
-    "Rome": {"code": "FCO", "country": "Italy", "timezone": "+1"}
+    airport["city"]: {"code": code, "country": airport["country"], "timezone": airport["timezone"]}
+    for code, airport in AIRPORTS.items()
 }
 
+# Served cities in route order for pickers, and each airport's route position
+DESTINATION_CITIES = tuple(DESTINATIONS)
+ROUTE_CODE_INDEX = {info["code"]: index for index, info in enumerate(DESTINATIONS.values())}
+
 # Aircraft types used by Kenya Airways
 AIRCRAFT_TYPES = [
     {"model": "Boeing 787-8", "seats": {"Economy": 234, "Business": 30}, "image": "https://pixabay.com/get/g3fcc992fd3fd5df6bbe2b6c0ea6a5e090f82daef28b6d4859ef3f7c80485dbfe00c18eff5b01ade86bd1a8da8e5329f29001aeca7c96d137cb9ca92cf88cca73_1280.jpg"},
@@ -33,11 +27,16 @@ AIRCRAFT_TYPES = [
     {"model": "Embraer E190", "seats": {"Economy": 96, "Business": 8}, "image": "https://pixabay.com/get/g404341642894aba20f2a1a220817f8b86da0d86a9624486385aea5cdf196fd8e705ba27c88bdc08afe42739f5c62297a49870e5c4fdd8134f3cab27d8302849d_1280.jpg"},
     {"model": "Boeing 777-300ER", "seats": {"Economy": 300, "Business": 42, "First": 8}, "image": "https://pixabay.com/get/g152bc36c65f5a8680a2fd92717dc6f1e55b04981668dfd682157e6f8a41ba66e984d734740942c5bfa813dbd4734da879f45c446ff5a3084b03480e404026876_1280.jpg"}
 ]
+AIRCRAFT_BY_MODEL = {aircraft["model"]: aircraft for aircraft in AIRCRAFT_TYPES}
 
+@profiled()
 def generate_flight_data(origin, destination, departure_date, trip_type="return", return_date=None):
     """Generate realistic flight data for Kenya Airways"""
     flights = []
     
+    # Same route and date always yields the same flights so they can be referenced by key
+    rng = random.Random(f"{origin}-{destination}-{departure_date}")
+    
     # Base prices from real Kenya Airways data
     base_prices = {
         ("NBO", "LGW"): 945, ("NBO", "DXB"): 650, ("NBO", "AMS"): 890,
@@ -53,14 +52,32 @@ def generate_flight_data(origin, destination, departure_date, trip_type="return"
     # Get base price or calculate based on distance
     base_price = base_prices.get((origin_code, dest_code)) or base_prices.get((dest_code, origin_code)) or 600
     
-    # Generate multiple flight options for the day
-    departure_times = ["06:30", "10:45", "14:20", "18:30", "22:15"]
+    # Departures come from the published timetable when one is loaded
+    timetable = get_timetable()
+    if timetable is not None:
+        departures = timetable.departures_on(origin_code, dest_code, departure_date)
+        flight_numbers = departures["flight_number"]
+        departure_times = departures["departure"].tolist()
+        aircraft_choices = [AIRCRAFT_BY_MODEL.get(model) or rng.choice(AIRCRAFT_TYPES) for model in departures["aircraft"]]
+        durations = departures["duration"].tolist()
+    else:
+        # Generate multiple flight options for the day
+        departure_times = ["06:30", "10:45", "14:20", "18:30", "22:15"][:3]  # Limit to 3 flights per day
+        flight_numbers = [route_flight_number(origin_code, dest_code, i) for i in range(len(departure_times))]
+        aircraft_choices = [rng.choice(AIRCRAFT_TYPES) for _ in departure_times]
+        durations = [rng.randint(180, 840) for _ in departure_times]  # 3-14 hours
     
-    for i, dep_time in enumerate(departure_times[:3]):  # Limit to 3 flights per day
-        aircraft = random.choice(AIRCRAFT_TYPES)
-        
-        # Calculate flight duration (simplified)
-        duration = random.randint(180, 840)  # 3-14 hours
+    # Local arrival times for every option in one pass
+    schedule = compute_schedule(
+        [departure_date] * len(departure_times), departure_times, durations,
+        [origin_code] * len(departure_times), [dest_code] * len(departure_times)
+    )
+    departure_times = format_local_times(schedule["departure_local"])
+    arrival_times = format_local_times(schedule["arrival_local"])
+    
+    for i, dep_time in enumerate(departure_times):
+        aircraft = aircraft_choices[i]
+        duration = durations[i]
         
         # Price variations
         price_multiplier = 1 + (i * 0.15)  # Later flights slightly more expensive
@@ -68,77 +85,103 @@ def generate_flight_data(origin, destination, departure_date, trip_type="return"
         business_price = int(economy_price * 2.5)
         first_price = int(economy_price * 4) if "First" in aircraft["seats"] else None
         
-        flight = {
-            "flight_number": f"KQ{random.randint(100, 999)}",
-            "origin": origin,
-            "destination": destination,
-            "origin_code": origin_code,
-            "destination_code": dest_code,
-            "departure_date": departure_date,
-            "departure_time": dep_time,
-            "arrival_time": calculate_arrival_time(dep_time, duration),
-            "duration": f"{duration//60}h {duration%60}m",
-            "aircraft": aircraft["model"],
-            "aircraft_image": aircraft["image"],
-            "prices": {
+        flight = Flight(
+            flight_number=flight_numbers[i],
+            origin=origin,
+            destination=destination,
+            origin_code=origin_code,
+            destination_code=dest_code,
+            departure_date=departure_date,
+            departure_time=dep_time,
+            arrival_time=arrival_times[i],
+            duration=f"{duration//60}h {duration%60}m",
+            aircraft=aircraft["model"],
+            aircraft_image=aircraft["image"],
+            prices={
                 "Economy": economy_price,
                 "Business": business_price,
                 "First": first_price
             },
-            "seats_available": {
-                "Economy": random.randint(20, aircraft["seats"]["Economy"]),
-                "Business": random.randint(2, aircraft["seats"]["Business"]),
-                "First": random.randint(1, aircraft["seats"].get("First", 0)) if first_price else 0
+            seats_available={
+                "Economy": rng.randint(20, aircraft["seats"]["Economy"]),
+                "Business": rng.randint(2, aircraft["seats"]["Business"]),
+                "First": rng.randint(1, aircraft["seats"].get("First", 0)) if first_price else 0
             },
-            "stops": 0 if i == 0 else random.choice([0, 1]),  # First flight direct, others may have stops
-            "meal_service": True,
-            "wifi_available": True,
-            "entertainment": True
-        }
+            stops=0 if i == 0 or timetable is not None else rng.choice([0, 1]),  # First flight direct, others may have stops
+            meal_service=True,
+            wifi_available=True,
+            entertainment=True
+        )
         
         flights.append(flight)
     
     return flights
 
-def calculate_arrival_time(departure_time, duration_minutes):
-    """Calculate arrival time based on departure and duration"""
-    dep_hour, dep_minute = map(int, departure_time.split(':'))
-    dep_total_minutes = dep_hour * 60 + dep_minute
-    arr_total_minutes = dep_total_minutes + duration_minutes
-    
-    # Handle next day arrivals
-    arr_hour = (arr_total_minutes // 60) % 24
-    arr_minute = arr_total_minutes % 60
-    
-    return f"{arr_hour:02d}:{arr_minute:02d}"
+def route_flight_number(origin_code, dest_code, slot):
+    """Get the flight number flown on a route in a daily departure slot"""
+    route_index = ROUTE_CODE_INDEX[origin_code] * len(ROUTE_CODE_INDEX) + ROUTE_CODE_INDEX[dest_code]
+    return f"KQ{100 + route_index * 3 + slot}"
 
-def get_flight_status(flight_number):
-    """Get flight status information"""
-    statuses = ["On Time", "Delayed", "Boarding", "Departed", "Arrived", "Cancelled"]
-    status = random.choice(statuses)
-    
-    delay_minutes = 0
-    if status == "Delayed":
-        delay_minutes = random.randint(15, 180)
-    
-    return {
-        "flight_number": flight_number,
-        "status": status,
-        "delay_minutes": delay_minutes,
-        "gate": f"A{random.randint(1, 25)}",
-        "terminal": random.choice(["1A", "1B", "1C"]),
-        "baggage_claim": random.randint(1, 8) if status in ["Arrived", "Boarding"] else None
-    }
+def calculate_arrival_time(departure_time, duration_minutes, origin_code="NBO", dest_code="NBO"):
+    """Calculate local arrival time based on departure, duration and airport time zones"""
+    schedule = compute_schedule([datetime.now().date()], [departure_time], [duration_minutes], [origin_code], [dest_code])
+    return format_local_time(schedule["arrival_local"][0])
 
+SEARCHES = REGISTRY.counter("kq_flight_searches_total", "Flight searches run")
+SEARCH_LATENCY = REGISTRY.histogram("kq_flight_search_seconds", "Latency of search_flights")
+
+@profiled()
 def search_flights(origin, destination, departure_date, return_date=None, passengers=1, travel_class="Economy"):
-    """Search for flights based on criteria"""
+    """Search for flights with at least ``passengers`` seats left in ``travel_class``"""
+    SEARCHES.inc()
+    started = time.perf_counter()
+    try:
+        if origin not in DESTINATIONS or destination not in DESTINATIONS:
+            return []
+        
+        outbound_flights = get_route_flights(origin, destination, departure_date, travel_class, passengers)
+        
+        if return_date:
+            return_flights = get_route_flights(destination, origin, return_date, travel_class, passengers)
+            return {"outbound": outbound_flights, "return": return_flights}
+        
+        return {"outbound": outbound_flights}
+    finally:
+        SEARCH_LATENCY.observe(time.perf_counter() - started)
+
+def get_route_flights(origin, destination, departure_date, travel_class=None, seats=1):
+    """Get a route's bookable flights for a date from the shared inventory, generating them once"""
+    flights = find_route(origin, destination, departure_date, travel_class, seats)
+    if flights is None:
+        flights = register_route(origin, destination, departure_date,
+                                 generate_flight_data(origin, destination, departure_date),
+                                 travel_class, seats)
+    return flights
+
+def stream_flights(origin, destination, departure_date, return_date=None, passengers=1, travel_class="Economy",
+                   start=None):
+    """Lazy form of search_flights: {direction: iterator of (position, flight)}, or {} for unknown cities
+
+    No flight is generated or looked at until an iterator is consumed, and
+    each stops as soon as its consumer does. ``start`` maps direction to a
+    position yielded earlier, to resume that stream from it.
+    """
     if origin not in DESTINATIONS or destination not in DESTINATIONS:
-        return []
-    
-    outbound_flights = generate_flight_data(origin, destination, departure_date)
-    
+        return {}
+    SEARCHES.inc()
+    start = start or {}
+    streams = {"outbound": iter_route_flights(origin, destination, departure_date, travel_class, passengers,
+                                              start.get("outbound", 0))}
     if return_date:
-        return_flights = generate_flight_data(destination, origin, return_date)
-        return {"outbound": outbound_flights, "return": return_flights}
-    
-    return {"outbound": outbound_flights}
+        streams["return"] = iter_route_flights(destination, origin, return_date, travel_class, passengers,
+                                               start.get("return", 0))
+    return streams
+
+def iter_route_flights(origin, destination, departure_date, travel_class=None, seats=1, start=0):
+    """Lazily yield (position, flight) for a route's bookable flights on a date, generating them once"""
+    keys = route_keys(origin, destination, departure_date)
+    if keys is None:
+        keys = tuple(flight_key(flight) for flight in register_route(
+            origin, destination, departure_date, generate_flight_data(origin, destination, departure_date)
+        ))
+    yield from iter_bookable(keys, travel_class, seats, start)
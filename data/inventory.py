@@ -0,0 +1,233 @@
+import threading
+from math import floor
+
+from utils.metrics import REGISTRY
+
+# Flights shared by every session, keyed by (flight number, departure date,
+# origin code), and the keys of each leg flown under a number on a date
+_inventory_lock = threading.Lock()
+_flights = {}
+_legs = {}
+
+# Flight keys for each (origin, destination, departure date) already generated
+_routes = {}
+
+# Seats left per (flight key, cabin). Each flight's counters are guarded by
+# one of a fixed set of striped locks, so bookings on different flights
+# rarely wait on each other and never on the route lock above.
+SEAT_LOCK_STRIPES = 64
+_seat_locks = [threading.Lock() for _ in range(SEAT_LOCK_STRIPES)]
+_seats_left = {}
+_seat_capacity = {}
+_seat_oversell = {}
+_closed_flights = set()
+
+# Share of a cabin's seats that may be sold beyond capacity, expecting no-shows
+OVERBOOKING_LIMITS = {"Economy": 0.05, "Business": 0.02, "First": 0.0}
+
+# Called with (flight key, cabin) after seats return to a cabin
+_release_listeners = []
+
+ROUTE_CACHE_HITS = REGISTRY.counter("kq_cache_requests_total", "Cache lookups by cache and result",
+                                    {"cache": "flight_inventory", "result": "hit"})
+ROUTE_CACHE_MISSES = REGISTRY.counter("kq_cache_requests_total", "Cache lookups by cache and result",
+                                      {"cache": "flight_inventory", "result": "miss"})
+
+
+def flight_key(flight):
+    """Get the compact key identifying a flight in the inventory
+
+    A multi-leg flight flies every leg under one number on the same day, so
+    the leg's origin is part of the key.
+    """
+    return (flight.flight_number, str(flight.departure_date), flight.origin_code)
+
+
+def normalize_key(key):
+    """A flight key as stored, from a key or a [number, date, origin] list from JSON"""
+    flight_number, departure_date, origin_code = key
+    return (flight_number, str(departure_date), origin_code)
+
+
+def register_route(origin, destination, departure_date, flights, travel_class=None, seats=1):
+    """Add a route's flights for a date to the inventory and return the shared copies
+
+    With a travel_class, only flights with at least ``seats`` left in that
+    cabin are returned (see find_route).
+    """
+    route = (origin, destination, str(departure_date))
+
+    with _inventory_lock:
+        if route not in _routes:
+            keys = []
+            for flight in flights:
+                key = flight_key(flight)
+                _flights[key] = flight
+                keys.append(key)
+                legs = _legs.setdefault(key[:2], [])
+                if key not in legs:
+                    legs.append(key)
+                with _seat_lock(key):
+                    closed = key in _closed_flights
+                    for cabin, allocation in flight.seats_available.items():
+                        _seats_left.setdefault((key, cabin), 0 if closed else allocation)
+                        _seat_capacity.setdefault((key, cabin), allocation)
+                        _seat_oversell.setdefault((key, cabin), 0 if closed else floor(allocation * OVERBOOKING_LIMITS.get(cabin, 0.0)))
+            _routes[route] = tuple(keys)
+
+        return [_flights[key] for key in _bookable(_routes[route], travel_class, seats)]
+
+
+def find_route(origin, destination, departure_date, travel_class=None, seats=1):
+    """Get a route's flights for a date, or None if they are not in the inventory
+
+    With a travel_class, flights without ``seats`` left in that cabin (or not
+    selling it at all) are skipped on the key index, before any Flight is
+    looked up.
+    """
+    with _inventory_lock:
+        keys = _routes.get((origin, destination, str(departure_date)))
+        if keys is None:
+            ROUTE_CACHE_MISSES.inc()
+            return None
+        ROUTE_CACHE_HITS.inc()
+        return [_flights[key] for key in _bookable(keys, travel_class, seats)]
+
+
+def route_keys(origin, destination, departure_date):
+    """A route's flight keys for a date in generated order, or None if they are not in the inventory"""
+    with _inventory_lock:
+        keys = _routes.get((origin, destination, str(departure_date)))
+    (ROUTE_CACHE_MISSES if keys is None else ROUTE_CACHE_HITS).inc()
+    return keys
+
+
+def iter_bookable(keys, travel_class=None, seats=1, start=0):
+    """Lazily yield (position, flight) for the keys from ``start`` on with ``seats`` left in a cabin
+
+    Seats are counted as each key is reached, so a consumer that stops
+    early never looks at the rest; resuming from a yielded position + 1
+    continues the stream without revisiting earlier keys.
+    """
+    for position in range(start, len(keys)):
+        if travel_class is None or _sellable((keys[position], travel_class)) >= seats:
+            yield position, _flights[keys[position]]
+
+
+def get_flight(key):
+    """Resolve a flight key (or a [number, date, origin] list from JSON) to the shared Flight record"""
+    return _flights[normalize_key(key)]
+
+
+def flight_legs(flight_number, departure_date):
+    """Keys of every leg flown under a flight number on a date, in the order they were added"""
+    with _inventory_lock:
+        return list(_legs.get((flight_number, str(departure_date)), ()))
+
+
+def get_flights(keys):
+    """Resolve a list of flight keys to the shared Flight records"""
+    return [get_flight(key) for key in keys]
+
+
+def _bookable(keys, travel_class, seats):
+    """Flight keys with enough seats left in a cabin (all keys without a cabin)"""
+    if travel_class is None:
+        return keys
+    return [key for key in keys if _sellable((key, travel_class)) >= seats]
+
+
+def _seat_lock(key):
+    """Lock striped by flight, guarding that flight's cabin counters"""
+    return _seat_locks[hash(key) % SEAT_LOCK_STRIPES]
+
+
+def _sellable(counter):
+    """Seats left in a cabin plus its overbooking allowance"""
+    return _seats_left.get(counter, 0) + _seat_oversell.get(counter, 0)
+
+
+def cabin_seats_left(key, cabin):
+    """Seats still for sale in a flight's cabin, including overbooking (0 if the cabin is not sold)"""
+    key = normalize_key(key)
+    return max(0, _sellable((key, cabin)))
+
+
+def cabin_seats_unsold(key, cabin):
+    """Seats of a flight's cabin not yet sold, without overbooking (0 if the cabin is not sold)"""
+    return max(0, _seats_left.get((normalize_key(key), cabin), 0))
+
+
+def reserve_cabin_seats(key, cabin, count):
+    """Take seats from a flight's cabin if enough are for sale; returns whether they were taken"""
+    if count <= 0:
+        return True
+    key = normalize_key(key)
+    counter = (key, cabin)
+    with _seat_lock(key):
+        if count > _sellable(counter):
+            return False
+        _seats_left[counter] -= count
+        return True
+
+
+def reserve_cabin_seats_batch(counts):
+    """Take seats on many flights and cabins at once, all or none
+
+    ``counts`` maps (flight key, cabin) to seats. The stripe locks of every
+    flight involved are held together, taken in a fixed order.
+    """
+    counts = {(normalize_key(key), cabin): count for (key, cabin), count in counts.items() if count > 0}
+    locks = [_seat_locks[index] for index in sorted({hash(key) % SEAT_LOCK_STRIPES for key, _ in counts})]
+    for lock in locks:
+        lock.acquire()
+    try:
+        if any(count > _sellable(counter) for counter, count in counts.items()):
+            return False
+        for counter, count in counts.items():
+            _seats_left[counter] -= count
+        return True
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+def close_flight(key):
+    """Stop selling every cabin of a flight (e.g. when it is cancelled)
+
+    A flight not yet in the inventory is recorded as closed and registered
+    with no seats for sale.
+    """
+    key = normalize_key(key)
+    with _seat_lock(key):
+        _closed_flights.add(key)
+        flight = _flights.get(key)
+        for cabin in flight.seats_available if flight else ():
+            _seat_oversell[(key, cabin)] = 0
+            _seats_left[(key, cabin)] = min(_seats_left[(key, cabin)], 0)
+
+
+def is_closed(key):
+    """Whether a flight has been closed to sale"""
+    return normalize_key(key) in _closed_flights
+
+
+def release_cabin_seats(key, cabin, count):
+    """Return seats to a flight's cabin, never beyond what was put on sale, and notify listeners"""
+    key = normalize_key(key)
+    counter = (key, cabin)
+    with _seat_lock(key):
+        if counter not in _seats_left or key in _closed_flights:
+            return
+        _seats_left[counter] = min(_seats_left[counter] + count, _seat_capacity[counter])
+        listeners = list(_release_listeners)
+
+    for listener in listeners:
+        listener(key, cabin)
+
+
+def add_release_listener(listener):
+    """Call listener(flight key, cabin) whenever seats are released back to a cabin"""
+    with _inventory_lock:
+        if listener not in _release_listeners:
+            _release_listeners.append(listener)
@@ -0,0 +1,184 @@
+from dataclasses import dataclass, field
+from datetime import date
+from typing import ClassVar, Mapping, Optional
+
+from data.schedule_time import parse_duration
+
+# Record types shared by the data, utils and pages layers. Each converts
+# cheaply to and from the plain dicts the UI and session state work with.
+
+
+class Record:
+    """Base for slotted records with dict conversion"""
+
+    __slots__ = ()
+
+    # Dict keys that differ from attribute names (e.g. "class" is a keyword)
+    DICT_KEYS: ClassVar[dict] = {}
+
+    def to_dict(self):
+        """Convert to a plain dict (shallow)"""
+        return {self.DICT_KEYS.get(name, name): getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a dict, rejecting unknown keys"""
+        aliases = {key: name for name, key in cls.DICT_KEYS.items()}
+        return cls(**{aliases.get(key, key): value for key, value in data.items()})
+
+
+@dataclass(frozen=True, slots=True)
+class Flight(Record):
+    """A dated flight in the inventory"""
+
+    flight_number: str
+    origin: str
+    destination: str
+    origin_code: str
+    destination_code: str
+    departure_date: date
+    departure_time: str
+    arrival_time: str
+    duration: str
+    aircraft: str
+    aircraft_image: str
+    prices: dict
+    # Seats put on sale per cabin; live counts are kept by data.inventory
+    seats_available: dict
+    stops: int = 0
+    meal_service: bool = True
+    wifi_available: bool = True
+    entertainment: bool = True
+
+    @property
+    def duration_minutes(self):
+        """Flight time in minutes, for sorting and arithmetic"""
+        return parse_duration(self.duration)
+
+
+@dataclass(slots=True)
+class Passenger(Record):
+    """A traveller on a booking"""
+
+    DICT_KEYS: ClassVar[dict] = {"travel_class": "class"}
+
+    first_name: str = ""
+    last_name: str = ""
+    date_of_birth: Optional[date] = None
+    gender: str = ""
+    nationality: str = ""
+    passport_number: str = ""
+    passport_expiry: Optional[date] = None
+    issuing_country: str = ""
+    meal_preference: str = "Standard"
+    accompanying_adult: Optional[str] = None
+    assigned_seats: list = field(default_factory=list)
+    passenger_type: str = "Adult"
+    travel_class: str = "Economy"
+    seat: Optional[str] = None
+    special_requests: list = field(default_factory=list)
+
+    @property
+    def full_name(self):
+        """First and last name as printed on tickets"""
+        return f"{self.first_name} {self.last_name}"
+
+
+@dataclass(frozen=True, slots=True)
+class Ticket(Record):
+    """An issued ticket for one passenger"""
+
+    DICT_KEYS: ClassVar[dict] = {"travel_class": "class"}
+
+    ticket_number: str
+    passenger_name: str
+    seat: str = "Not assigned"
+    travel_class: str = "Economy"
+    special_requests: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Booking(Record):
+    """A confirmed booking"""
+
+    booking_reference: str
+    created_at: str
+    flights: list
+    passengers: list
+    contact: dict
+    total_price: float
+    status: str = "Confirmed"
+    payment_status: str = "Paid"
+    tickets: list = field(default_factory=list)
+    # Append-only AncillaryItem lines; total_price and ancillary_total move with each line
+    ancillaries: list = field(default_factory=list)
+    ancillary_total: float = 0.0
+    # Amount returned to the customer when the booking was cancelled
+    refund_amount: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class AncillaryItem(Record):
+    """One priced line on a booking's ancillary ledger; a removal is a negative line reversing another"""
+
+    line: int
+    code: str
+    description: str
+    quantity: int
+    amount: float
+    created_at: str
+    passenger_index: Optional[int] = None
+    # Line number this line reverses, for removals
+    reverses: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class SeatMap(Record):
+    """A flight cabin's seats as of one version; a new snapshot is built when they change"""
+
+    flight_key: tuple
+    travel_class: str
+    aircraft: str
+    config: Mapping
+    # Read-only seat mappings (seat_id, row, letter, type, available, price)
+    seats: tuple
+    version: int
+    # Epoch seconds when the next seat hold in the snapshot lapses
+    valid_until: Optional[float] = None
+
+
+@dataclass(slots=True)
+class WaitlistEntry(Record):
+    """A request for seats on a sold-out flight cabin"""
+
+    entry_id: int
+    flight_key: tuple
+    travel_class: str
+    seats: int
+    contact: dict
+    fare_class: str = "Classic"
+    tier: Optional[str] = None
+    requested_at: float = 0.0
+    status: str = "Waiting"
+    offer_expires_at: Optional[float] = None
+
+
+@dataclass(frozen=True, slots=True)
+class BoardingPass(Record):
+    """A boarding pass issued at check-in"""
+
+    DICT_KEYS: ClassVar[dict] = {"travel_class": "class"}
+
+    passenger_name: str
+    flight_number: str
+    route: str
+    departure_date: str
+    departure_time: str
+    boarding_time: str
+    seat: str
+    gate: str
+    terminal: str
+    travel_class: str
+    booking_reference: str
+    barcode: str
+    sequence: int
@@ -0,0 +1,121 @@
+import numpy as np
+
+from data.inventory import cabin_seats_left, flight_key
+from data.schedule_time import parse_local_time
+
+# Search results as typed columns (price, times, duration, stops, aircraft,
+# seats per cabin), so sorting, filtering and facet counts are array
+# operations over the stored result rather than new searches. Filtered and
+# sorted sets are views: they share the columns and only hold row indices.
+
+CABINS = ("Economy", "Business", "First")
+
+# Columns results can be sorted on; prefix with "-" for descending
+SORT_KEYS = ("price", "departure", "arrival", "duration", "stops")
+
+
+class ResultSet:
+    """One direction of a search as columns, with vectorized sort, filter and facets"""
+
+    def __init__(self, columns, rows=None):
+        self._columns = columns
+        self._rows = np.arange(len(columns["keys"])) if rows is None else rows
+
+    @classmethod
+    def from_flights(cls, flights, travel_class):
+        """Build the columns for a search in a cabin; seats are counted at search time"""
+        aircraft_models = tuple(dict.fromkeys(flight.aircraft for flight in flights))
+        model_index = {model: index for index, model in enumerate(aircraft_models)}
+        count = len(flights)
+        columns = {
+            "keys": [flight_key(flight) for flight in flights],
+            "travel_class": travel_class,
+            "price": np.fromiter((flight.prices.get(travel_class) or np.nan for flight in flights), dtype=np.float64, count=count),
+            "departure": np.fromiter((parse_local_time(flight.departure_time) for flight in flights), dtype=np.int32, count=count),
+            "arrival": np.fromiter((parse_local_time(flight.arrival_time) for flight in flights), dtype=np.int32, count=count),
+            "duration": np.fromiter((flight.duration_minutes for flight in flights), dtype=np.int32, count=count),
+            "stops": np.fromiter((flight.stops for flight in flights), dtype=np.int8, count=count),
+            "aircraft": np.fromiter((model_index[flight.aircraft] for flight in flights), dtype=np.int16, count=count),
+            "aircraft_models": aircraft_models,
+            "seats": {
+                cabin: np.fromiter((cabin_seats_left(flight_key(flight), cabin) for flight in flights), dtype=np.int32, count=count)
+                for cabin in CABINS
+            }
+        }
+        return cls(columns)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def keys(self):
+        """Flight keys in the set's order"""
+        return [self._columns["keys"][row] for row in self._rows]
+
+    @property
+    def travel_class(self):
+        return self._columns["travel_class"]
+
+    @property
+    def aircraft_models(self):
+        return self._columns["aircraft_models"]
+
+    def column(self, name):
+        """Values of a column for the set's rows, in order"""
+        return self._columns[name][self._rows]
+
+    def bounds(self, name):
+        """(min, max) of a numeric column over the set, ignoring missing prices; None if empty"""
+        values = self.column(name)
+        values = values[~np.isnan(values)] if values.dtype.kind == "f" else values
+        if not len(values):
+            return None
+        return values.min().item(), values.max().item()
+
+    def filter(self, price=None, departure=None, duration=None, stops=None, aircraft=None, min_seats=None):
+        """Rows matching every given criterion
+
+        ``price``, ``departure`` (local minutes) and ``duration`` (minutes)
+        are inclusive (low, high) ranges; ``stops`` and ``aircraft`` are
+        collections of accepted values; ``min_seats`` maps cabin to seats
+        needed. Criteria left as None do not filter.
+        """
+        mask = np.ones(len(self._rows), dtype=bool)
+        for name, value_range in (("price", price), ("departure", departure), ("duration", duration)):
+            if value_range is not None:
+                values = self.column(name)
+                mask &= (values >= value_range[0]) & (values <= value_range[1])
+        if stops is not None:
+            mask &= np.isin(self.column("stops"), list(stops))
+        if aircraft is not None:
+            wanted = [index for index, model in enumerate(self.aircraft_models) if model in aircraft]
+            mask &= np.isin(self.column("aircraft"), wanted)
+        for cabin, seats in (min_seats or {}).items():
+            mask &= self._columns["seats"][cabin][self._rows] >= seats
+        return ResultSet(self._columns, self._rows[mask])
+
+    def sort(self, *keys):
+        """Rows ordered by several columns, first key most significant ("-price" for descending)
+
+        The sort is stable, so rows equal on every key keep their current order.
+        """
+        if not keys:
+            return self
+        sort_columns = []
+        for key in reversed(keys):
+            name = key.lstrip("-")
+            if name not in SORT_KEYS:
+                raise ValueError(f"Cannot sort on {name}")
+            values = self.column(name).astype(np.float64)
+            sort_columns.append(-values if key.startswith("-") else values)
+        return ResultSet(self._columns, self._rows[np.lexsort(sort_columns)])
+
+    def facets(self):
+        """Counts per stops value, per aircraft model and per cabin with seats left"""
+        stops = np.bincount(self.column("stops").astype(np.intp))
+        aircraft = np.bincount(self.column("aircraft").astype(np.intp), minlength=len(self.aircraft_models))
+        return {
+            "stops": {value: int(count) for value, count in enumerate(stops) if count},
+            "aircraft": {model: int(count) for model, count in zip(self.aircraft_models, aircraft) if count},
+            "cabins": {cabin: int((seats[self._rows] > 0).sum()) for cabin, seats in self._columns["seats"].items()}
+        }
@@ -0,0 +1,104 @@
+from datetime import date
+
+import numpy as np
+
+from data.airports import AIRPORT_REGISTRY
+from utils.profiling import profiled
+
+# Schedule times are integer minutes: absolute times are UTC minutes since
+# 1970-01-01, local clock times are minutes after local midnight of the
+# departure date (so 1530 is 01:30 the next day).
+
+MINUTES_PER_DAY = 24 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_utc_offset(offset):
+    """Convert a "+5:30" style UTC offset to minutes"""
+    sign = -1 if offset.startswith("-") else 1
+    hours, _, minutes = offset.lstrip("+-").partition(":")
+    return sign * (int(hours) * 60 + int(minutes or 0))
+
+
+def parse_local_time(time_text):
+    """Convert "HH:MM" (optionally "+1" / "-1") to minutes after local midnight"""
+    clock, sign, day_offset = time_text.partition("+")
+    if not sign:
+        clock, sign, day_offset = time_text.partition("-")
+    days = int(day_offset or 0) * (-1 if sign == "-" else 1)
+    hour, minute = map(int, clock.split(":"))
+    return days * MINUTES_PER_DAY + hour * 60 + minute
+
+
+def parse_duration(duration_text):
+    """Convert a "4h 19m" duration to minutes"""
+    hours, _, minutes = duration_text.partition("h")
+    return int(hours) * 60 + int(minutes.strip().rstrip("m") or 0)
+
+
+def format_local_time(minutes):
+    """Format minutes after local midnight as "HH:MM", marking other days with "+1" / "-1" """
+    days, minutes = divmod(int(minutes), MINUTES_PER_DAY)
+    time_text = f"{minutes // 60:02d}:{minutes % 60:02d}"
+    if days > 0:
+        return f"{time_text}+{days}"
+    if days < 0:
+        return f"{time_text}{days}"
+    return time_text
+
+
+# UTC offset of every registry airport, as a table indexed by airport position
+AIRPORT_CODES = tuple(AIRPORT_REGISTRY.by_code)
+AIRPORT_POSITION = {code: position for position, code in enumerate(AIRPORT_CODES)}
+UTC_OFFSET_MINUTES = np.array(
+    [parse_utc_offset(AIRPORT_REGISTRY.by_code[code]["timezone"]) for code in AIRPORT_CODES],
+    dtype=np.int64
+)
+
+
+def utc_offsets(airport_codes):
+    """Look up the UTC offsets of many airports at once"""
+    positions = np.fromiter((AIRPORT_POSITION[code] for code in airport_codes), dtype=np.int64)
+    return UTC_OFFSET_MINUTES[positions]
+
+
+@profiled()
+def compute_schedule(departure_dates, departure_times, durations, origin_codes, destination_codes, delays=None):
+    """Compute UTC and local times for a whole array of flights in one vectorized pass
+
+    Returns arrays of UTC departure and arrival minutes, local departure and
+    arrival clock minutes (relative to the departure date, so arrivals past
+    midnight exceed 1440) and the arrival day offset. ``delays``, if given,
+    shifts both departure and arrival.
+    """
+    count = len(departure_times)
+    departure_days = np.fromiter((day.toordinal() - EPOCH_ORDINAL for day in departure_dates), dtype=np.int64, count=count)
+    departure_local = np.fromiter(
+        (time if isinstance(time, (int, np.integer)) else parse_local_time(time) for time in departure_times),
+        dtype=np.int64, count=count
+    )
+    durations = np.asarray(durations, dtype=np.int64)
+    delays = np.zeros(count, dtype=np.int64) if delays is None else np.asarray(delays, dtype=np.int64)
+
+    origin_offsets = utc_offsets(origin_codes)
+    destination_offsets = utc_offsets(destination_codes)
+
+    midnight_utc = departure_days * MINUTES_PER_DAY
+    departure_utc = midnight_utc + departure_local - origin_offsets + delays
+    arrival_utc = departure_utc + durations
+
+    # Arrival clock time at the destination, counted from the departure date's midnight there
+    arrival_local = arrival_utc + destination_offsets - midnight_utc
+
+    return {
+        "departure_utc": departure_utc,
+        "arrival_utc": arrival_utc,
+        "departure_local": departure_local + delays,
+        "arrival_local": arrival_local,
+        "arrival_day_offset": np.floor_divide(arrival_local, MINUTES_PER_DAY)
+    }
+
+
+def format_local_times(local_minutes):
+    """Format an array of local clock minutes"""
+    return [format_local_time(minutes) for minutes in local_minutes]
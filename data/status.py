@@ -0,0 +1,318 @@
+import random
+import threading
+from datetime import date, datetime, timedelta
+
+from data.airports import AIRPORTS
+from data.flights import DESTINATIONS, get_route_flights
+from data.schedule_time import MINUTES_PER_DAY, format_local_time, parse_local_time
+from utils.profiling import profiled
+
+# Hub airport for the live boards
+HUB_CODE = "NBO"
+
+# Minutes before departure when boarding opens
+BOARDING_WINDOW_MINUTES = 45
+
+# Minutes before arrival when an inbound flight shows as en route
+EN_ROUTE_WINDOW_MINUTES = 120
+
+# Operational overrides reported for individual flights (delays, gate
+# changes...), keyed by (flight number, departure date) as in the inventory
+_status_lock = threading.Lock()
+_status_overrides = {}
+_status_listeners = []
+
+# Daily schedules indexed by airport code and flight number, for the most
+# recently requested dates
+SCHEDULE_CACHE_DAYS = 7
+_schedule_cache = {}
+
+
+def update_flight_status(flight_number, flight_date=None, **fields):
+    """Record an operational status change for a flight on a date (today by default)"""
+    flight_date = flight_date or date.today()
+    apply_status_updates([{"flight_number": flight_number, "departure_date": flight_date, **fields}])
+    return get_status_override(flight_number, flight_date)
+
+
+def apply_status_updates(events):
+    """Apply a batch of status events to the store under a single lock
+
+    Events without a "departure_date" (a date or ISO string) are for flights
+    departing today.
+    """
+    today = date.today()
+    changes = {}
+    for event in events:
+        key = (event["flight_number"], _event_date(event.get("departure_date"), today))
+        fields = {key: value for key, value in event.items() if key not in ("flight_number", "departure_date", "timestamp")}
+        changes.setdefault(key, {}).update(fields)
+
+    updated_at = datetime.now().isoformat(timespec="seconds")
+    with _status_lock:
+        for key, fields in changes.items():
+            current = dict(_status_overrides.get(key, {}))
+            current.update(fields)
+            current["updated_at"] = updated_at
+            _status_overrides[key] = current
+        listeners = list(_status_listeners)
+
+    # Listeners hear about each flight once per batch; one failing does not
+    # keep the others from hearing, and its error is raised once all have run
+    failure = None
+    for (flight_number, flight_date), fields in changes.items():
+        for listener in listeners:
+            try:
+                listener(flight_number, {**fields, "departure_date": date.fromisoformat(flight_date)})
+            except Exception as exc:
+                failure = failure or exc
+    if failure is not None:
+        raise failure
+
+    return len(changes)
+
+
+def add_status_listener(listener):
+    """Call listener(flight_number, fields) whenever a flight's status changes
+
+    ``fields`` holds the changed fields and the flight's "departure_date".
+    """
+    with _status_lock:
+        if listener not in _status_listeners:
+            _status_listeners.append(listener)
+
+
+def get_status_override(flight_number, flight_date=None):
+    """Get the latest operational status reported for a flight on a date (today by default)"""
+    with _status_lock:
+        return _status_overrides.get((flight_number, str(flight_date or date.today())))
+
+
+def is_cancelled(flight_number, flight_date):
+    """Whether operations have reported a flight cancelled on a date"""
+    return (get_status_override(flight_number, flight_date) or {}).get("status") == "Cancelled"
+
+
+def get_daily_schedule(schedule_date):
+    """Get the hub schedule for a date, indexed by airport code and flight number"""
+    key = schedule_date.isoformat()
+    schedule = _schedule_cache.get(key)
+    if schedule is None:
+        schedule = _build_daily_schedule(schedule_date)
+        _schedule_cache[key] = schedule
+        while len(_schedule_cache) > SCHEDULE_CACHE_DAYS:
+            _schedule_cache.pop(next(iter(_schedule_cache)), None)
+    return schedule
+
+
+def _event_date(value, today):
+    """ISO departure date of a status event"""
+    if not value:
+        return str(today)
+    return str(value) if isinstance(value, date) else date.fromisoformat(value).isoformat()
+
+
+def _build_daily_schedule(schedule_date):
+    """Build the day's hub movements from the flights sold in the inventory
+
+    Inbound flights that left the day before and land after midnight are on
+    the day's arrivals too.
+    """
+    rng = random.Random(schedule_date.toordinal())
+    hub_city = AIRPORTS[HUB_CODE]["city"]
+    schedule = {"airports": {}, "flights": {}}
+
+    for city, info in DESTINATIONS.items():
+        if info["code"] == HUB_CODE:
+            continue
+
+        for flight in get_route_flights(hub_city, city, schedule_date) + get_route_flights(city, hub_city, schedule_date):
+            _add_movement(schedule, flight.flight_number, flight.origin_code, flight.origin, flight.destination_code,
+                          flight.destination, schedule_date, parse_local_time(flight.departure_time),
+                          parse_local_time(flight.arrival_time), rng)
+
+        for flight in get_route_flights(city, hub_city, schedule_date - timedelta(days=1)):
+            arrival_minutes = parse_local_time(flight.arrival_time) - MINUTES_PER_DAY
+            if arrival_minutes >= 0:
+                _add_arrival(schedule, flight.flight_number, flight.origin, HUB_CODE, flight.departure_date,
+                             arrival_minutes, rng)
+
+    for movements in schedule["airports"].values():
+        movements["departures"].sort(key=lambda movement: movement["time_minutes"])
+        movements["arrivals"].sort(key=lambda movement: movement["time_minutes"])
+
+    return schedule
+
+
+def _add_movement(schedule, flight_number, origin_code, origin, dest_code, destination, departure_date,
+                  departure_minutes, arrival_minutes, rng):
+    """Add a flight to the departure and arrival lists of its airports"""
+    departure_gate = f"{rng.choice('ABC')}{rng.randint(1, 25)}"
+
+    schedule["airports"].setdefault(origin_code, {"departures": [], "arrivals": []})["departures"].append({
+        "flight": flight_number,
+        "destination": destination,
+        "departure_date": departure_date,
+        "time_minutes": departure_minutes,
+        "gate": departure_gate
+    })
+    if arrival_minutes < MINUTES_PER_DAY:
+        _add_arrival(schedule, flight_number, origin, dest_code, departure_date, arrival_minutes, rng)
+    schedule["flights"][flight_number] = {
+        "origin": origin,
+        "destination": destination,
+        "departure_minutes": departure_minutes,
+        "arrival_minutes": arrival_minutes,
+        "gate": departure_gate,
+        "terminal": rng.choice(["1A", "1B", "1C"]) if origin_code == HUB_CODE else "Main"
+    }
+
+
+def _add_arrival(schedule, flight_number, origin, dest_code, departure_date, arrival_minutes, rng):
+    """Add a flight to the arrival list of the airport it lands at"""
+    schedule["airports"].setdefault(dest_code, {"departures": [], "arrivals": []})["arrivals"].append({
+        "flight": flight_number,
+        "origin": origin,
+        "departure_date": departure_date,
+        "time_minutes": arrival_minutes,
+        "gate": f"{rng.choice('ABC')}{rng.randint(1, 25)}"
+    })
+
+
+@profiled()
+def get_departure_board(airport_code=HUB_CODE, now=None):
+    """Get the live departure board for an airport"""
+    now = now or datetime.now()
+    movements = get_daily_schedule(now.date())["airports"].get(airport_code, {}).get("departures", [])
+    current_minutes = now.hour * 60 + now.minute
+
+    board = []
+    for movement in movements:
+        row = _apply_override(movement["departure_date"], {
+            "flight": movement["flight"],
+            "departure_date": str(movement["departure_date"]),
+            "destination": movement["destination"],
+            "time": format_local_time(movement["time_minutes"]),
+            "gate": movement["gate"],
+            "status": _departure_status(movement["time_minutes"], current_minutes)
+        })
+        board.append(row)
+
+    return board
+
+
+@profiled()
+def get_arrival_board(airport_code=HUB_CODE, now=None):
+    """Get the live arrival board for an airport"""
+    now = now or datetime.now()
+    movements = get_daily_schedule(now.date())["airports"].get(airport_code, {}).get("arrivals", [])
+    current_minutes = now.hour * 60 + now.minute
+
+    board = []
+    for movement in movements:
+        row = _apply_override(movement["departure_date"], {
+            "flight": movement["flight"],
+            "departure_date": str(movement["departure_date"]),
+            "origin": movement["origin"],
+            "time": format_local_time(movement["time_minutes"]),
+            "gate": movement["gate"],
+            "status": _arrival_status(movement["time_minutes"], current_minutes)
+        })
+        board.append(row)
+
+    return board
+
+
+@profiled()
+def get_flight_status(flight_number, flight_date=None, now=None):
+    """Get flight status information from the schedule and reported operations"""
+    now = now or datetime.now()
+    flight_date = flight_date or now.date()
+    flight_number = flight_number.strip().upper()
+    scheduled = get_daily_schedule(flight_date)["flights"].get(flight_number)
+    override = get_status_override(flight_number, flight_date) or {}
+
+    # Flights on other days are either all still to come or all gone
+    if flight_date == now.date():
+        current_minutes = now.hour * 60 + now.minute
+    else:
+        current_minutes = -1 if flight_date > now.date() else 48 * 60
+
+    if scheduled:
+        status = _departure_status(scheduled["departure_minutes"], current_minutes)
+        scheduled_departure = format_local_time(scheduled["departure_minutes"])
+        scheduled_arrival = format_local_time(scheduled["arrival_minutes"])
+    else:
+        status = "Unknown"
+        scheduled_departure = scheduled_arrival = None
+
+    status = override.get("status", status)
+    delay_minutes = override.get("delay_minutes", 0)
+    if delay_minutes and status in ["On Time", "Boarding"]:
+        status = "Delayed"
+
+    return {
+        "flight_number": flight_number,
+        "status": status,
+        "delay_minutes": delay_minutes,
+        "gate": override.get("gate") or (scheduled["gate"] if scheduled else "TBA"),
+        "terminal": override.get("terminal") or (scheduled["terminal"] if scheduled else "TBA"),
+        "baggage_claim": override.get("baggage_claim") if status in ["Arrived", "Boarding"] else None,
+        "scheduled_departure": scheduled_departure,
+        "scheduled_arrival": scheduled_arrival,
+        "updated_at": override.get("updated_at")
+    }
+
+
+def board_snapshot(board):
+    """Index board rows by flight number and departure date for diffing
+
+    An arrivals board can show a flight number twice: the flight that left
+    yesterday and the one that leaves today.
+    """
+    return {f"{row['flight']} {row['departure_date']}": tuple(row.items()) for row in board}
+
+
+def diff_board(previous, current):
+    """Compare two board snapshots and list the flights that changed"""
+    added = [flight for flight in current if flight not in previous]
+    changed = [flight for flight, row in current.items() if flight in previous and previous[flight] != row]
+    removed = [flight for flight in previous if flight not in current]
+
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def _apply_override(board_date, row):
+    """Apply any reported status change to a board row"""
+    override = get_status_override(row["flight"], board_date)
+    if not override:
+        return row
+
+    if override.get("gate"):
+        row["gate"] = override["gate"]
+    if override.get("status"):
+        row["status"] = override["status"]
+    if override.get("delay_minutes"):
+        row["time"] = format_local_time(parse_local_time(row["time"]) + override["delay_minutes"])
+        if row["status"] in ["On Time", "Boarding"]:
+            row["status"] = "Delayed"
+
+    return row
+
+
+def _departure_status(departure_minutes, current_minutes):
+    """Derive a departure status from the time of day"""
+    if current_minutes >= departure_minutes:
+        return "Departed"
+    if departure_minutes - current_minutes <= BOARDING_WINDOW_MINUTES:
+        return "Boarding"
+    return "On Time"
+
+
+def _arrival_status(arrival_minutes, current_minutes):
+    """Derive an arrival status from the time of day"""
+    if current_minutes >= arrival_minutes:
+        return "Arrived"
+    if arrival_minutes - current_minutes <= EN_ROUTE_WINDOW_MINUTES:
+        return "En Route"
+    return "On Time"
@@ -0,0 +1,290 @@
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+from data.status import apply_status_updates
+
+# Events held between the reader and the store before the reader blocks
+FEED_BUFFER_SIZE = 10000
+
+# Largest micro-batch applied to the status store at once
+FEED_BATCH_SIZE = 1000
+
+# Longest wait for a micro-batch to fill before applying what has arrived
+FEED_BATCH_SECONDS = 0.1
+
+# Pause between checks for new lines at the end of a feed file
+FEED_POLL_SECONDS = 0.2
+
+# Bytes read from the feed per call
+FEED_CHUNK_SIZE = 64 * 1024
+
+# Type of each event field the store understands; other fields are dropped
+EVENT_FIELDS = {
+    "status": str,
+    "delay_minutes": int,
+    "gate": str,
+    "terminal": str,
+    "baggage_claim": str,
+    "departure_date": str,
+    "timestamp": (int, float)
+}
+
+# The process-wide ingester of the feed named by STATUS_FEED
+_feed_lock = threading.Lock()
+_feed = None
+_feed_started = False
+
+
+def parse_event(line):
+    """Decode one feed line into a status event, raising ValueError if it is not a valid one"""
+    event = json.loads(line)
+    if not isinstance(event, dict) or not isinstance(event.get("flight_number"), str):
+        raise ValueError("Event must be an object with a flight_number")
+
+    parsed = {"flight_number": event["flight_number"].strip().upper()}
+    for name, value in event.items():
+        expected = EVENT_FIELDS.get(name)
+        if expected is None or value is None:
+            continue
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise ValueError(f"Invalid {name}: {value!r}")
+        parsed[name] = value
+    if parsed.get("delay_minutes", 0) < 0:
+        raise ValueError("delay_minutes cannot be negative")
+    if "departure_date" in parsed:
+        date.fromisoformat(parsed["departure_date"])
+    return parsed
+
+
+class StatusFeedIngester:
+    """Tail an operational status feed and apply it to the status store in micro-batches
+
+    The source is either a newline-delimited JSON file, tailed like ``tail -F``
+    from its end as it was when ingestion started, or a Unix socket given as
+    ``unix:/path/to/socket``. Each line is one event,
+    for today's departure unless it names a ``departure_date``::
+
+        {"flight_number": "KQ100", "departure_date": "2025-07-07", "status": "Delayed", "delay_minutes": 40,
+         "timestamp": 1751871600.0}
+    """
+
+    def __init__(self, source, buffer_size=FEED_BUFFER_SIZE, batch_size=FEED_BATCH_SIZE,
+                 batch_seconds=FEED_BATCH_SECONDS, apply_batch=apply_status_updates):
+        self.source = source
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.apply_batch = apply_batch
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._stopping = threading.Event()
+        self._threads = []
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "events_read": 0,
+            "events_applied": 0,
+            "malformed_events": 0,
+            "batches_applied": 0,
+            "failed_batches": 0,
+            "last_error": None,
+            "last_batch_size": 0,
+            "backpressure_waits": 0,
+            "backpressure_seconds": 0.0,
+            "last_lag_seconds": None,
+            "max_lag_seconds": 0.0,
+            "last_applied_at": None
+        }
+
+    def start(self):
+        """Start the reader and applier threads"""
+        if self._threads:
+            return self
+
+        reader = self._read_socket if self.source.startswith("unix:") else self._read_file
+        self._threads = [
+            threading.Thread(target=reader, name="status-feed-reader", daemon=True),
+            threading.Thread(target=self._apply_loop, name="status-feed-applier", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Stop ingesting once the buffered events have been applied"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def get_metrics(self):
+        """Get throughput, backpressure and lag metrics"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["buffer_depth"] = self._buffer.qsize()
+        metrics["buffer_capacity"] = self._buffer.maxsize
+        return metrics
+
+    def _read_file(self):
+        """Tail a newline-delimited JSON file
+
+        Lines already in the file at start were applied by an earlier run, so
+        reading starts at its end. A truncated file is read again from its
+        start, and a file replaced by rotation is reopened once the old one
+        has been read to its end.
+        """
+        feed = open(self.source, "rb")
+        feed.seek(0, os.SEEK_END)
+        partial = b""
+        try:
+            while not self._stopping.is_set():
+                chunk = feed.read(FEED_CHUNK_SIZE)
+                if chunk:
+                    partial = self._offer_lines(partial + chunk)
+                    continue
+                try:
+                    current = os.stat(self.source)
+                except FileNotFoundError:
+                    current = None
+                if current is not None and current.st_ino != os.fstat(feed.fileno()).st_ino:
+                    feed.close()
+                    feed = open(self.source, "rb")
+                    partial = b""
+                elif current is not None and current.st_size < feed.tell():
+                    feed.seek(0)
+                    partial = b""
+                else:
+                    time.sleep(FEED_POLL_SECONDS)
+        finally:
+            feed.close()
+
+    def _read_socket(self):
+        """Read newline-delimited JSON from a Unix socket"""
+        path = self.source[len("unix:"):]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            connection.settimeout(FEED_POLL_SECONDS)
+            partial = b""
+            while not self._stopping.is_set():
+                try:
+                    chunk = connection.recv(FEED_CHUNK_SIZE)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                partial = self._offer_lines(partial + chunk)
+
+    def _offer_lines(self, data):
+        """Buffer every complete line in data and return the incomplete tail"""
+        *lines, partial = data.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = parse_event(line)
+            except ValueError:
+                self._count("malformed_events")
+                continue
+            self._offer(event)
+        return partial
+
+    def _offer(self, event):
+        """Hand an event to the applier, blocking while the buffer is full
+
+        An event still waiting for room when ingestion stops is dropped, and
+        not counted as read.
+        """
+        try:
+            self._buffer.put_nowait(event)
+        except queue.Full:
+            started = time.monotonic()
+            queued = False
+            while not self._stopping.is_set():
+                try:
+                    self._buffer.put(event, timeout=FEED_POLL_SECONDS)
+                    queued = True
+                    break
+                except queue.Full:
+                    continue
+            with self._metrics_lock:
+                self._metrics["backpressure_waits"] += 1
+                self._metrics["backpressure_seconds"] += time.monotonic() - started
+            if not queued:
+                return
+        self._count("events_read")
+
+    def _apply_loop(self):
+        """Drain the buffer into the status store one micro-batch at a time"""
+        while not (self._stopping.is_set() and self._buffer.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            # A failing batch (e.g. a status listener raising) must not stop ingestion
+            try:
+                self.apply_batch(batch)
+            except Exception as exc:
+                with self._metrics_lock:
+                    self._metrics["failed_batches"] += 1
+                    self._metrics["last_error"] = f"{type(exc).__name__}: {exc}"
+                continue
+            self._record_batch(batch)
+
+    def _next_batch(self):
+        """Collect up to batch_size events, waiting at most batch_seconds"""
+        deadline = time.monotonic() + self.batch_seconds
+        batch = []
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._buffer.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _record_batch(self, batch):
+        """Update throughput and lag metrics after applying a batch"""
+        now = time.time()
+        timestamps = [event["timestamp"] for event in batch if isinstance(event.get("timestamp"), (int, float))]
+        lag = now - min(timestamps) if timestamps else None
+
+        with self._metrics_lock:
+            self._metrics["events_applied"] += len(batch)
+            self._metrics["batches_applied"] += 1
+            self._metrics["last_batch_size"] = len(batch)
+            self._metrics["last_applied_at"] = datetime.now().isoformat(timespec="seconds")
+            if lag is not None:
+                self._metrics["last_lag_seconds"] = lag
+                self._metrics["max_lag_seconds"] = max(self._metrics["max_lag_seconds"], lag)
+
+    def _count(self, metric):
+        """Increment a counter metric"""
+        with self._metrics_lock:
+            self._metrics[metric] += 1
+
+
+def get_status_feed():
+    """Get the process-wide ingester of the feed named by STATUS_FEED, starting it once; None without a feed"""
+    global _feed, _feed_started
+    with _feed_lock:
+        if not _feed_started:
+            _feed_started = True
+            source = os.environ.get("STATUS_FEED")
+            _feed = StatusFeedIngester(source).start() if source else None
+        return _feed
+
+
+if __name__ == "__main__":
+    # Ingest a feed in the foreground and report metrics: python -m data.status_feed <path | unix:/socket>
+    ingester = StatusFeedIngester(sys.argv[1]).start()
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(ingester.get_metrics()))
+    except KeyboardInterrupt:
+        ingester.stop()
@@ -0,0 +1,368 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import numpy as np
+
+from data.schedule_time import AIRPORT_CODES, AIRPORT_POSITION, parse_duration, parse_local_time, parse_utc_offset
+
+# Seasonal timetable read from a schedule file, as one row per operating
+# pattern (flight leg, effective period, days of operation). Patterns are
+# kept in numpy columns and only expanded into dated flights on demand, so
+# a whole season costs a few dozen bytes per pattern however long it runs.
+#
+# Two formats are read, chosen by extension:
+#   .csv  columns flight_number, origin, destination, departure_time (HH:MM local),
+#         duration (minutes or "4h 19m"), aircraft (model or IATA type code),
+#         effective_from, effective_to (YYYY-MM-DD), days_of_operation ("1234567", Monday = 1)
+#   other IATA SSIM Chapter 7 fixed-width files; only flight leg records (type 3) are used
+#
+# For production the schedule is compacted ahead of time into a directory
+# of .npy columns sorted by route (python -m data.timetable compact ...),
+# reached through a symlink that a recompaction swaps atomically.
+# Workers open it with mmap, so startup does no parsing and every process
+# shares the same pages from the OS page cache.
+
+# Optional schedule file, or compacted timetable directory, replacing the
+# generated departures; unset keeps the generator
+TIMETABLE_FILE = os.environ.get("TIMETABLE_FILE")
+
+# Patterns parsed per chunk while loading
+LOAD_CHUNK_ROWS = 4096
+
+# Column files of a compacted timetable, and the layout version it is written in
+COLUMNS = ("flight_numbers", "origins", "destinations", "departures", "durations", "aircraft",
+           "effective_from", "effective_to", "days")
+FORMAT_VERSION = 1
+
+# IATA aircraft type codes of the fleet
+AIRCRAFT_CODES = {
+    "788": "Boeing 787-8",
+    "738": "Boeing 737-800",
+    "E90": "Embraer E190",
+    "77W": "Boeing 777-300ER"
+}
+
+_timetable_lock = threading.Lock()
+_timetable = None
+
+
+class Timetable:
+    """Operating patterns stored column-wise, expanded into dated departures lazily"""
+
+    def __init__(self, flight_numbers, origins, destinations, departures, durations, aircraft,
+                 effective_from, effective_to, days, aircraft_models, airport_codes=AIRPORT_CODES, routes=None):
+        self.flight_numbers = flight_numbers
+        self.origins = origins
+        self.destinations = destinations
+        self.departures = departures
+        self.durations = durations
+        self.aircraft = aircraft
+        self.effective_from = effective_from
+        self.effective_to = effective_to
+        self.days = days
+        self.aircraft_models = tuple(aircraft_models)
+        self.airport_codes = tuple(airport_codes)
+        self._airport_position = {code: position for position, code in enumerate(self.airport_codes)}
+        self._routes = routes
+        # A compacted timetable may name airports since dropped from the
+        # registry; their patterns are left out, as read_schedule does
+        self._unknown_airports = [position for position, code in enumerate(self.airport_codes)
+                                  if code not in AIRPORT_POSITION]
+        self._known_rows = None
+
+    def __len__(self):
+        return len(self.flight_numbers)
+
+    def operating_on(self, day, rows=None):
+        """Indices of the patterns (optionally among ``rows``) operating on a date"""
+        rows = self._rows_with_known_airports() if rows is None else rows
+        ordinal = day.toordinal()
+        weekday_bit = np.uint8(1 << day.weekday())
+        operating = ((self.effective_from[rows] <= ordinal) & (self.effective_to[rows] >= ordinal)
+                     & ((self.days[rows] & weekday_bit) != 0))
+        return rows[operating]
+
+    def departures_on(self, origin_code, destination_code, day):
+        """A route's departures on a date as columns, in departure time order"""
+        rows = self._route_rows().get((self._airport_position.get(origin_code), self._airport_position.get(destination_code)))
+        if rows is None or origin_code not in AIRPORT_POSITION or destination_code not in AIRPORT_POSITION:
+            return self._columns(np.arange(0))
+        rows = self.operating_on(day, rows)
+        return self._columns(rows[np.argsort(self.departures[rows], kind="stable")])
+
+    def expand(self, start, end):
+        """Yield (date, columns) for every day from start to end inclusive
+
+        Each day's flights are produced only when the generator reaches it,
+        so walking a full season holds one day of departures at a time.
+        """
+        day = start
+        while day <= end:
+            yield day, self._columns(self.operating_on(day))
+            day += timedelta(days=1)
+
+    def _columns(self, rows):
+        """Columns of the given patterns, with airports and aircraft resolved"""
+        return {
+            "flight_number": self.flight_numbers[rows].tolist(),
+            "origin_code": [self.airport_codes[position] for position in self.origins[rows]],
+            "destination_code": [self.airport_codes[position] for position in self.destinations[rows]],
+            "departure": self.departures[rows],
+            "duration": self.durations[rows],
+            "aircraft": [self.aircraft_models[index] for index in self.aircraft[rows]]
+        }
+
+    def _rows_with_known_airports(self):
+        """Indices of the patterns between registry airports, found on first use"""
+        if self._known_rows is None:
+            if self._unknown_airports:
+                unknown = np.isin(self.origins, self._unknown_airports) | np.isin(self.destinations, self._unknown_airports)
+                self._known_rows = np.flatnonzero(~unknown)
+            else:
+                self._known_rows = np.arange(len(self))
+        return self._known_rows
+
+    def _route_rows(self):
+        """Pattern indices per (origin, destination) position, built on first use"""
+        if self._routes is None:
+            order = np.lexsort((self.destinations, self.origins))
+            pairs = np.stack([self.origins[order], self.destinations[order]], axis=1)
+            starts = np.flatnonzero(np.any(pairs[1:] != pairs[:-1], axis=1)) + 1
+            self._routes = {
+                (int(group[0, 0]), int(group[0, 1])): rows
+                for group, rows in zip(np.split(pairs, starts), np.split(order, starts))
+                if len(group)
+            }
+        return self._routes
+
+
+def read_schedule(path):
+    """Stream a schedule file as pattern tuples, one line at a time
+
+    Yields (flight number, origin code, destination code, local departure
+    minutes, duration minutes, aircraft model, effective from, effective to,
+    days-of-operation bitmask). Legs touching airports outside the registry
+    are skipped.
+    """
+    rows = _read_csv(path) if str(path).lower().endswith(".csv") else _read_ssim(path)
+    for row in rows:
+        if row[1] in AIRPORT_POSITION and row[2] in AIRPORT_POSITION:
+            yield row
+
+
+def load_timetable(path):
+    """Build a Timetable from a schedule file in fixed-size chunks"""
+    aircraft_models = {}
+    chunks = []
+    patterns = read_schedule(path)
+
+    while True:
+        chunk = list(islice(patterns, LOAD_CHUNK_ROWS))
+        if not chunk:
+            break
+        flight_numbers, origins, destinations, departures, durations, models, starts, ends, days = zip(*chunk)
+        chunks.append((
+            np.array(flight_numbers),
+            np.fromiter((AIRPORT_POSITION[code] for code in origins), dtype=np.int16, count=len(chunk)),
+            np.fromiter((AIRPORT_POSITION[code] for code in destinations), dtype=np.int16, count=len(chunk)),
+            np.array(departures, dtype=np.int16),
+            np.array(durations, dtype=np.int16),
+            np.fromiter((aircraft_models.setdefault(model, len(aircraft_models)) for model in models),
+                        dtype=np.int16, count=len(chunk)),
+            np.fromiter((day.toordinal() for day in starts), dtype=np.int32, count=len(chunk)),
+            np.fromiter((day.toordinal() for day in ends), dtype=np.int32, count=len(chunk)),
+            np.array(days, dtype=np.uint8)
+        ))
+
+    if not chunks:
+        empty = (np.array([], dtype=str), *(np.array([], dtype=np.int16) for _ in range(5)),
+                 np.array([], dtype=np.int32), np.array([], dtype=np.int32), np.array([], dtype=np.uint8))
+        return Timetable(*empty, aircraft_models=())
+    return Timetable(*(np.concatenate(column) for column in zip(*chunks)), aircraft_models=list(aircraft_models))
+
+
+def save_timetable(timetable, path):
+    """Write a timetable as .npy columns sorted by route, replacing any previous copy
+
+    Each copy is written to its own versioned directory beside ``path``, and
+    ``path`` is a symlink to the current one, swapped in with a single
+    atomic rename. A worker opening the timetable at any moment sees either
+    the old copy or the new one, and processes still mapping the old files
+    keep reading them; the copy before the current one is kept for workers
+    that resolved the link just before the swap, and older ones are removed.
+    """
+    path = os.path.abspath(path)
+    staging = f"{path}.v{time.time_ns()}"
+    os.makedirs(staging)
+
+    order = np.lexsort((timetable.departures, timetable.destinations, timetable.origins))
+    for name in COLUMNS:
+        np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(timetable, name))[order])
+
+    # Route index: first row of each (origin, destination) run, and the end of the last
+    pairs = np.stack([timetable.origins[order], timetable.destinations[order]], axis=1)
+    starts = np.flatnonzero(np.any(pairs[1:] != pairs[:-1], axis=1)) + 1 if len(pairs) else np.array([], dtype=np.int64)
+    bounds = np.concatenate([[0], starts, [len(pairs)]]) if len(pairs) else np.array([0])
+    np.save(os.path.join(staging, "route_pairs.npy"), pairs[bounds[:-1]].astype(np.int16))
+    np.save(os.path.join(staging, "route_bounds.npy"), bounds.astype(np.int64))
+
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as manifest:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "patterns": len(timetable),
+            "airport_codes": list(timetable.airport_codes),
+            "aircraft_models": list(timetable.aircraft_models)
+        }, manifest, indent=2)
+
+    _swap_link(path, staging)
+    return path
+
+
+def _swap_link(path, target):
+    """Point the ``path`` symlink at a timetable copy atomically, then prune old copies"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        # A copy compacted before versioned copies is moved aside once
+        os.rename(path, f"{path}.v0")
+    link = f"{path}.link-{os.getpid()}"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(target), link)
+    os.replace(link, path)
+
+    prefix = f"{os.path.basename(path)}.v"
+    directory = os.path.dirname(path)
+    versions = sorted(
+        (name for name in os.listdir(directory) if name.startswith(prefix) and name[len(prefix):].isdigit()),
+        key=lambda name: int(name[len(prefix):])
+    )
+    for name in versions[:-2]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def open_timetable(path):
+    """Map a compacted timetable directory read-only; pages load on first touch
+
+    The link is resolved once so every file comes from the same copy. If
+    that copy is pruned by later recompactions before it is mapped, the
+    link is resolved again.
+    """
+    while True:
+        copy = os.path.realpath(path)
+        try:
+            return _open_copy(copy)
+        except FileNotFoundError:
+            if os.path.realpath(path) == copy:
+                raise
+
+
+def _open_copy(path):
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest["version"] != FORMAT_VERSION:
+        raise ValueError(f"Timetable {path} is format {manifest['version']}, expected {FORMAT_VERSION}; recompact it")
+
+    columns = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS]
+    pairs = np.load(os.path.join(path, "route_pairs.npy"))
+    bounds = np.load(os.path.join(path, "route_bounds.npy"))
+    routes = {
+        (int(origin), int(destination)): np.arange(start, end)
+        for (origin, destination), start, end in zip(pairs, bounds[:-1], bounds[1:])
+    }
+    return Timetable(*columns, aircraft_models=manifest["aircraft_models"],
+                     airport_codes=manifest["airport_codes"], routes=routes)
+
+
+def get_timetable():
+    """The timetable from TIMETABLE_FILE, loaded once per process; None when not configured
+
+    A directory is opened as a compacted timetable, anything else parsed as
+    a schedule file.
+    """
+    global _timetable
+    if not TIMETABLE_FILE:
+        return None
+    with _timetable_lock:
+        if _timetable is None:
+            _timetable = open_timetable(TIMETABLE_FILE) if os.path.isdir(TIMETABLE_FILE) else load_timetable(TIMETABLE_FILE)
+        return _timetable
+
+
+def parse_days_of_operation(text):
+    """Convert "1234567" / "1.3.5.." / "1 3 5" (Monday = 1) to a weekday bitmask"""
+    return sum(1 << (int(char) - 1) for char in set(text) if char in "1234567")
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as schedule_file:
+        for row in csv.DictReader(schedule_file):
+            duration = row["duration"].strip()
+            yield (
+                row["flight_number"].strip().upper(),
+                row["origin"].strip().upper(),
+                row["destination"].strip().upper(),
+                parse_local_time(row["departure_time"].strip()),
+                int(duration) if duration.isdigit() else parse_duration(duration),
+                AIRCRAFT_CODES.get(row["aircraft"].strip().upper(), row["aircraft"].strip()),
+                date.fromisoformat(row["effective_from"].strip()),
+                date.fromisoformat(row["effective_to"].strip()),
+                parse_days_of_operation(row["days_of_operation"])
+            )
+
+
+def _read_ssim(path):
+    # Column positions are SSIM's 1-based record positions minus one
+    with open(path, encoding="ascii", errors="replace") as schedule_file:
+        for line in schedule_file:
+            if not line.startswith("3"):
+                continue
+            departure = _ssim_minutes(line[39:43])
+            arrival = _ssim_minutes(line[61:65])
+            departure_utc = departure - parse_utc_offset(_ssim_offset(line[47:52]))
+            arrival_utc = arrival - parse_utc_offset(_ssim_offset(line[65:70]))
+            aircraft_code = line[72:75].strip()
+            yield (
+                f"{line[2:5].strip()}{int(line[5:9])}",
+                line[36:39],
+                line[54:57],
+                departure,
+                (arrival_utc - departure_utc) % (24 * 60),
+                AIRCRAFT_CODES.get(aircraft_code, aircraft_code),
+                _ssim_date(line[14:21]),
+                _ssim_date(line[21:28]),
+                parse_days_of_operation(line[28:35])
+            )
+
+
+def _ssim_minutes(hhmm):
+    return int(hhmm[:2]) * 60 + int(hhmm[2:])
+
+
+def _ssim_offset(variation):
+    """Convert an SSIM "+0300" UTC variation to "+3:00" """
+    return f"{variation[0]}{variation[1:3]}:{variation[3:5]}"
+
+
+def _ssim_date(text):
+    """Parse an SSIM "01NOV25" date; "00XXX00" means open-ended"""
+    if text.startswith("00XXX"):
+        return date.max
+    return datetime.strptime(text.title(), "%d%b%y").date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact a schedule file into a memory-mappable timetable")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    compact = subcommands.add_parser("compact", help="rebuild the compacted timetable from a schedule file")
+    compact.add_argument("schedule", help="CSV or SSIM schedule file")
+    compact.add_argument("output", help="timetable directory to write (replaced if it exists)")
+    args = parser.parse_args()
+
+    compacted = load_timetable(args.schedule)
+    print(f"{len(compacted)} patterns written to {save_timetable(compacted, args.output)}")
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import threading
+import time
+from data.inventory import add_release_listener, normalize_key, release_cabin_seats, reserve_cabin_seats
+from data.models import WaitlistEntry
+
+# Waitlists per (flight key, cabin). Each is a heap ordered by fare class,
+# frequent-flyer tier and request time, so the next passenger to offer
+# freed seats to is popped in O(log n). Entries that leave the queue are
+# skipped when they reach the top rather than searched for.
+
+# Fare classes and frequent-flyer tiers, highest priority first
+FARE_CLASSES = ("Flex", "Classic", "Saver")
+FREQUENT_FLYER_TIERS = ("Platinum", "Gold", "Silver", "Blue")
+
+# Seconds a waitlisted passenger has to accept offered seats
+OFFER_SECONDS = 30 * 60
+
+_waitlist_lock = threading.Lock()
+_queues = {}
+_entries = {}
+_entry_ids = itertools.count(1)
+
+# Outstanding offers as a heap of (expiry, entry id)
+_offer_expiries = []
+
+# Called with the entry whenever seats are offered to it
+_offer_listeners = []
+
+
+def join_waitlist(flight_key, travel_class, seats, contact, fare_class="Classic", tier=None):
+    """Queue a request for seats; seats already free are offered straight away"""
+    if fare_class not in FARE_CLASSES:
+        raise ValueError(f"Unknown fare class {fare_class}")
+    if seats < 1:
+        raise ValueError("A waitlist request needs at least one seat")
+
+    flight_key = normalize_key(flight_key)
+    with _waitlist_lock:
+        entry = WaitlistEntry(
+            entry_id=next(_entry_ids),
+            flight_key=flight_key,
+            travel_class=travel_class,
+            seats=seats,
+            contact=contact,
+            fare_class=fare_class,
+            tier=tier,
+            requested_at=time.time()
+        )
+        _entries[entry.entry_id] = entry
+        heapq.heappush(_queues.setdefault((flight_key, travel_class), []), (_priority(entry), entry.entry_id))
+
+    offer_freed_seats(flight_key, travel_class)
+    return entry
+
+
+def leave_waitlist(entry_id):
+    """Withdraw a request, returning any seats offered to it"""
+    with _waitlist_lock:
+        entry = _entries.get(entry_id)
+        if entry is None or entry.status not in ("Waiting", "Offered"):
+            return entry
+        offered = entry.status == "Offered"
+        entry.status = "Withdrawn"
+
+    if offered:
+        release_cabin_seats(entry.flight_key, entry.travel_class, entry.seats)
+    return entry
+
+
+def _priority(entry):
+    """Heap order: better fare class, then higher tier, then earlier request"""
+    tier_rank = FREQUENT_FLYER_TIERS.index(entry.tier) if entry.tier in FREQUENT_FLYER_TIERS else len(FREQUENT_FLYER_TIERS)
+    return (FARE_CLASSES.index(entry.fare_class), tier_rank, entry.requested_at, entry.entry_id)
+
+
+def get_waitlist_entry(entry_id):
+    with _waitlist_lock:
+        return _entries.get(entry_id)
+
+
+def waitlist_position(entry_id):
+    """1-based position of a waiting request in its queue, or None"""
+    with _waitlist_lock:
+        entry = _entries.get(entry_id)
+        if entry is None or entry.status != "Waiting":
+            return None
+        queue = _queues[(entry.flight_key, entry.travel_class)]
+        entry_priority = _priority(entry)
+        return 1 + sum(
+            1 for priority, other_id in queue
+            if _entries[other_id].status == "Waiting" and priority < entry_priority
+        )
+
+
+def offer_freed_seats(flight_key, travel_class):
+    """Offer free seats in a cabin to the head of its waitlist, in priority order
+
+    Seats are reserved for each entry offered. The head blocks the queue if
+    its party does not fit, so smaller parties cannot jump it.
+    """
+    expire_offers()
+    cabin = (normalize_key(flight_key), travel_class)
+    offered = []
+
+    with _waitlist_lock:
+        queue = _queues.get(cabin, [])
+        while queue:
+            entry = _entries[queue[0][1]]
+            if entry.status != "Waiting":
+                heapq.heappop(queue)
+                continue
+            if not reserve_cabin_seats(entry.flight_key, travel_class, entry.seats):
+                break
+            heapq.heappop(queue)
+            entry.status = "Offered"
+            entry.offer_expires_at = time.time() + OFFER_SECONDS
+            heapq.heappush(_offer_expiries, (entry.offer_expires_at, entry.entry_id))
+            offered.append(entry)
+        listeners = list(_offer_listeners)
+
+    for entry in offered:
+        for listener in listeners:
+            listener(entry)
+    return offered
+
+
+def accept_offer(entry_id):
+    """Claim offered seats; returns the entry, whose seats stay reserved for the booking"""
+    expire_offers()
+    with _waitlist_lock:
+        entry = _entries.get(entry_id)
+        if entry is None or entry.status != "Offered":
+            return None
+        entry.status = "Accepted"
+        return entry
+
+
+def reopen_offer(entry_id):
+    """Put an accepted offer back on offer, e.g. when its booking could not be stored
+
+    The seats stay reserved for the entry until the offer's original expiry.
+    """
+    with _waitlist_lock:
+        entry = _entries.get(entry_id)
+        if entry is None or entry.status != "Accepted":
+            return entry
+        entry.status = "Offered"
+        heapq.heappush(_offer_expiries, (entry.offer_expires_at, entry.entry_id))
+
+    expire_offers()
+    return entry
+
+
+def expire_offers(now=None):
+    """Return the seats of lapsed offers to their cabins, which re-offers them down the queue"""
+    now = now or time.time()
+    expired = []
+    with _waitlist_lock:
+        while _offer_expiries and _offer_expiries[0][0] <= now:
+            _, entry_id = heapq.heappop(_offer_expiries)
+            entry = _entries[entry_id]
+            if entry.status == "Offered":
+                entry.status = "Expired"
+                expired.append(entry)
+
+    for entry in expired:
+        release_cabin_seats(entry.flight_key, entry.travel_class, entry.seats)
+    return expired
+
+
+def add_offer_listener(listener):
+    """Call listener(entry) whenever seats are offered to a waitlisted request"""
+    with _waitlist_lock:
+        if listener not in _offer_listeners:
+            _offer_listeners.append(listener)
+
+
+# Seats returned by cancellations or lapsed offers go to the waitlist first
+add_release_listener(offer_freed_seats)
@@ -1,6 +1,11 @@
 import streamlit as st
 from datetime import datetime, timedelta
-import random
+from data.inventory import flight_key, get_flight
+from data.status import get_flight_status
+from utils import service
+
+# Rows of the seat map offered at check-in
+CHECKIN_SEAT_MAP_ROWS = 8
 
 def show():
     st.markdown("## 🎫 Online Check-In")
@@ -43,9 +48,8 @@ def show():
     # Find booking button
     if st.button("Find My Booking", type="primary", use_container_width=True, key="find_booking_checkin"):
         if booking_ref and last_name:
-            # Simulate booking lookup
             with st.spinner("Looking up your booking..."):
-                booking_found = simulate_booking_lookup(booking_ref, last_name)
+                booking_found = lookup_booking(booking_ref, last_name)
             
             if booking_found:
                 st.session_state.checkin_booking = booking_found
@@ -60,29 +64,43 @@ def show():
     if st.session_state.get('checkin_booking'):
         display_checkin_details()
 
-def simulate_booking_lookup(booking_ref, last_name):
-    """Simulate booking lookup"""
-    # In a real system, this would query the booking database
-    if len(booking_ref) >= 6 and len(last_name) >= 2:
-        return {
-            "booking_reference": booking_ref,
-            "passenger_name": f"John {last_name}",
-            "flight_number": f"KQ{random.randint(100, 999)}",
-            "route": "Nairobi → London",
-            "departure_date": "2025-07-10",
-            "departure_time": "10:45",
-            "arrival_time": "15:30",
-            "seat": "23A",
-            "gate": "A12",
-            "terminal": "1A",
-            "boarding_time": "10:15",
-            "class": "Economy",
-            "status": "Confirmed",
-            "baggage_allowance": "23kg",
-            "meal_preference": "Standard",
-            "checkin_available": True
-        }
-    return None
+def lookup_booking(booking_ref, last_name):
+    """Look up a booking through the booking service, summarized for the check-in form"""
+    try:
+        booking = service.retrieve(booking_ref, last_name)
+    except service.NotFound:
+        return None
+    
+    lead_index = next(i for i, p in enumerate(booking.passengers) if p.last_name.strip().lower() == last_name.strip().lower())
+    passenger = booking.passengers[lead_index]
+    flight = get_flight(booking.flights[0])
+    flight_status = get_flight_status(flight.flight_number, flight.departure_date)
+    
+    return {
+        "booking_reference": booking.booking_reference,
+        "last_name": last_name,
+        "lead_index": lead_index,
+        "passenger_name": passenger.full_name,
+        "passengers": [
+            {"name": p.full_name, "type": p.passenger_type, "seat": p.seat or "Not assigned"}
+            for p in booking.passengers
+        ],
+        "flight_key": flight_key(flight),
+        "flight_number": flight.flight_number,
+        "route": f"{flight.origin} → {flight.destination}",
+        "departure_date": str(flight.departure_date),
+        "departure_time": flight.departure_time,
+        "arrival_time": flight.arrival_time,
+        "seat": passenger.seat or "Not assigned",
+        "gate": flight_status["gate"],
+        "terminal": flight_status["terminal"],
+        "boarding_time": service.boarding_time(flight),
+        "class": passenger.travel_class,
+        "status": booking.status,
+        "baggage_allowance": "32kg" if passenger.travel_class != "Economy" else "23kg",
+        "meal_preference": passenger.meal_preference,
+        "checkin_available": booking.status != "Cancelled"
+    }
 
 def display_checkin_details():
     """Display check-in details and options"""
@@ -111,6 +129,13 @@ def display_checkin_details():
         st.markdown(f"**Baggage:** {booking['baggage_allowance']}")
         st.markdown(f"**Status:** ✅ {booking['status']}")
     
+    # Everyone on the booking is checked in together
+    if len(booking['passengers']) > 1:
+        st.markdown(f"### 👨‍👩‍👧 Travelling Together ({len(booking['passengers'])} passengers)")
+        for passenger in booking['passengers']:
+            st.markdown(f"• {passenger['name']} ({passenger['type']}) - Seat: {passenger['seat']}")
+        st.caption("Passengers without a seat are seated together when you complete check-in.")
+    
     # Passenger information
     st.markdown("### 👤 Passenger Information")
     
@@ -144,8 +169,8 @@ def display_checkin_details():
     with col1:
         st.markdown(f"**Current Seat:** {booking['seat']}")
         
-        # Seat map (simplified)
-        display_simplified_seat_map()
+        # Seat map of the booking's cabin, as every other session sees it
+        display_checkin_seat_map(booking)
     
     with col2:
         st.markdown("**Seat Information**")
@@ -247,31 +272,44 @@ def display_checkin_details():
             st.success("✅ Changes saved successfully!")
     
     with col2:
-        if st.button("🎫 Complete Check-In", type="primary", use_container_width=True, key="complete_checkin"):
+        checkin_label = "🎫 Complete Check-In" if len(booking['passengers']) == 1 else f"🎫 Check In All {len(booking['passengers'])} Passengers"
+        if st.button(checkin_label, type="primary", use_container_width=True, key="complete_checkin"):
             if booking['checkin_available']:
                 complete_checkin(booking, phone_number, email_address, send_options)
             else:
                 st.error("Check-in not available yet. Please try again 24 hours before departure.")
 
-def display_simplified_seat_map():
-    """Display a simplified seat map for check-in"""
+def display_checkin_seat_map(booking):
+    """Display the first rows of the cabin's live seat map with seats free to pick"""
     st.markdown("**Select Your Seat:**")
     
-    # Simple seat grid
-    seats = ["21A", "21B", "21C", "21D", "21E", "21F"]
-    available_seats = ["21A", "21C", "21E", "21F"]
+    seat_map = service.get_seat_map(booking['flight_key'], booking['class'])
     
-    cols = st.columns(6)
+    rows = {}
+    for seat in seat_map.seats:
+        rows.setdefault(seat['row'], []).append(seat)
     
-    for i, seat in enumerate(seats):
-        with cols[i]:
-            if seat in available_seats:
-                if st.button(f"✅\n{seat}", key=f"seat_select_{seat}"):
-                    st.session_state.checkin_booking['seat'] = seat
-                    st.success(f"Seat {seat} selected!")
-                    st.rerun()
-            else:
-                st.button(f"❌\n{seat}", disabled=True, key=f"seat_occupied_{seat}")
+    # Rows with a free seat (or the seat already chosen) come first
+    shown = [row for row in sorted(rows) if any(seat['available'] or seat['seat_id'] == booking['seat'] for seat in rows[row])]
+    
+    for row in shown[:CHECKIN_SEAT_MAP_ROWS]:
+        cols = st.columns(len(rows[row]) + 1)
+        
+        with cols[0]:
+            st.markdown(f"**{row}**")
+        
+        for i, seat in enumerate(rows[row]):
+            seat_id = seat['seat_id']
+            with cols[i + 1]:
+                if seat_id == booking['seat']:
+                    st.button(f"🟡\n{seat_id}", disabled=True, key=f"seat_selected_{seat_id}")
+                elif seat['available']:
+                    if st.button(f"✅\n{seat_id}", key=f"seat_select_{seat_id}"):
+                        st.session_state.checkin_booking['seat'] = seat_id
+                        st.success(f"Seat {seat_id} selected!")
+                        st.rerun()
+                else:
+                    st.button(f"❌\n{seat_id}", disabled=True, key=f"seat_occupied_{seat_id}")
 
 def complete_checkin(booking, phone, email, send_options):
     """Complete the check-in process"""
@@ -279,17 +317,27 @@ def complete_checkin(booking, phone, email, send_options):
         st.error("Please provide at least one contact method for your boarding pass.")
         return
     
-    # Simulate check-in completion
     with st.spinner("Completing your check-in..."):
-        # Generate boarding pass
-        boarding_pass = generate_boarding_pass(booking)
-        st.session_state.boarding_pass = boarding_pass
-    
-    st.success("🎉 Check-in completed successfully!")
+        # A seat picked on the map is the lead passenger's; everyone else is seated together
+        seat_requests = {}
+        if booking['seat'] != "Not assigned":
+            seat_requests[booking['lead_index']] = booking['seat']
+        try:
+            boarding_passes = service.check_in_group(booking['booking_reference'], booking['last_name'], seat_requests)
+        except service.ServiceError as exc:
+            for error in exc.errors or [str(exc)]:
+                st.error(error)
+            return
+        st.session_state.boarding_passes = boarding_passes
+        # The booking as checked in, with everyone's seats and its new status
+        st.session_state.checkin_booking = lookup_booking(booking['booking_reference'], booking['last_name'])
+    
+    st.success(f"🎉 Check-in completed for {len(boarding_passes)} passenger(s)!")
     st.balloons()
     
-    # Display boarding pass
-    display_boarding_pass(boarding_pass)
+    # Display boarding passes
+    for index, boarding_pass in enumerate(boarding_passes):
+        display_boarding_pass(boarding_pass, index)
     
     # Send confirmation
     if "SMS" in send_options and phone:
@@ -304,27 +352,9 @@ def complete_checkin(booking, phone, email, send_options):
     st.info("🛂 Have your passport and boarding pass ready at security")
     st.info("🚪 Boarding typically begins 45 minutes before departure")
 
-def generate_boarding_pass(booking):
-    """Generate boarding pass information"""
-    return {
-        "passenger_name": booking['passenger_name'],
-        "flight_number": booking['flight_number'],
-        "route": booking['route'],
-        "departure_date": booking['departure_date'],
-        "departure_time": booking['departure_time'],
-        "boarding_time": booking['boarding_time'],
-        "seat": booking['seat'],
-        "gate": booking['gate'],
-        "terminal": booking['terminal'],
-        "class": booking['class'],
-        "booking_reference": booking['booking_reference'],
-        "barcode": f"*{booking['booking_reference']}*{booking['flight_number']}*",
-        "sequence": random.randint(1, 200)
-    }
-
-def display_boarding_pass(boarding_pass):
-    """Display the boarding pass"""
-    st.markdown("### 🎫 Your Boarding Pass")
+def display_boarding_pass(boarding_pass, index=0):
+    """Display a boarding pass"""
+    st.markdown(f"### 🎫 Boarding Pass - {boarding_pass.passenger_name}")
     
     # Boarding pass design
     st.markdown(f"""
@@ -342,8 +372,8 @@ def display_boarding_pass(boarding_pass):
                 <p>BOARDING PASS</p>
             </div>
             <div style="text-align: right;">
-                <h3>{boarding_pass['flight_number']}</h3>
-                <p>{boarding_pass['departure_date']}</p>
+                <h3>{boarding_pass.flight_number}</h3>
+                <p>{boarding_pass.departure_date}</p>
             </div>
         </div>
         
@@ -352,32 +382,32 @@ def display_boarding_pass(boarding_pass):
         <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 20px;">
             <div>
                 <strong>PASSENGER</strong><br>
-                {boarding_pass['passenger_name']}<br><br>
+                {boarding_pass.passenger_name}<br><br>
                 <strong>ROUTE</strong><br>
-                {boarding_pass['route']}
+                {boarding_pass.route}
             </div>
             <div>
                 <strong>DEPARTURE</strong><br>
-                {boarding_pass['departure_time']}<br><br>
+                {boarding_pass.departure_time}<br><br>
                 <strong>BOARDING</strong><br>
-                {boarding_pass['boarding_time']}
+                {boarding_pass.boarding_time}
             </div>
             <div>
                 <strong>SEAT</strong><br>
-                {boarding_pass['seat']}<br><br>
+                {boarding_pass.seat}<br><br>
                 <strong>GATE</strong><br>
-                {boarding_pass['gate']}
+                {boarding_pass.gate}
             </div>
         </div>
         
         <hr style="border-color: white; margin: 20px 0;">
         
         <div style="text-align: center;">
-            <p>BOOKING REFERENCE: {boarding_pass['booking_reference']}</p>
+            <p>BOOKING REFERENCE: {boarding_pass.booking_reference}</p>
             <p style="font-family: monospace; font-size: 18px;">
-                {boarding_pass['barcode']}
+                {boarding_pass.barcode}
             </p>
-            <p>Sequence: {boarding_pass['sequence']} | Class: {boarding_pass['class']}</p>
+            <p>Sequence: {boarding_pass.sequence} | Class: {boarding_pass.travel_class}</p>
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -386,13 +416,13 @@ def display_boarding_pass(boarding_pass):
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📄 Download PDF", use_container_width=True, key="download_pdf_checkin"):
+        if st.button("📄 Download PDF", use_container_width=True, key=f"download_pdf_checkin_{index}"):
             st.info("PDF boarding pass downloaded")
     
     with col2:
-        if st.button("📱 Add to Wallet", use_container_width=True, key="add_wallet_checkin"):
+        if st.button("📱 Add to Wallet", use_container_width=True, key=f"add_wallet_checkin_{index}"):
             st.info("Added to mobile wallet")
     
     with col3:
-        if st.button("📧 Email Again", use_container_width=True, key="email_again_checkin"):
+        if st.button("📧 Email Again", use_container_width=True, key=f"email_again_checkin_{index}"):
             st.info("Boarding pass emailed again")
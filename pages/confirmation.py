@@ -2,6 +2,11 @@ import streamlit as st
 import qrcode
 from io import BytesIO
 import base64
+from data.inventory import get_flights
+from utils.metrics import REGISTRY
+from utils.profiling import profiled
+
+QR_RENDER_SECONDS = REGISTRY.histogram("kq_qr_render_seconds", "Time to render a booking QR code")
 
 def show():
     st.markdown("## ✅ Booking Confirmation")
@@ -16,11 +21,11 @@ def show():
     st.success("🎉 Your booking has been confirmed!")
     
     # Booking reference
-    st.markdown(f"### Booking Reference: `{booking['booking_reference']}`")
+    st.markdown(f"### Booking Reference: `{booking.booking_reference}`")
     st.markdown("*Please save this reference number for your records*")
     
     # Generate QR code for booking reference
-    qr_code = generate_qr_code(booking['booking_reference'])
+    qr_code = generate_qr_code(booking.booking_reference)
     
     col1, col2 = st.columns([2, 1])
     
@@ -36,10 +41,10 @@ def show():
         
         # Quick action buttons
         if st.button("📧 Email Confirmation", use_container_width=True, key="email_confirmation"):
-            st.info("Confirmation email sent to " + booking['contact']['email'])
+            st.info("Confirmation email sent to " + booking.contact['email'])
         
         if st.button("📱 SMS Confirmation", use_container_width=True, key="sms_confirmation"):
-            st.info("SMS confirmation sent to " + booking['contact']['phone'])
+            st.info("SMS confirmation sent to " + booking.contact['phone'])
         
         if st.button("📄 Download PDF", use_container_width=True, key="download_pdf_confirmation"):
             st.info("PDF ticket downloaded (simulation)")
@@ -47,8 +52,8 @@ def show():
     # Flight tickets
     st.markdown("### 🎫 Your Tickets")
     
-    for i, ticket in enumerate(booking['tickets']):
-        with st.expander(f"Ticket {i + 1} - {ticket['passenger_name']}", expanded=i == 0):
+    for i, ticket in enumerate(booking.tickets):
+        with st.expander(f"Ticket {i + 1} - {ticket.passenger_name}", expanded=i == 0):
             display_ticket_details(ticket, booking)
     
     # Important information
@@ -96,7 +101,7 @@ def show():
     st.markdown("### 🌤️ Destination Weather")
     
     # Simulate weather information
-    destinations = [flight['destination'] for flight in booking['flights']]
+    destinations = [flight.destination for flight in get_flights(booking.flights)]
     unique_destinations = list(set(destinations))
     
     for dest in unique_destinations:
@@ -144,6 +149,7 @@ def show():
         # Clear current booking
         st.session_state.current_booking = None
         st.session_state.search_results = None
+        st.session_state.result_pages = {}
         st.session_state.selected_flights = {}
         st.session_state.passengers = []
         st.session_state.booking_data = {}
@@ -159,24 +165,24 @@ def display_booking_details(booking):
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown(f"**Booking Date:** {booking['created_at'][:10]}")
-        st.markdown(f"**Status:** {booking['status']}")
-        st.markdown(f"**Payment Status:** {booking['payment_status']}")
+        st.markdown(f"**Booking Date:** {booking.created_at[:10]}")
+        st.markdown(f"**Status:** {booking.status}")
+        st.markdown(f"**Payment Status:** {booking.payment_status}")
     
     with col2:
-        st.markdown(f"**Total Amount:** ${booking['total_price']}")
-        st.markdown(f"**Passengers:** {len(booking['passengers'])}")
-        st.markdown(f"**Contact:** {booking['contact']['email']}")
+        st.markdown(f"**Total Amount:** ${booking.total_price}")
+        st.markdown(f"**Passengers:** {len(booking.passengers)}")
+        st.markdown(f"**Contact:** {booking.contact['email']}")
     
     # Flight details
     st.markdown("**Flight Details:**")
-    for i, flight in enumerate(booking['flights']):
+    for i, flight in enumerate(get_flights(booking.flights)):
         st.markdown(f"""
-        **Flight {i + 1}: {flight['flight_number']}**
-        - Route: {flight['origin']} → {flight['destination']}
-        - Date: {flight['departure_date']}
-        - Time: {flight['departure_time']} - {flight['arrival_time']}
-        - Aircraft: {flight['aircraft']}
+        **Flight {i + 1}: {flight.flight_number}**
+        - Route: {flight.origin} → {flight.destination}
+        - Date: {flight.departure_date}
+        - Time: {flight.departure_time} - {flight.arrival_time}
+        - Aircraft: {flight.aircraft}
         """)
 
 def display_ticket_details(ticket, booking):
@@ -184,22 +190,28 @@ def display_ticket_details(ticket, booking):
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown(f"**Ticket Number:** {ticket['ticket_number']}")
-        st.markdown(f"**Passenger:** {ticket['passenger_name']}")
-        st.markdown(f"**Class:** {ticket['class']}")
-        st.markdown(f"**Seat:** {ticket['seat']}")
+        st.markdown(f"**Ticket Number:** {ticket.ticket_number}")
+        st.markdown(f"**Passenger:** {ticket.passenger_name}")
+        st.markdown(f"**Class:** {ticket.travel_class}")
+        st.markdown(f"**Seat:** {ticket.seat}")
     
     with col2:
         st.markdown("**Barcode Simulation:**")
-        st.code(ticket['ticket_number'], language=None)
+        st.code(ticket.ticket_number, language=None)
         
-        if ticket['special_requests']:
+        if ticket.special_requests:
             st.markdown("**Special Requests:**")
-            for request in ticket['special_requests']:
+            for request in ticket.special_requests:
                 st.markdown(f"• {request}")
 
+@profiled()
 def generate_qr_code(booking_reference):
     """Generate QR code for booking reference"""
+    with QR_RENDER_SECONDS.time():
+        return _render_qr_code(booking_reference)
+
+def _render_qr_code(booking_reference):
+    """Render a booking reference as a base64 PNG data URI"""
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
     qr.add_data(f"Kenya Airways Booking: {booking_reference}")
     qr.make(fit=True)
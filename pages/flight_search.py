@@ -1,8 +1,29 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from data.flights import DESTINATIONS, search_flights
+from data.airports import AIRPORT_REGISTRY
+from data.flights import DESTINATION_CITIES
+from data.inventory import cabin_seats_unsold, flight_key, get_flights
+from data.results import ResultSet
+from utils import service
+from utils.images import get_thumbnail
 from utils.session import save_search_params, get_search_params
 
+# Result cards per page; only the page shown is rendered
+RESULTS_PAGE_SIZE = 10
+
+# Filters whose choices come from a search's results, reset when a new search runs
+RESULT_FILTERS = ("price", "duration", "stops", "aircraft")
+
+# Result orderings offered, as ResultSet sort keys (ties keep generated order)
+SORT_OPTIONS = {
+    "Recommended": (),
+    "Lowest price": ("price", "departure"),
+    "Earliest departure": ("departure",),
+    "Latest departure": ("-departure",),
+    "Shortest duration": ("duration", "price"),
+    "Fewest stops": ("stops", "price")
+}
+
 def show():
     st.markdown("## 🔍 Search Flights")
     
@@ -20,17 +41,8 @@ def show():
         )
         
         # Origin and destination
-        origin = st.selectbox(
-            "From",
-            list(DESTINATIONS.keys()),
-            index=list(DESTINATIONS.keys()).index(params['origin'])
-        )
-        
-        destination = st.selectbox(
-            "To",
-            [city for city in DESTINATIONS.keys() if city != origin],
-            index=[city for city in DESTINATIONS.keys() if city != origin].index(params['destination']) if params['destination'] != origin else 0
-        )
+        origin = airport_picker("From", params['origin'], "origin")
+        destination = airport_picker("To", params['destination'], "destination", exclude=origin)
         
         # Swap button
         if st.button("🔄 Swap", key="swap_destinations"):
@@ -94,11 +106,20 @@ def show():
         
         # Perform search
         with st.spinner("Searching for flights..."):
-            results = search_flights(
+            results = service.search(
                 origin, destination, departure_date, return_date,
-                adults + children + infants, travel_class
-            )
-            st.session_state.search_results = results
+                adults + children, travel_class  # lap infants do not need a seat
+            ) or {}
+            # Keep only flight keys and sortable columns in the session; flights live in the shared inventory
+            st.session_state.search_results = {
+                direction: ResultSet.from_flights(flights, travel_class)
+                for direction, flights in results.items()
+            }
+            # Every result is sorted and filtered before paging, so pages start again from the first
+            st.session_state.result_pages = {direction: 0 for direction in results}
+            for direction in results:
+                for name in RESULT_FILTERS:
+                    st.session_state.pop(f"{direction}_{name}", None)
         
         st.success("Flight search completed!")
         st.rerun()
@@ -107,6 +128,26 @@ def show():
     if st.session_state.search_results:
         display_search_results()
 
+def airport_picker(label, current_city, key, exclude=None):
+    """Pick a served city, narrowed by type-ahead over city, airport name and code"""
+    query = st.text_input(
+        f"{label} - search city, airport or code",
+        key=f"{key}_airport_query",
+        placeholder="e.g. Lon, JFK, Kotoka"
+    )
+    
+    if query:
+        cities = [airport['city'] for airport in AIRPORT_REGISTRY.complete(query, served_only=True)]
+    else:
+        cities = list(DESTINATION_CITIES)
+    cities = [city for city in cities if city != exclude]
+    
+    if not cities:
+        st.warning(f"No airports match '{query}'")
+        cities = [city for city in DESTINATION_CITIES if city != exclude]
+    
+    return st.selectbox(label, cities, index=cities.index(current_city) if current_city in cities else 0)
+
 def display_search_results():
     """Display flight search results"""
     results = st.session_state.search_results
@@ -116,56 +157,142 @@ def display_search_results():
     
     # Outbound flights
     st.markdown("### 🛫 Outbound Flights")
-    for i, flight in enumerate(results['outbound']):
-        display_flight_card(flight, f"outbound_{i}")
+    display_result_list(results['outbound'], "outbound")
     
     # Return flights (if applicable)
     if 'return' in results:
         st.markdown("### 🛬 Return Flights")
-        for i, flight in enumerate(results['return']):
-            display_flight_card(flight, f"return_{i}")
+        display_result_list(results['return'], "return")
+
+def display_result_list(result_set, direction):
+    """Sort and filter every result of one direction, then list the page shown, without searching again"""
+    if not len(result_set):
+        display_no_flights()
+        return
+    
+    shown = display_result_controls(result_set, direction)
+    page_count = max(1, -(-len(shown) // RESULTS_PAGE_SIZE))
+    page = min(st.session_state.result_pages.get(direction, 0), page_count - 1)
+    start = page * RESULTS_PAGE_SIZE
+    
+    # Only the flights on the page shown are looked up
+    for i, flight in enumerate(get_flights(shown.keys[start:start + RESULTS_PAGE_SIZE]), start):
+        display_flight_card(flight, f"{direction}_{i}")
+    if not len(shown):
+        st.info("No flights match these filters.")
+        return
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page > 0 and st.button("← Previous", key=f"{direction}_previous_page"):
+            st.session_state.result_pages[direction] = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page + 1} of {page_count}")
+    with col3:
+        if page + 1 < page_count and st.button("Next →", key=f"{direction}_next_page"):
+            st.session_state.result_pages[direction] = page + 1
+            st.rerun()
+
+def display_result_controls(result_set, direction):
+    """Sort order and filters for a result list; returns the matching results in order"""
+    facets = result_set.facets()
+    
+    # Results are re-sorted and re-filtered as a whole, so any change starts again from the first page
+    on_change = {'on_change': show_first_page, 'args': (direction,)}
+    
+    sort_by = st.selectbox("Sort by", list(SORT_OPTIONS), key=f"{direction}_sort", **on_change)
+    
+    filters = {}
+    with st.expander("Filter flights"):
+        price_bounds = result_set.bounds("price")
+        if price_bounds and price_bounds[0] < price_bounds[1]:
+            filters['price'] = st.slider(
+                "Price ($)", int(price_bounds[0]), int(price_bounds[1]),
+                (int(price_bounds[0]), int(price_bounds[1])), key=f"{direction}_price", **on_change
+            )
+        
+        departure_hours = st.slider("Departure time", 0, 24, (0, 24), format="%d:00", key=f"{direction}_departure",
+                                    **on_change)
+        filters['departure'] = (departure_hours[0] * 60, departure_hours[1] * 60)
+        
+        duration_bounds = result_set.bounds("duration")
+        if duration_bounds[0] < duration_bounds[1]:
+            longest = st.slider(
+                "Maximum duration (hours)", duration_bounds[0] // 60, -(-duration_bounds[1] // 60),
+                -(-duration_bounds[1] // 60), key=f"{direction}_duration", **on_change
+            )
+            filters['duration'] = (0, longest * 60)
+        
+        filters['stops'] = st.multiselect(
+            "Stops", list(facets['stops']), default=list(facets['stops']),
+            format_func=lambda stops: f"{'Direct' if stops == 0 else f'{stops} stop(s)'} ({facets['stops'][stops]})",
+            key=f"{direction}_stops", **on_change
+        )
+        filters['aircraft'] = st.multiselect(
+            "Aircraft", list(facets['aircraft']), default=list(facets['aircraft']),
+            format_func=lambda model: f"{model} ({facets['aircraft'][model]})",
+            key=f"{direction}_aircraft", **on_change
+        )
+        st.caption("Seats left: " + ", ".join(f"{cabin} on {count} flight(s)" for cabin, count in facets['cabins'].items()))
+    
+    shown = result_set.filter(**filters).sort(*SORT_OPTIONS[sort_by])
+    st.caption(f"Showing {len(shown)} of {len(result_set)} flights")
+    return shown
+
+def show_first_page(direction):
+    """Go back to the first page of a direction's results"""
+    st.session_state.result_pages[direction] = 0
+
+def display_no_flights():
+    """Explain an empty result list"""
+    params = get_search_params()
+    seats = params['adults'] + params['children']
+    st.info(f"No flights have {seats} {params['travel_class']} seat(s) left on this date. "
+            "Try another date or cabin.")
 
-def display_flight_card(flight, flight_key):
+def display_flight_card(flight, card_key):
     """Display individual flight card"""
     col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
     
     with col1:
-        st.markdown(f"**{flight['flight_number']}**")
-        st.markdown(f"{flight['origin']} → {flight['destination']}")
-        st.markdown(f"🕐 {flight['departure_time']} - {flight['arrival_time']}")
-        st.markdown(f"⏱️ {flight['duration']}")
+        st.markdown(f"**{flight.flight_number}**")
+        st.markdown(f"{flight.origin} → {flight.destination}")
+        st.markdown(f"🕐 {flight.departure_time} - {flight.arrival_time}")
+        st.markdown(f"⏱️ {flight.duration}")
         
-        if flight['stops'] > 0:
-            st.markdown(f"🔄 {flight['stops']} stop(s)")
+        if flight.stops > 0:
+            st.markdown(f"🔄 {flight.stops} stop(s)")
         else:
             st.markdown("✈️ Direct flight")
     
     with col2:
         st.markdown("**Aircraft**")
-        st.markdown(flight['aircraft'])
-        st.image(flight['aircraft_image'], width=150)
+        st.markdown(flight.aircraft)
+        st.image(get_thumbnail(flight.aircraft_image, 150), width=150)
     
     with col3:
         st.markdown("**Amenities**")
-        if flight['meal_service']:
+        if flight.meal_service:
             st.markdown("🍽️ Meal service")
-        if flight['wifi_available']:
+        if flight.wifi_available:
             st.markdown("📶 WiFi available")
-        if flight['entertainment']:
+        if flight.entertainment:
             st.markdown("🎬 Entertainment")
     
     with col4:
         travel_class = get_search_params()['travel_class']
-        price = flight['prices'][travel_class]
-        seats_available = flight['seats_available'][travel_class]
+        price = flight.prices[travel_class]
+        # Seats as on the seat map; a flight listed with none left still sells its overbooking allowance
+        seats_available = cabin_seats_unsold(flight_key(flight), travel_class)
         
         st.markdown(f"**${price}**")
         st.markdown(f"per person")
-        st.markdown(f"💺 {seats_available} seats left")
+        st.markdown(f"💺 {seats_available} seats left" if seats_available else "💺 Last seats")
         
-        if st.button(f"Select Flight", key=f"select_{flight_key}"):
-            st.session_state.selected_flights[flight_key.split('_')[0]] = flight
-            st.success(f"Flight {flight['flight_number']} selected!")
+        if st.button(f"Select Flight", key=f"select_{card_key}"):
+            st.session_state.selected_flights[card_key.split('_')[0]] = flight_key(flight)
+            st.success(f"Flight {flight.flight_number} selected!")
             st.rerun()
     
     st.markdown("---")
@@ -1,7 +1,25 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import random
-from data.flights import get_flight_status, DESTINATIONS
+import pandas as pd
+from data.flights import DESTINATION_CITIES
+from data.status import HUB_CODE, get_flight_status, get_departure_board, get_arrival_board, board_snapshot, diff_board
+from data.status_feed import get_status_feed
+from data.schedule_time import format_local_time, parse_local_time
+from utils.alerts import ALERT_TYPES, get_alert_dispatcher
+
+# Seconds between live board refreshes
+BOARD_REFRESH_SECONDS = 30
+
+BOARD_STATUS_EMOJI = {
+    "On Time": "🟢",
+    "Boarding": "🔵",
+    "Delayed": "🟡",
+    "Departed": "✈️",
+    "En Route": "✈️",
+    "Arrived": "🏁",
+    "Cancelled": "🔴"
+}
 
 def show():
     st.markdown("## 📊 Flight Status")
@@ -30,10 +48,10 @@ def show():
     with col2:
         # Search by route
         st.markdown("**Search by Route**")
-        origin = st.selectbox("From", list(DESTINATIONS.keys()), key="status_origin")
+        origin = st.selectbox("From", DESTINATION_CITIES, key="status_origin")
         destination = st.selectbox(
             "To", 
-            [city for city in DESTINATIONS.keys() if city != origin],
+            [city for city in DESTINATION_CITIES if city != origin],
             key="status_destination"
         )
         
@@ -47,6 +65,10 @@ def show():
     st.markdown("### 🛬 Live Arrivals - Nairobi (NBO)")
     display_arrival_board()
     
+    feed = get_status_feed()
+    if feed:
+        display_feed_health(feed)
+    
     # Flight alerts
     st.markdown("### 🔔 Flight Alerts")
     
@@ -55,32 +77,66 @@ def show():
     with col1:
         st.markdown("**Set Up Flight Alerts**")
         alert_flight = st.text_input("Flight Number for Alerts", key="alert_flight")
-        alert_email = st.text_input("Email for Notifications", key="alert_email")
+        alert_date = st.date_input("Flight Date for Alerts", value=datetime.now().date(), key="alert_date")
+        alert_email = st.text_input("Email or Mobile Number for Notifications", key="alert_email")
         
         alert_types = st.multiselect(
             "Alert Types",
-            ["Departure Delays", "Gate Changes", "Boarding Calls", "Cancellations"],
+            ALERT_TYPES,
             key="alert_types"
         )
         
         if st.button("Set Alert", key="set_alert"):
             if alert_flight and alert_email:
-                st.success(f"Alert set for flight {alert_flight}")
+                channel = "sms" if alert_email.startswith("+") else "email"
+                get_alert_dispatcher().registry.subscribe(alert_flight, alert_date, alert_email, channel, alert_types)
+                st.success(f"Alert set for flight {alert_flight.strip().upper()} on {alert_date}")
             else:
                 st.error("Please enter flight number and email")
     
     with col2:
         st.markdown("**Current Alerts**")
-        # Simulate existing alerts
-        st.info("📱 SMS alerts enabled for KQ100")
-        st.info("📧 Email alerts enabled for KQ738")
+        display_current_alerts(alert_email)
+
+def display_feed_health(feed):
+    """Display lag and backpressure of the operational status feed"""
+    metrics = feed.get_metrics()
+    lag = metrics['last_lag_seconds']
+    lag_text = f"{lag:.1f}s" if lag is not None else "n/a"
+    st.caption(
+        f"Ops feed: {metrics['events_applied']} updates applied · lag {lag_text} · "
+        f"buffer {metrics['buffer_depth']}/{metrics['buffer_capacity']} · "
+        f"{metrics['backpressure_waits']} backpressure waits"
+    )
+
+def display_current_alerts(contact):
+    """Display the alerts held by a contact"""
+    if not contact:
+        st.info("Enter your email or mobile number to see your alerts")
+        return
+    
+    registry = get_alert_dispatcher().registry
+    subscriptions = registry.subscriptions_for(contact)
+    
+    if not subscriptions:
+        st.info(f"No alerts set for {contact}")
+        return
+    
+    for subscription in subscriptions:
+        col1, col2 = st.columns([3, 1])
         
-        if st.button("Manage All Alerts", key="manage_alerts"):
-            st.info("Redirecting to alert management...")
+        with col1:
+            channel_label = "📱 SMS" if subscription['channel'] == "sms" else "📧 Email"
+            st.info(f"{channel_label} alerts enabled for {subscription['flight_number']} on {subscription['departure_date']}")
+        
+        with col2:
+            if st.button("Remove", key=f"remove_alert_{subscription['flight_number']}_{subscription['departure_date']}"):
+                registry.unsubscribe(subscription['flight_number'], subscription['departure_date'], contact)
+                st.rerun()
 
 def display_flight_status(flight_number, flight_date):
     """Display detailed flight status"""
-    status_info = get_flight_status(flight_number)
+    status_info = get_flight_status(flight_number, flight_date)
     
     st.markdown(f"### Flight {flight_number} Status")
     
@@ -114,11 +170,12 @@ def display_flight_status(flight_number, flight_date):
     
     with col2:
         st.markdown("**Timing**")
-        # Simulate schedule times
-        scheduled_dep = "10:45"
-        scheduled_arr = "15:30"
+        scheduled_dep = status_info['scheduled_departure']
+        scheduled_arr = status_info['scheduled_arrival']
         
-        if status_info['delay_minutes'] > 0:
+        if not scheduled_dep:
+            st.markdown("Schedule not available")
+        elif status_info['delay_minutes'] > 0:
             actual_dep_time = calculate_delayed_time(scheduled_dep, status_info['delay_minutes'])
             actual_arr_time = calculate_delayed_time(scheduled_arr, status_info['delay_minutes'])
             
@@ -141,7 +198,10 @@ def display_flight_status(flight_number, flight_date):
         recent_update = random.choice(updates)
         st.info(f"Latest: {recent_update}")
         
-        st.markdown("*Last updated: 2 minutes ago*")
+        if status_info['updated_at']:
+            st.markdown(f"*Last updated: {status_info['updated_at'][11:16]}*")
+        else:
+            st.markdown("*No operational updates yet*")
     
     # Flight path visualization (simplified)
     st.markdown("### ✈️ Flight Progress")
@@ -187,96 +247,69 @@ def display_route_flights(origin, destination, flight_date):
             status_color = "🟢" if flight['status'] == "On Time" else "🟡"
             st.markdown(f"{status_color} {flight['status']}")
 
+@st.fragment(run_every=BOARD_REFRESH_SECONDS)
 def display_departure_board():
     """Display live departure board"""
-    departures = [
-        {"flight": "KQ100", "destination": "London", "time": "10:45", "gate": "A12", "status": "Boarding"},
-        {"flight": "KQ200", "destination": "Dubai", "time": "14:20", "gate": "B5", "status": "On Time"},
-        {"flight": "KQ300", "destination": "Amsterdam", "time": "18:30", "gate": "A8", "status": "Delayed"},
-        {"flight": "KQ400", "destination": "Mumbai", "time": "22:15", "gate": "C3", "status": "On Time"},
-    ]
-    
-    # Create a table-like display
-    col1, col2, col3, col4, col5 = st.columns([1, 2, 1, 1, 1])
-    
-    # Headers
-    with col1:
-        st.markdown("**Flight**")
-    with col2:
-        st.markdown("**Destination**")
-    with col3:
-        st.markdown("**Time**")
-    with col4:
-        st.markdown("**Gate**")
-    with col5:
-        st.markdown("**Status**")
-    
-    st.markdown("---")
-    
-    # Data rows
-    for dep in departures:
-        col1, col2, col3, col4, col5 = st.columns([1, 2, 1, 1, 1])
-        
-        with col1:
-            st.markdown(dep["flight"])
-        with col2:
-            st.markdown(dep["destination"])
-        with col3:
-            st.markdown(dep["time"])
-        with col4:
-            st.markdown(dep["gate"])
-        with col5:
-            status_emoji = {"On Time": "🟢", "Boarding": "🔵", "Delayed": "🟡"}.get(dep["status"], "❓")
-            st.markdown(f"{status_emoji} {dep['status']}")
+    departures = get_departure_board(HUB_CODE)
+    display_board(departures, "departures", "Destination")
 
+@st.fragment(run_every=BOARD_REFRESH_SECONDS)
 def display_arrival_board():
     """Display live arrival board"""
-    arrivals = [
-        {"flight": "KQ101", "origin": "London", "time": "15:30", "gate": "A12", "status": "Arrived"},
-        {"flight": "KQ201", "origin": "Dubai", "time": "19:45", "gate": "B5", "status": "On Time"},
-        {"flight": "KQ301", "origin": "Amsterdam", "time": "23:15", "gate": "A8", "status": "Delayed"},
-        {"flight": "KQ401", "origin": "Mumbai", "time": "05:30+1", "gate": "C3", "status": "En Route"},
-    ]
-    
-    # Create a table-like display
-    col1, col2, col3, col4, col5 = st.columns([1, 2, 1, 1, 1])
-    
-    # Headers
-    with col1:
-        st.markdown("**Flight**")
-    with col2:
-        st.markdown("**Origin**")
-    with col3:
-        st.markdown("**Time**")
-    with col4:
-        st.markdown("**Gate**")
-    with col5:
-        st.markdown("**Status**")
-    
-    st.markdown("---")
-    
-    # Data rows
-    for arr in arrivals:
-        col1, col2, col3, col4, col5 = st.columns([1, 2, 1, 1, 1])
-        
-        with col1:
-            st.markdown(arr["flight"])
-        with col2:
-            st.markdown(arr["origin"])
-        with col3:
-            st.markdown(arr["time"])
-        with col4:
-            st.markdown(arr["gate"])
-        with col5:
-            status_emoji = {"Arrived": "🏁", "On Time": "🟢", "Delayed": "🟡", "En Route": "✈️"}.get(arr["status"], "❓")
-            st.markdown(f"{status_emoji} {arr['status']}")
+    arrivals = get_arrival_board(HUB_CODE)
+    display_board(arrivals, "arrivals", "Origin")
+
+def display_board(rows, board_name, place_label):
+    """Display a flight board, rebuilding and highlighting only rows changed since the last refresh
+
+    The board's table is kept in the session and patched with the rows the
+    snapshot diff reports as added, changed or removed. Streamlit still sends
+    the whole table to the browser on each refresh.
+    """
+    snapshot_key = f"board_snapshot_{board_name}"
+    table_key = f"board_table_{board_name}"
+    snapshot = board_snapshot(rows)
+    changes = diff_board(st.session_state.get(snapshot_key, {}), snapshot)
+    st.session_state[snapshot_key] = snapshot
+    
+    if not rows:
+        st.session_state.pop(table_key, None)
+        st.info("No scheduled movements today")
+        return
+    
+    columns = ["Flight", place_label, "Time", "Gate", "Status"]
+    board = st.session_state.get(table_key)
+    if board is None:
+        board = pd.DataFrame([board_row(row) for row in rows], columns=columns, index=list(snapshot))
+    else:
+        board = board.drop(index=changes['removed'])
+        rows_by_key = dict(zip(snapshot, rows))
+        for key in changes['added'] + changes['changed']:
+            board.loc[key] = board_row(rows_by_key[key])
+        if changes['added'] or changes['removed']:
+            board = board.reindex(list(snapshot))
+    st.session_state[table_key] = board
+    
+    # Only rows that changed since the previous snapshot get highlighted
+    updated = set(changes['changed'])
+    
+    styled = board.style.apply(
+        lambda row: ["background-color: #FEF3C7" if row.name in updated else ""] * len(row),
+        axis=1
+    )
+    
+    st.dataframe(styled, hide_index=True, use_container_width=True, height=min(400, 38 + 35 * len(rows)))
+    
+    caption = f"Updated {datetime.now().strftime('%H:%M:%S')}"
+    if updated:
+        caption += f" · {len(updated)} flight(s) changed"
+    st.caption(caption)
+
+def board_row(row):
+    """Display values of one board row, in column order"""
+    place = row.get('destination', row.get('origin'))
+    return [row['flight'], place, row['time'], row['gate'], f"{BOARD_STATUS_EMOJI.get(row['status'], '❓')} {row['status']}"]
 
 def calculate_delayed_time(original_time, delay_minutes):
     """Calculate new time with delay"""
-    hour, minute = map(int, original_time.split(':'))
-    total_minutes = hour * 60 + minute + delay_minutes
-    
-    new_hour = (total_minutes // 60) % 24
-    new_minute = total_minutes % 60
-    
-    return f"{new_hour:02d}:{new_minute:02d}"
+    return format_local_time(parse_local_time(original_time) + delay_minutes)
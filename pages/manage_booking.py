@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import random
+from data.inventory import get_flights
+from utils import service
+from utils.booking import ANCILLARIES, active_ancillaries, cancellation_refund
 
 def show():
     st.markdown("## 📝 Manage Your Booking")
@@ -40,7 +43,7 @@ def show():
     if st.button("Find My Booking", type="primary", use_container_width=True, key="find_booking_manage"):
         if booking_ref and last_name:
             with st.spinner("Looking up your booking..."):
-                booking = simulate_booking_retrieval(booking_ref, last_name)
+                booking = lookup_booking(booking_ref, last_name)
             
             if booking:
                 st.session_state.manage_booking_data = booking
@@ -55,66 +58,75 @@ def show():
     if st.session_state.get('manage_booking_data'):
         display_booking_management()
 
-def simulate_booking_retrieval(booking_ref, last_name):
-    """Simulate booking retrieval from database"""
-    if len(booking_ref) >= 6 and len(last_name) >= 2:
-        return {
-            "booking_reference": booking_ref,
-            "status": "Confirmed",
-            "created_date": "2025-06-15",
-            "passengers": [
-                {
-                    "name": f"John {last_name}",
-                    "type": "Adult",
-                    "seat": "12A",
-                    "meal": "Standard",
-                    "special_requests": []
-                },
-                {
-                    "name": f"Jane {last_name}",
-                    "type": "Adult", 
-                    "seat": "12B",
-                    "meal": "Vegetarian",
-                    "special_requests": ["Extra legroom"]
-                }
-            ],
-            "flights": [
-                {
-                    "flight_number": f"KQ{random.randint(100, 999)}",
-                    "route": "Nairobi → London",
-                    "departure_date": "2025-07-15",
-                    "departure_time": "10:45",
-                    "arrival_time": "15:30",
-                    "class": "Economy",
-                    "aircraft": "Boeing 787-8"
-                },
-                {
-                    "flight_number": f"KQ{random.randint(100, 999)}",
-                    "route": "London → Nairobi", 
-                    "departure_date": "2025-07-22",
-                    "departure_time": "21:30",
-                    "arrival_time": "07:15+1",
-                    "class": "Economy",
-                    "aircraft": "Boeing 787-8"
-                }
-            ],
-            "contact": {
-                "email": "john.doe@email.com",
-                "phone": "+254 700 123 456"
-            },
-            "payment": {
-                "total_amount": 1890,
-                "currency": "USD",
-                "status": "Paid",
-                "method": "Credit Card"
-            },
-            "extras": {
-                "baggage": "Standard",
-                "insurance": True,
-                "meals": "Included"
+def lookup_booking(booking_ref, last_name):
+    """Look up a booking through the booking service, summarized for the management tabs"""
+    try:
+        booking = service.retrieve(booking_ref, last_name)
+    except service.NotFound:
+        return None
+    
+    travel_class = booking.passengers[0].travel_class if booking.passengers else "Economy"
+    ancillaries = active_ancillaries(booking.ancillaries)
+    
+    return {
+        "booking_reference": booking.booking_reference,
+        "last_name": last_name,
+        "status": booking.status,
+        "created_date": booking.created_at[:10],
+        "passengers": [
+            {
+                "name": p.full_name,
+                "type": p.passenger_type,
+                "seat": p.seat or "Not assigned",
+                "meal": p.meal_preference,
+                "special_requests": list(p.special_requests)
             }
-        }
-    return None
+            for p in booking.passengers
+        ],
+        "flights": [
+            {
+                "flight_number": flight.flight_number,
+                "route": f"{flight.origin} → {flight.destination}",
+                "departure_date": str(flight.departure_date),
+                "departure_time": flight.departure_time,
+                "arrival_time": flight.arrival_time,
+                "class": travel_class,
+                "aircraft": flight.aircraft
+            }
+            for flight in get_flights(booking.flights)
+        ],
+        "contact": {
+            "email": booking.contact.get("email", ""),
+            "phone": booking.contact.get("phone", "")
+        },
+        "payment": {
+            "total_amount": booking.total_price,
+            "currency": "USD",
+            "status": booking.payment_status,
+            "refund_amount": booking.refund_amount,
+            "method": "Credit Card"
+        },
+        "extras": {
+            "baggage": "Standard",
+            "insurance": any(item.code.endswith("_insurance") for item in ancillaries),
+            "meals": "Included"
+        },
+        "ancillaries": [item.to_dict() for item in ancillaries],
+        "ancillary_total": booking.ancillary_total
+    }
+
+def add_services(booking, items):
+    """Post services to the booking's ledger and refresh the summary; returns whether they were added"""
+    try:
+        service.add_ancillaries(booking['booking_reference'], items, booking['last_name'])
+    except service.ServiceError as exc:
+        st.error(f"❌ {exc}")
+        for error in exc.errors:
+            st.error(error)
+        return False
+    
+    st.session_state.manage_booking_data = lookup_booking(booking['booking_reference'], booking['last_name'])
+    return True
 
 def display_booking_management():
     """Display booking management interface"""
@@ -307,6 +319,34 @@ def display_additional_services(booking):
     """Display additional services that can be added"""
     st.markdown("### 🧳 Additional Services")
     
+    # Services already on the booking's ledger
+    if booking['ancillaries']:
+        st.markdown("**Services on this Booking:**")
+        
+        for item in booking['ancillaries']:
+            col1, col2, col3 = st.columns([3, 1, 1])
+            
+            with col1:
+                quantity = f" × {item['quantity']}" if item['quantity'] > 1 else ""
+                st.markdown(f"• {item['description']}{quantity}")
+            
+            with col2:
+                st.markdown(f"${item['amount']}")
+            
+            with col3:
+                if st.button("Remove", key=f"remove_ancillary_{item['line']}"):
+                    try:
+                        service.remove_ancillary(booking['booking_reference'], item['line'], booking['last_name'])
+                    except service.ServiceError as exc:
+                        st.error(f"❌ {exc}")
+                    else:
+                        st.session_state.manage_booking_data = lookup_booking(booking['booking_reference'], booking['last_name'])
+                        st.toast(f"Removed {item['description']}")
+                        st.rerun()
+        
+        st.markdown(f"**Services Total:** ${booking['ancillary_total']:.0f}")
+        st.markdown("---")
+    
     # Baggage services
     st.markdown("**Baggage Services:**")
     
@@ -327,35 +367,34 @@ def display_additional_services(booking):
         )
         
         if extra_baggage > 0:
-            cost = extra_baggage * 15
+            cost = extra_baggage * ANCILLARIES["extra_baggage"][1]
             st.markdown(f"**Cost:** ${cost}")
             
             if st.button("Add Extra Baggage", key="add_extra_baggage_btn"):
-                st.success(f"Added {extra_baggage}kg extra baggage")
+                if add_services(booking, [{"code": "extra_baggage", "quantity": int(extra_baggage)}]):
+                    st.toast(f"Added {extra_baggage}kg extra baggage")
+                    st.rerun()
     
     with col2:
         st.markdown("**Premium Services:**")
         
-        services = {
-            "Priority Boarding": 25,
-            "Extra Legroom Seat": 50,
-            "Lounge Access": 75,
-            "Premium Meal": 35,
-            "WiFi Package": 20
-        }
+        services = ["priority_boarding", "extra_legroom", "lounge_access", "premium_meal", "wifi"]
         
         selected_services = []
         
-        for service, price in services.items():
-            if st.checkbox(f"{service} (+${price})", key=f"service_{service}"):
-                selected_services.append((service, price))
+        for code in services:
+            name, price = ANCILLARIES[code]
+            if st.checkbox(f"{name} (+${price})", key=f"service_{code}"):
+                selected_services.append((code, price))
         
         if selected_services:
             total_cost = sum(price for _, price in selected_services)
             st.markdown(f"**Additional Cost:** ${total_cost}")
             
             if st.button("Add Selected Services", key="add_selected_services_btn"):
-                st.success("Services added to your booking")
+                if add_services(booking, [{"code": code} for code, _ in selected_services]):
+                    st.toast("Services added to your booking")
+                    st.rerun()
     
     # Travel insurance
     st.markdown("---")
@@ -368,15 +407,22 @@ def display_additional_services(booking):
         st.markdown(f"**Current:** {'✅ Included' if current_insurance else '❌ Not included'}")
         
         if not current_insurance:
-            insurance_options = st.radio(
+            insurance_options = {
+                f"Basic Coverage (+${ANCILLARIES['basic_insurance'][1]} per person)": "basic_insurance",
+                f"Premium Coverage (+${ANCILLARIES['premium_insurance'][1]} per person)": "premium_insurance"
+            }
+            insurance_choice = st.radio(
                 "Add Travel Insurance",
-                ["No Insurance", "Basic Coverage (+$25)", "Premium Coverage (+$50)"],
+                ["No Insurance", *insurance_options],
                 key="insurance_options"
             )
             
-            if insurance_options != "No Insurance":
+            if insurance_choice != "No Insurance":
                 if st.button("Add Insurance", key="add_insurance_btn"):
-                    st.success("Travel insurance added to your booking")
+                    items = [{"code": insurance_options[insurance_choice], "quantity": len(booking['passengers'])}]
+                    if add_services(booking, items):
+                        st.toast("Travel insurance added to your booking")
+                        st.rerun()
     
     with col2:
         st.markdown("**Insurance Benefits:**")
@@ -434,18 +480,17 @@ def display_modify_cancel_options(booking):
     with col1:
         st.markdown("**Refund Information:**")
         
-        # Calculate refund based on booking date and current date
-        booking_date = datetime.strptime(booking['created_date'], '%Y-%m-%d')
-        days_to_departure = 7  # Simulated
+        # Refund by the days left before the first flight, as the booking service applies it
+        departure_date = datetime.strptime(booking['flights'][0]['departure_date'], '%Y-%m-%d').date()
+        days_to_departure = (departure_date - datetime.now().date()).days
+        total_amount = booking['payment']['total_amount']
+        refund_amount = cancellation_refund(total_amount, days_to_departure)
         
-        if days_to_departure > 24:
-            refund_amount = booking['payment']['total_amount'] * 0.8  # 80% refund
-            st.markdown(f"• Full refund: ${refund_amount:.0f} (80%)")
-            st.markdown(f"• Cancellation fee: ${booking['payment']['total_amount'] - refund_amount:.0f}")
-        elif days_to_departure > 7:
-            refund_amount = booking['payment']['total_amount'] * 0.5  # 50% refund
-            st.markdown(f"• Partial refund: ${refund_amount:.0f} (50%)")
-            st.markdown(f"• Cancellation fee: ${booking['payment']['total_amount'] - refund_amount:.0f}")
+        if booking['status'] == "Cancelled":
+            st.markdown(f"• Booking cancelled; refund: ${booking['payment']['refund_amount']:.0f}")
+        elif refund_amount:
+            st.markdown(f"• Refund: ${refund_amount:.0f} ({refund_amount / total_amount:.0%})")
+            st.markdown(f"• Cancellation fee: ${total_amount - refund_amount:.0f}")
         else:
             st.markdown("• No refund available")
             st.markdown("• Non-refundable period")
@@ -457,8 +502,13 @@ def display_modify_cancel_options(booking):
         st.markdown("3. Receive refund confirmation")
         st.markdown("4. Refund processed in 7-14 days")
         
-        if st.button("🚫 Cancel Booking", type="primary", use_container_width=True, key="cancel_booking_btn"):
-            display_cancellation_form(booking)
+        if booking['status'] != "Cancelled" and st.button("🚫 Cancel Booking", type="primary",
+                                                          use_container_width=True, key="cancel_booking_btn"):
+            st.session_state.cancellation_form_shown = True
+    
+    # The form stays open across reruns until the booking is cancelled or kept
+    if st.session_state.get('cancellation_form_shown') and booking['status'] != "Cancelled":
+        display_cancellation_form(booking)
 
 def display_cancellation_form(booking):
     """Display booking cancellation form"""
@@ -500,12 +550,27 @@ def display_cancellation_form(booking):
     
     with col1:
         if st.button("↩️ Keep Booking", use_container_width=True, key="keep_booking_btn"):
+            st.session_state.cancellation_form_shown = False
             st.success("Booking retained. No changes made.")
     
     with col2:
         if st.button("✅ Confirm Cancellation", type="primary", use_container_width=True, key="confirm_cancellation_btn"):
             if confirm_cancellation:
-                st.success("Booking cancellation processed. Confirmation email sent.")
-                st.balloons()
+                cancel_booking(booking)
             else:
                 st.error("Please confirm that you understand the cancellation policy.")
+
+def cancel_booking(booking):
+    """Cancel the booking through the booking service and show the refund it gave"""
+    try:
+        cancelled = service.cancel(booking['booking_reference'], booking['last_name'])
+    except service.ServiceError as exc:
+        st.error(f"❌ {exc}")
+        return
+    
+    st.session_state.cancellation_form_shown = False
+    st.session_state.manage_booking_data = lookup_booking(booking['booking_reference'], booking['last_name'])
+    if cancelled.refund_amount:
+        st.success(f"Booking cancelled. A refund of ${cancelled.refund_amount:.0f} is on its way.")
+    else:
+        st.success("Booking cancelled. No refund is due for this booking.")
@@ -1,7 +1,10 @@
 import streamlit as st
 from datetime import datetime, date
-from utils.booking import validate_passenger_info, create_booking
+from utils import service
 from utils.session import get_search_params
+from data.inventory import cabin_seats_left, get_flights
+from data.models import Passenger
+from utils.booking import validate_passenger_info
 
 def show():
     st.markdown("## 👤 Passenger Information")
@@ -18,7 +21,9 @@ def show():
     with st.expander("📋 Booking Summary", expanded=False):
         display_booking_summary()
     
-    # Passenger information forms
+    # Passenger information forms: one form for everyone, so typing never
+    # reruns the app; each passenger's section can be checked on its own and
+    # "Complete Booking" submits them all together
     st.markdown("### 👥 Enter Passenger Details")
     
     passengers = []
@@ -32,79 +37,74 @@ def show():
     for i in range(params['infants']):
         passenger_types.append(('Infant', i + 1))
     
-    # Create passenger forms
-    for i, (passenger_type, number) in enumerate(passenger_types):
-        with st.expander(f"Passenger {i + 1} - {passenger_type} {number}", expanded=i == 0):
-            passenger = create_passenger_form(i, passenger_type)
-            passengers.append(passenger)
-    
-    # Terms and additional information
-    st.markdown("### 📋 Additional Information")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        frequent_flyer = st.text_input("Frequent Flyer Number (Optional)", key="frequent_flyer")
-        emergency_contact_name = st.text_input("Emergency Contact Name*", key="emergency_name")
-    
-    with col2:
-        emergency_contact_phone = st.text_input("Emergency Contact Phone*", key="emergency_phone")
-        emergency_relationship = st.selectbox("Relationship", ["Parent", "Spouse", "Sibling", "Friend", "Other"], key="emergency_rel")
-    
-    # Passport/ID upload simulation
-    st.markdown("### 📄 Document Upload")
-    st.info("In a real system, you would upload passport/ID copies here.")
-    
-    # API/Web integration information
-    st.markdown("### 🌐 Travel Information")
-    visa_required = st.checkbox("I need visa assistance")
-    if visa_required:
-        st.info("Our travel team will contact you regarding visa requirements.")
-    
-    travel_insurance_upgrade = st.checkbox("Upgrade to premium travel insurance (+$50 per person)")
+    with st.form("passenger_details_form"):
+        # Create passenger forms
+        for i, (passenger_type, number) in enumerate(passenger_types):
+            with st.expander(f"Passenger {i + 1} - {passenger_type} {number}", expanded=i == 0):
+                passenger = create_passenger_form(i, passenger_type)
+                passengers.append(passenger)
+                
+                if st.form_submit_button(f"Save Passenger {i + 1}", key=f"save_passenger_{i}"):
+                    display_passenger_check(passenger)
+        
+        # Terms and additional information
+        st.markdown("### 📋 Additional Information")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            frequent_flyer = st.text_input("Frequent Flyer Number (Optional)", key="frequent_flyer")
+            emergency_contact_name = st.text_input("Emergency Contact Name*", key="emergency_name")
+        
+        with col2:
+            emergency_contact_phone = st.text_input("Emergency Contact Phone*", key="emergency_phone")
+            emergency_relationship = st.selectbox("Relationship", ["Parent", "Spouse", "Sibling", "Friend", "Other"], key="emergency_rel")
+        
+        # Passport/ID upload simulation
+        st.markdown("### 📄 Document Upload")
+        st.info("In a real system, you would upload passport/ID copies here.")
+        
+        # API/Web integration information
+        st.markdown("### 🌐 Travel Information")
+        visa_required = st.checkbox("I need visa assistance")
+        if visa_required:
+            st.info("Our travel team will contact you regarding visa requirements.")
+        
+        travel_insurance_upgrade = st.checkbox("Upgrade to premium travel insurance (+$50 per person)")
+        
+        complete_booking = st.form_submit_button("Complete Booking", type="primary", use_container_width=True,
+                                                 key="complete_booking_btn")
     
     # Final validation and booking creation
-    if st.button("Complete Booking", type="primary", use_container_width=True, key="complete_booking_btn"):
-        # Validate all passenger information
-        all_valid = True
-        for i, passenger in enumerate(passengers):
-            errors = validate_passenger_info(passenger)
-            if errors:
-                st.error(f"Passenger {i + 1} has errors: {', '.join(errors)}")
-                all_valid = False
-        
+    if complete_booking:
         # Check required fields
         if not emergency_contact_name or not emergency_contact_phone:
             st.error("Emergency contact information is required.")
-            all_valid = False
+            return
         
-        if all_valid:
-            # Calculate final price with upgrades
-            final_price = booking_data['total_price']
-            if travel_insurance_upgrade:
-                final_price += 50 * total_passengers
-            
-            # Create booking
-            booking_request = {
-                'flights': booking_data['flights'],
-                'passengers': passengers,
-                'contact': booking_data['contact'],
-                'total_price': final_price,
-                'extras': booking_data.get('extras', {}),
-                'seat_selections': booking_data.get('seat_selections', {}),
-                'special_requests': booking_data.get('special_requests', {}),
-                'emergency_contact': {
-                    'name': emergency_contact_name,
-                    'phone': emergency_contact_phone,
-                    'relationship': emergency_relationship
-                },
-                'frequent_flyer': frequent_flyer,
-                'visa_assistance': visa_required,
-                'premium_insurance': travel_insurance_upgrade
-            }
-            
-            # Create the booking
-            booking = create_booking(booking_request)
+        # Extras priced on top of the fares, including upgrades chosen here
+        extras = dict(booking_data.get('extras', {}))
+        if booking_data.get('seat_fees'):
+            extras['seat_fees'] = booking_data['seat_fees']
+        if travel_insurance_upgrade:
+            extras['premium_insurance'] = 50 * total_passengers
+        
+        # Create the booking through the booking service, which validates passengers
+        try:
+            booking = service.create(
+                booking_data['flights'],
+                passengers,
+                booking_data['contact'],
+                extras=extras,
+                seat_selections=booking_data.get('seat_selections', {}),
+                holder=st.session_state.hold_id
+            )
+        except service.ServiceError as exc:
+            for error in exc.errors or [str(exc)]:
+                st.error(error)
+            if isinstance(exc, service.Conflict):
+                st.session_state.waitlist_offer_shown = True
+        else:
             st.session_state.current_booking = booking
             
             st.success("🎉 Booking completed successfully!")
@@ -115,46 +115,130 @@ def show():
             
             st.rerun()
 
+    # A cabin sold out while the traveller was booking: offer the waitlist instead
+    if st.session_state.get('waitlist_offer_shown'):
+        display_waitlist_option(booking_data, params)
+    
+    if st.session_state.waitlist_entries:
+        display_waitlist_requests(booking_data, passengers)
+
+def display_waitlist_option(booking_data, params):
+    """Offer to queue for seats on the flights whose cabin sold out"""
+    seats_needed = params['adults'] + params['children']
+    sold_out = [
+        key for key in booking_data['flights']
+        if cabin_seats_left(key, booking_data['travel_class']) < seats_needed
+    ]
+    if not sold_out:
+        return
+    
+    st.warning(f"{booking_data['travel_class']} is sold out on {', '.join(key[0] for key in sold_out)}. "
+               "Join the waitlist and we will offer you seats if any become free.")
+    if st.button("Join Waitlist", key="join_waitlist_btn"):
+        for key in sold_out:
+            try:
+                entry, _ = service.join_waitlist(key, booking_data['travel_class'], seats_needed, booking_data['contact'])
+            except service.ServiceError as exc:
+                st.error(f"{key[0]}: {exc}")
+            else:
+                st.session_state.waitlist_entries.append(entry.entry_id)
+        st.session_state.waitlist_offer_shown = False
+
+def display_waitlist_requests(booking_data, passengers):
+    """Show this session's waitlist requests, and book the seats offered to one"""
+    st.markdown("### ⏳ Waitlist")
+    email = booking_data['contact']['email']
+    
+    for entry_id in list(st.session_state.waitlist_entries):
+        try:
+            entry, position = service.waitlist_status(entry_id, email)
+        except service.ServiceError:
+            st.session_state.waitlist_entries.remove(entry_id)
+            continue
+        
+        flight_number = entry.flight_key[0]
+        if entry.status == "Waiting":
+            st.info(f"{flight_number}: you are number {position} on the waitlist (request {entry_id}).")
+        elif entry.status == "Offered":
+            held_until = datetime.fromtimestamp(entry.offer_expires_at).strftime('%H:%M')
+            st.success(f"{flight_number}: seats were freed and are held for you until {held_until} "
+                       f"(request {entry_id}).")
+            if st.button(f"Book Offered Seats on {flight_number}", key=f"claim_waitlist_{entry_id}", type="primary"):
+                claim_waitlist_offer(entry, booking_data, passengers)
+        else:
+            st.info(f"{flight_number}: waitlist request {entry_id} is {entry.status.lower()}.")
+            st.session_state.waitlist_entries.remove(entry_id)
+
+def claim_waitlist_offer(entry, booking_data, passengers):
+    """Book the waitlisted flight with the seats offered to a request"""
+    try:
+        booking = service.create(
+            [entry.flight_key],
+            passengers,
+            booking_data['contact'],
+            waitlist_entry_id=entry.entry_id
+        )
+    except service.ServiceError as exc:
+        for error in exc.errors or [str(exc)]:
+            st.error(error)
+    else:
+        st.session_state.current_booking = booking
+        st.session_state.waitlist_entries.remove(entry.entry_id)
+        st.success("🎉 Booking completed successfully!")
+        
+        # Clear booking data
+        st.session_state.booking_data = {}
+        
+        st.rerun()
+
+def display_passenger_check(passenger):
+    """Validate one passenger's submitted details and show the result"""
+    errors = validate_passenger_info(passenger)
+    for error in errors:
+        st.error(error)
+    if not errors:
+        st.success(f"{passenger.full_name} saved.")
+
 def create_passenger_form(index, passenger_type):
     """Create a passenger information form"""
-    passenger = {}
+    passenger = Passenger()
     
     col1, col2 = st.columns(2)
     
     with col1:
-        passenger['first_name'] = st.text_input("First Name*", key=f"first_name_{index}")
-        passenger['last_name'] = st.text_input("Last Name*", key=f"last_name_{index}")
-        passenger['date_of_birth'] = st.date_input(
+        passenger.first_name = st.text_input("First Name*", key=f"first_name_{index}")
+        passenger.last_name = st.text_input("Last Name*", key=f"last_name_{index}")
+        passenger.date_of_birth = st.date_input(
             "Date of Birth*", 
             min_value=date(1900, 1, 1),
             max_value=date.today(),
             key=f"dob_{index}"
         )
-        passenger['gender'] = st.selectbox("Gender*", ["Male", "Female", "Other"], key=f"gender_{index}")
+        passenger.gender = st.selectbox("Gender*", ["Male", "Female", "Other"], key=f"gender_{index}")
     
     with col2:
-        passenger['nationality'] = st.selectbox(
+        passenger.nationality = st.selectbox(
             "Nationality*", 
             ["Kenyan", "British", "American", "Canadian", "South African", "Nigerian", "Other"],
             key=f"nationality_{index}"
         )
-        passenger['passport_number'] = st.text_input("Passport/ID Number*", key=f"passport_{index}")
-        passenger['passport_expiry'] = st.date_input(
+        passenger.passport_number = st.text_input("Passport/ID Number*", key=f"passport_{index}")
+        passenger.passport_expiry = st.date_input(
             "Passport Expiry Date*",
             min_value=date.today(),
             key=f"passport_expiry_{index}"
         )
-        passenger['issuing_country'] = st.text_input("Issuing Country*", key=f"issuing_country_{index}")
+        passenger.issuing_country = st.text_input("Issuing Country*", key=f"issuing_country_{index}")
     
     # Special requirements for this passenger
-    passenger['meal_preference'] = st.selectbox(
+    passenger.meal_preference = st.selectbox(
         "Meal Preference",
         ["Standard", "Vegetarian", "Vegan", "Halal", "Kosher", "Gluten-free"],
         key=f"meal_{index}"
     )
     
     if passenger_type in ['Child', 'Infant']:
-        passenger['accompanying_adult'] = st.text_input(
+        passenger.accompanying_adult = st.text_input(
             "Accompanying Adult Name*",
             key=f"adult_{index}"
         )
@@ -167,11 +251,11 @@ def create_passenger_form(index, passenger_type):
                 selected_seats.append(f"{flight_number}: {seats[index]}")
         
         if selected_seats:
-            passenger['assigned_seats'] = selected_seats
+            passenger.assigned_seats = selected_seats
             st.info(f"Assigned seats: {', '.join(selected_seats)}")
     
-    passenger['passenger_type'] = passenger_type
-    passenger['class'] = get_search_params()['travel_class']
+    passenger.passenger_type = passenger_type
+    passenger.travel_class = get_search_params()['travel_class']
     
     return passenger
 
@@ -183,8 +267,8 @@ def display_booking_summary():
     
     with col1:
         st.markdown("**Flights:**")
-        for flight in booking_data['flights']:
-            st.markdown(f"• {flight['flight_number']}: {flight['origin']} → {flight['destination']}")
+        for flight in get_flights(booking_data['flights']):
+            st.markdown(f"• {flight.flight_number}: {flight.origin} → {flight.destination}")
         
         st.markdown(f"**Passengers:** {booking_data['total_passengers']}")
         st.markdown(f"**Class:** {booking_data['travel_class']}")
@@ -1,6 +1,11 @@
 import streamlit as st
-from utils.booking import generate_seat_map
+from utils import service
 from utils.session import get_search_params
+from data.inventory import flight_key, get_flights
+from utils.metrics import REGISTRY
+
+SEAT_HOLD_CONFLICTS = REGISTRY.counter("kq_seat_hold_conflicts_total", "Seat selections rejected",
+                                       {"reason": "party_full"})
 
 def show():
     st.markdown("## 💺 Select Your Seats")
@@ -10,8 +15,10 @@ def show():
         return
     
     booking_data = st.session_state.booking_data
-    flights = booking_data['flights']
-    total_passengers = booking_data['total_passengers']
+    flights = get_flights(booking_data['flights'])
+    params = get_search_params()
+    # Lap infants do not take a seat
+    seated_passengers = params['adults'] + params['children']
     travel_class = booking_data['travel_class']
     
     # Initialize seat selections if not exists
@@ -20,18 +27,18 @@ def show():
     
     # Display seat selection for each flight
     for i, flight in enumerate(flights):
-        st.markdown(f"### Flight {flight['flight_number']} - {flight['origin']} to {flight['destination']}")
+        st.markdown(f"### Flight {flight.flight_number} - {flight.origin} to {flight.destination}")
         
-        # Generate seat map
-        seat_map = generate_seat_map(flight['aircraft'], travel_class)
+        # Seat map shared by every session, with other sessions' holds shown as occupied
+        seat_map = get_seat_map(flight, travel_class)
         
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            display_seat_map(seat_map, flight['flight_number'], total_passengers)
+            display_seat_map(seat_map, flight, travel_class, seated_passengers)
         
         with col2:
-            display_seat_info(seat_map, flight['flight_number'])
+            display_seat_info(seat_map, flight, travel_class)
     
     # Calculate additional seat fees
     seat_fees = calculate_seat_fees()
@@ -50,7 +57,7 @@ def show():
     with col2:
         if st.button("Continue with Selected Seats", type="primary", use_container_width=True, key="continue_with_seats"):
             # Validate seat selections
-            if validate_seat_selections(flights, total_passengers):
+            if validate_seat_selections(flights, seated_passengers):
                 # Update booking data with seat selections
                 booking_data['seat_selections'] = st.session_state.seat_selections
                 booking_data['seat_fees'] = seat_fees
@@ -61,12 +68,21 @@ def show():
             else:
                 st.error("Please select seats for all passengers or skip seat selection.")
 
-def display_seat_map(seat_map, flight_number, total_passengers):
+def get_seat_map(flight, travel_class):
+    """Seat map snapshot kept in the session, re-fetched only when its version moves on"""
+    cabin = (flight_key(flight), travel_class)
+    seat_map = st.session_state.seat_maps.get(cabin)
+    if seat_map is None or seat_map.version != service.seat_map_version(*cabin):
+        seat_map = st.session_state.seat_maps[cabin] = service.get_seat_map(*cabin)
+    return seat_map
+
+def display_seat_map(seat_map, flight, travel_class, seated_passengers):
     """Display interactive seat map"""
-    seats = seat_map['seats']
-    config = seat_map['config']
+    flight_number = flight.flight_number
+    seats = seat_map.seats
+    config = seat_map.config
     
-    st.markdown(f"**{seat_map['aircraft']} - {config['pitch']} seat pitch**")
+    st.markdown(f"**{seat_map.aircraft} - {config['pitch']} seat pitch**")
     
     # Group seats by row
     rows = {}
@@ -123,17 +139,24 @@ def display_seat_map(seat_map, flight_number, total_passengers):
                     help=f"Row {seat['row']}, Seat {seat['letter']} - {seat['type'].title()} seat" + 
                          (f" (+${seat['price']})" if seat['price'] > 0 else "")
                 ):
-                    if len(selected_seats) < total_passengers:
-                        if flight_number not in st.session_state.seat_selections:
-                            st.session_state.seat_selections[flight_number] = []
-                        st.session_state.seat_selections[flight_number].append(seat_id)
-                        st.rerun()
+                    if len(selected_seats) < seated_passengers:
+                        try:
+                            service.hold_seats(flight_key(flight), travel_class, [seat_id], st.session_state.hold_id)
+                        except service.Conflict:
+                            st.warning(f"Seat {seat_id} was just taken by another traveller. Please choose another.")
+                        else:
+                            if flight_number not in st.session_state.seat_selections:
+                                st.session_state.seat_selections[flight_number] = []
+                            st.session_state.seat_selections[flight_number].append(seat_id)
+                            st.rerun()
                     else:
-                        st.warning(f"You can only select {total_passengers} seat(s) for this flight.")
+                        SEAT_HOLD_CONFLICTS.inc()
+                        st.warning(f"You can only select {seated_passengers} seat(s) for this flight.")
 
-def display_seat_info(seat_map, flight_number):
+def display_seat_info(seat_map, flight, travel_class):
     """Display seat selection information"""
-    config = seat_map['config']
+    flight_number = flight.flight_number
+    config = seat_map.config
     
     st.markdown("**Seat Information**")
     st.markdown(f"• Seat pitch: {config['pitch']}")
@@ -147,6 +170,7 @@ def display_seat_info(seat_map, flight_number):
         for seat in selected_seats:
             if st.button(f"Remove {seat}", key=f"remove_{flight_number}_{seat}"):
                 st.session_state.seat_selections[flight_number].remove(seat)
+                service.release_seats(flight_key(flight), travel_class, st.session_state.hold_id, [seat])
                 st.rerun()
     
     st.markdown("**Seat Types:**")
@@ -176,13 +200,13 @@ def calculate_seat_fees():
     
     return total_fees
 
-def validate_seat_selections(flights, total_passengers):
-    """Validate that seat selections are complete"""
+def validate_seat_selections(flights, seated_passengers):
+    """Validate that every passenger who takes a seat has one, on each flight with selections"""
     for flight in flights:
-        flight_number = flight['flight_number']
+        flight_number = flight.flight_number
         selected_seats = st.session_state.seat_selections.get(flight_number, [])
         
-        if len(selected_seats) != total_passengers and len(selected_seats) > 0:
+        if len(selected_seats) != seated_passengers and len(selected_seats) > 0:
             return False
     
     return True
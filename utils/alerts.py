@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from data.status import add_status_listener
+from utils.metrics import REGISTRY
+
+# Seconds to wait for further changes to a flight before notifying subscribers
+COALESCE_SECONDS = 2.0
+
+# Maximum messages handed to the outbox in one delivery call
+DELIVERY_BATCH_SIZE = 500
+
+# Delivery attempts per batch before its messages are dropped, and seconds between attempts
+DELIVERY_ATTEMPTS = 3
+DELIVERY_RETRY_SECONDS = 5.0
+
+# Alert type triggered by each kind of status change
+ALERT_TYPES = ["Departure Delays", "Gate Changes", "Boarding Calls", "Cancellations"]
+
+DELIVERY_FAILURES = REGISTRY.counter("kq_alert_delivery_failures_total", "Alert batch deliveries that raised")
+ALERTS_DROPPED = REGISTRY.counter("kq_alerts_dropped_total", "Alerts dropped after every delivery attempt failed")
+
+# The process-wide dispatcher, started on first use
+_dispatcher_lock = threading.Lock()
+_dispatcher = None
+
+
+class AlertRegistry:
+    """Flight alert subscriptions indexed by flight (number and departure date) and by contact
+
+    A flight number flies every day, so a subscription covers one departure.
+    Dates are dates or ISO strings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_flight = {}
+        self._by_contact = {}
+
+    def subscribe(self, flight_number, departure_date, contact, channel="email", alert_types=None):
+        """Subscribe a contact to alerts for a flight on a date"""
+        flight = _flight(flight_number, departure_date)
+        subscription = {
+            "flight_number": flight[0],
+            "departure_date": flight[1],
+            "contact": contact,
+            "channel": channel,
+            "alert_types": list(alert_types or ALERT_TYPES),
+            "created_at": datetime.now().isoformat(timespec="seconds")
+        }
+
+        with self._lock:
+            self._by_flight.setdefault(flight, {})[contact] = subscription
+            self._by_contact.setdefault(contact, set()).add(flight)
+
+        return subscription
+
+    def unsubscribe(self, flight_number, departure_date, contact):
+        """Remove a contact's alerts for a flight on a date"""
+        flight = _flight(flight_number, departure_date)
+        with self._lock:
+            self._by_flight.get(flight, {}).pop(contact, None)
+            self._by_contact.get(contact, set()).discard(flight)
+
+    def subscribers(self, flight_number, departure_date):
+        """Get every subscription for a flight on a date"""
+        with self._lock:
+            return list(self._by_flight.get(_flight(flight_number, departure_date), {}).values())
+
+    def subscriptions_for(self, contact):
+        """Get every subscription held by a contact"""
+        with self._lock:
+            return [self._by_flight[flight][contact] for flight in sorted(self._by_contact.get(contact, ()))]
+
+
+class LocalOutbox:
+    """Local stand-in for the SMTP and SMS gateways"""
+
+    def __init__(self, path=None, history=1000):
+        self.path = path
+        self.sent = deque(maxlen=history)
+        self.batches_sent = 0
+
+    async def send_batch(self, channel, messages):
+        """Deliver a batch of messages over one channel"""
+        if self.path:
+            await asyncio.to_thread(self._write_batch, channel, messages)
+
+        self.sent.extend(messages)
+        self.batches_sent += 1
+
+    def _write_batch(self, channel, messages):
+        """Append a delivered batch to the outbox file"""
+        with open(self.path, "a", encoding="utf-8") as outbox:
+            outbox.writelines(json.dumps({"channel": channel, **message}) + "\n" for message in messages)
+
+
+class AlertDispatcher:
+    """Fan flight status changes out to subscribers on a background event loop"""
+
+    def __init__(self, registry, outbox, coalesce_seconds=COALESCE_SECONDS, batch_size=DELIVERY_BATCH_SIZE,
+                 delivery_attempts=DELIVERY_ATTEMPTS, retry_seconds=DELIVERY_RETRY_SECONDS):
+        self.registry = registry
+        self.outbox = outbox
+        self.coalesce_seconds = coalesce_seconds
+        self.batch_size = batch_size
+        self.delivery_attempts = delivery_attempts
+        self.retry_seconds = retry_seconds
+        self.notifications_sent = 0
+        self.notifications_dropped = 0
+        self.last_error = None
+        self._pending = {}
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        """Start the dispatcher's event loop in a daemon thread"""
+        if self._thread is not None:
+            return self
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the dispatcher's event loop"""
+        if self._thread is None:
+            return
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    def publish(self, flight_number, change):
+        """Queue a status change for a flight; safe to call from any thread"""
+        if self._loop is None:
+            raise RuntimeError("Alert dispatcher is not running")
+
+        self._loop.call_soon_threadsafe(self._enqueue, flight_number, dict(change))
+
+    def _enqueue(self, flight_number, change):
+        """Merge a change into the pending notification for the flight on its date"""
+        key = (flight_number, change.get("departure_date"))
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = change
+            self._loop.call_later(self.coalesce_seconds, self._schedule_flush, key)
+        else:
+            pending.update(change)
+
+    def _schedule_flush(self, key):
+        """Flush a flight's coalesced changes once the window has closed"""
+        self._loop.create_task(self._flush(key[0], self._pending.pop(key)))
+
+    async def _flush(self, flight_number, change):
+        """Notify every subscriber of a flight on its date about its coalesced changes"""
+        alert_types = set(change_alert_types(change))
+        messages = {}
+
+        for subscription in self.registry.subscribers(flight_number, change.get("departure_date")):
+            if not alert_types.intersection(subscription["alert_types"]):
+                continue
+
+            messages.setdefault(subscription["channel"], []).append({
+                "to": subscription["contact"],
+                "flight_number": flight_number,
+                "text": format_alert(flight_number, change)
+            })
+
+        deliveries = []
+        for channel, channel_messages in messages.items():
+            for start in range(0, len(channel_messages), self.batch_size):
+                deliveries.append(self._deliver(channel, channel_messages[start:start + self.batch_size]))
+
+        await asyncio.gather(*deliveries)
+
+    async def _deliver(self, channel, messages):
+        """Hand a batch to the outbox, retrying a failed delivery before dropping its messages"""
+        for attempt in range(1, self.delivery_attempts + 1):
+            try:
+                await self.outbox.send_batch(channel, messages)
+            except Exception as exc:
+                DELIVERY_FAILURES.inc()
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                if attempt < self.delivery_attempts:
+                    await asyncio.sleep(self.retry_seconds)
+                continue
+            self.notifications_sent += len(messages)
+            return
+
+        ALERTS_DROPPED.inc(len(messages))
+        self.notifications_dropped += len(messages)
+
+
+def change_alert_types(change):
+    """Get the alert types a status change should trigger"""
+    alert_types = []
+
+    if change.get("delay_minutes"):
+        alert_types.append("Departure Delays")
+    if change.get("gate"):
+        alert_types.append("Gate Changes")
+    if change.get("status") == "Boarding":
+        alert_types.append("Boarding Calls")
+    if change.get("status") == "Cancelled":
+        alert_types.append("Cancellations")
+
+    return alert_types
+
+
+def format_alert(flight_number, change):
+    """Format a coalesced status change as a notification"""
+    parts = []
+
+    if change.get("status"):
+        parts.append(f"status {change['status']}")
+    if change.get("delay_minutes"):
+        parts.append(f"delayed by {change['delay_minutes']} minutes")
+    if change.get("gate"):
+        parts.append(f"now departing from gate {change['gate']}")
+
+    on_date = f" on {change['departure_date']}" if change.get("departure_date") else ""
+    return f"Kenya Airways {flight_number}{on_date}: " + ", ".join(parts)
+
+
+def _flight(flight_number, departure_date):
+    """Registry key of a flight: normalized number and ISO date"""
+    return flight_number.strip().upper(), str(departure_date)
+
+
+def get_alert_dispatcher():
+    """Get the process-wide alert dispatcher, starting it and attaching it to status changes once
+
+    Deliveries go to a LocalOutbox writing to ALERT_OUTBOX_PATH, if set.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher(AlertRegistry(), LocalOutbox(os.environ.get("ALERT_OUTBOX_PATH"))).start()
+            add_status_listener(_dispatcher.publish)
+        return _dispatcher
@@ -0,0 +1,295 @@
+import json
+import re
+import sys
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from data.models import Passenger
+from utils import service
+
+# Thin JSON front end over utils.service for partner channels and kiosks.
+# ``app`` is an ASGI application (e.g. ``uvicorn utils.api:app``); without an
+# ASGI server, ``python -m utils.api [port]`` serves the same routes locally.
+#
+#   POST /search                        {origin, destination, departure_date, return_date?, passengers?, travel_class?, limit?}
+#                                       or {cursor, limit?} for the next page; responses carry "cursors" per direction
+#   POST /price                         {flights, passengers, extras?}
+#   GET  /flights/{number}/{date}/{origin}/seats?class=Economy
+#   POST /holds                         {flight, travel_class, seats, holder}
+#   POST /bookings                      {flights, passengers, contact, extras?, seat_selections?, holder?, waitlist_entry_id?}
+#   GET  /bookings/{reference}?last_name=
+#   POST /bookings/{reference}/check-in {last_name, seat?}
+#   POST /bookings/{reference}/group-check-in {last_name, seats?: {passenger index: seat id}}
+#   POST /bookings/{reference}/cancel   {last_name}
+#   POST /bookings/{reference}/ancillaries {last_name, items: [{code, quantity?, passenger?}]}
+#   POST /bookings/{reference}/ancillaries/{line}/remove {last_name}
+#   POST /ancillaries                   {orders: [{booking_reference, last_name, items}]}
+#                                       or {bookings: [{booking_reference, last_name}], items} to add the same items to each
+#   POST /waitlist                      {flight, travel_class, seats, contact, fare_class?, tier?}
+#   GET  /waitlist/{entry id}?email=
+#   POST /waitlist/{entry id}/leave     {email}
+#
+# Routes on a booking need a passenger's last name as well as its reference,
+# and routes on a waitlist request the contact email it was made with.
+
+DEFAULT_PORT = 8600
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+# Most search results returned per page
+MAX_PAGE_SIZE = 100
+
+
+def _search(body):
+    limit = max(1, min(int(body.get("limit", service.SEARCH_PAGE_SIZE)), MAX_PAGE_SIZE))
+    if body.get("cursor"):
+        direction, flights, cursor = service.next_page(body["cursor"], limit)
+        pages, cursors = {direction: flights}, {direction: cursor}
+    else:
+        pages, cursors = service.search_page(
+            body["origin"], body["destination"], _parse_date(body["departure_date"]),
+            _parse_date(body.get("return_date")), body.get("passengers", 1), body.get("travel_class", "Economy"), limit
+        )
+    return {
+        **{direction: [flight.to_dict() for flight in flights] for direction, flights in pages.items()},
+        "cursors": cursors
+    }
+
+
+def _price(body):
+    return {"total_price": service.price(_flight_keys(body), _passengers(body), body.get("extras"))}
+
+
+def _seat_map(body, flight_number, departure_date, origin_code):
+    seat_map = service.get_seat_map((flight_number, departure_date, origin_code), body.get("class", "Economy"))
+    return {**seat_map.to_dict(), "config": dict(seat_map.config), "seats": [dict(seat) for seat in seat_map.seats]}
+
+
+def _hold(body):
+    expires_at = service.hold_seats(tuple(body["flight"]), body.get("travel_class", "Economy"), body["seats"], body["holder"])
+    return {"seats": body["seats"], "expires_at": expires_at}
+
+
+def _create(body):
+    booking = service.create(
+        _flight_keys(body), _passengers(body), body.get("contact"), body.get("extras"),
+        body.get("seat_selections"), body.get("holder"), body.get("waitlist_entry_id")
+    )
+    return _booking_dict(booking)
+
+
+def _retrieve(body, reference):
+    return _booking_dict(service.retrieve(reference, _last_name(body)))
+
+
+def _check_in(body, reference):
+    boarding_passes = service.check_in(reference, _last_name(body), body.get("seat"))
+    return {"boarding_passes": [boarding_pass.to_dict() for boarding_pass in boarding_passes]}
+
+
+def _check_in_group(body, reference):
+    boarding_passes = service.check_in_group(reference, _last_name(body), body.get("seats"))
+    return {"boarding_passes": [boarding_pass.to_dict() for boarding_pass in boarding_passes]}
+
+
+def _cancel(body, reference):
+    return _booking_dict(service.cancel(reference, _last_name(body)))
+
+
+def _add_ancillaries(body, reference):
+    last_name = _last_name(body)
+    service.add_ancillaries(reference, body["items"], last_name)
+    return _booking_dict(service.retrieve(reference, last_name))
+
+
+def _remove_ancillary(body, reference, line):
+    last_name = _last_name(body)
+    service.remove_ancillary(reference, int(line), last_name)
+    return _booking_dict(service.retrieve(reference, last_name))
+
+
+def _apply_ancillaries(body):
+    bookings = body.get("orders") or [{**booking, "items": body["items"]} for booking in body["bookings"]]
+    orders = {booking["booking_reference"]: booking["items"] for booking in bookings}
+    last_names = {booking["booking_reference"]: _last_name(booking) for booking in bookings}
+    posted, rejected = service.apply_ancillaries(orders, last_names)
+    return {
+        "posted": {reference: [item.to_dict() for item in items] for reference, items in posted.items()},
+        "rejected": rejected
+    }
+
+
+def _join_waitlist(body):
+    entry, position = service.join_waitlist(
+        tuple(body["flight"]), body.get("travel_class", "Economy"), int(body["seats"]), body.get("contact"),
+        body.get("fare_class", "Classic"), body.get("tier")
+    )
+    return _waitlist_dict(entry, position)
+
+
+def _waitlist_status(body, entry_id):
+    entry, position = service.waitlist_status(int(entry_id), body.get("email"))
+    return _waitlist_dict(entry, position)
+
+
+def _leave_waitlist(body, entry_id):
+    return _waitlist_dict(service.leave_waitlist(int(entry_id), body.get("email")), None)
+
+
+ROUTES = [
+    ("POST", re.compile(r"/search"), _search),
+    ("POST", re.compile(r"/price"), _price),
+    ("GET", re.compile(r"/flights/([^/]+)/([^/]+)/([^/]+)/seats"), _seat_map),
+    ("POST", re.compile(r"/holds"), _hold),
+    ("POST", re.compile(r"/bookings"), _create),
+    ("GET", re.compile(r"/bookings/([^/]+)"), _retrieve),
+    ("POST", re.compile(r"/bookings/([^/]+)/check-in"), _check_in),
+    ("POST", re.compile(r"/bookings/([^/]+)/group-check-in"), _check_in_group),
+    ("POST", re.compile(r"/bookings/([^/]+)/cancel"), _cancel),
+    ("POST", re.compile(r"/bookings/([^/]+)/ancillaries"), _add_ancillaries),
+    ("POST", re.compile(r"/bookings/([^/]+)/ancillaries/(\d+)/remove"), _remove_ancillary),
+    ("POST", re.compile(r"/ancillaries"), _apply_ancillaries),
+    ("POST", re.compile(r"/waitlist"), _join_waitlist),
+    ("GET", re.compile(r"/waitlist/(\d+)"), _waitlist_status),
+    ("POST", re.compile(r"/waitlist/(\d+)/leave"), _leave_waitlist)
+]
+
+
+def handle(method, path, body):
+    """Dispatch one request; returns (HTTP status, JSON-serializable payload)"""
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match and route_method == method:
+            try:
+                return 200, handler(body, *match.groups())
+            except service.ServiceError as exc:
+                return exc.status, {"error": str(exc), "errors": exc.errors}
+            except (AttributeError, KeyError, TypeError, ValueError) as exc:
+                return 400, {"error": f"Bad request: {exc}"}
+        if match:
+            return 405, {"error": "Method not allowed"}
+    return 404, {"error": "Not found"}
+
+
+def handle_raw(method, raw_path, raw_body):
+    """Decode a request (query string for GET, JSON body otherwise) and encode the response"""
+    path, _, query = raw_path.partition("?")
+    try:
+        if method == "GET":
+            body = dict(parse_qsl(query))
+        else:
+            body = json.loads(raw_body or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Expected a JSON object")
+    except ValueError as exc:
+        status, payload = 400, {"error": f"Bad request: {exc}"}
+    else:
+        status, payload = handle(method, path.rstrip("/") or "/", body)
+    return status, json.dumps(payload, default=str).encode("utf-8")
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] != "http":
+        return
+
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        more_body = message.get("more_body", False)
+        if size > MAX_BODY_BYTES:
+            status, payload = 413, b'{"error": "Request body too large"}'
+            break
+    else:
+        raw_path = scope["path"] + ("?" + scope["query_string"].decode() if scope.get("query_string") else "")
+        status, payload = handle_raw(scope["method"], raw_path, b"".join(chunks))
+
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Standard-library server for the same routes"""
+
+    def do_GET(self):
+        self._respond(*handle_raw("GET", self.path, b""))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._respond(413, b'{"error": "Request body too large"}')
+            return
+        self._respond(*handle_raw("POST", self.path, self.rfile.read(length)))
+
+    def _respond(self, status, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serve the API with the standard library until interrupted"""
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def _last_name(body):
+    """A passenger's last name, which every route reading or changing a booking needs besides its reference"""
+    last_name = body.get("last_name")
+    if not isinstance(last_name, str) or not last_name.strip():
+        raise service.InvalidRequest("last_name is required")
+    return last_name
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def _flight_keys(body):
+    return [tuple(key) for key in body["flights"]]
+
+
+def _passengers(body):
+    passengers = []
+    for data in body["passengers"]:
+        passenger = Passenger.from_dict(data)
+        for field in ("date_of_birth", "passport_expiry"):
+            if isinstance(getattr(passenger, field), str):
+                setattr(passenger, field, _parse_date(getattr(passenger, field)))
+        passengers.append(passenger)
+    return passengers
+
+
+def _booking_dict(booking):
+    booking_dict = booking.to_dict()
+    booking_dict["passengers"] = [passenger.to_dict() for passenger in booking.passengers]
+    booking_dict["tickets"] = [ticket.to_dict() for ticket in booking.tickets]
+    booking_dict["ancillaries"] = [item.to_dict() for item in booking.ancillaries]
+    return booking_dict
+
+
+def _waitlist_dict(entry, position):
+    """A waitlist entry without its contact details"""
+    entry_dict = entry.to_dict()
+    del entry_dict["contact"]
+    entry_dict["position"] = position
+    return entry_dict
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
@@ -1,6 +1,27 @@
 import random
 import string
 from datetime import datetime, date
+from data.models import Booking, Passenger, Ticket
+from utils.metrics import REGISTRY
+from utils.profiling import profiled
+
+BOOKINGS_CREATED = REGISTRY.counter("kq_bookings_created_total", "Bookings created")
+
+# Services sold after booking: code -> (description, price per unit). Baggage
+# is sold per kg and insurance per passenger; the rest per booking.
+ANCILLARIES = {
+    "extra_baggage": ("Extra baggage (kg)", 15),
+    "priority_boarding": ("Priority Boarding", 25),
+    "extra_legroom": ("Extra Legroom Seat", 50),
+    "lounge_access": ("Lounge Access", 75),
+    "premium_meal": ("Premium Meal", 35),
+    "wifi": ("WiFi Package", 20),
+    "basic_insurance": ("Basic travel insurance", 25),
+    "premium_insurance": ("Premium travel insurance", 50)
+}
+
+# Share of the booking total refunded on cancellation, by minimum days to departure
+REFUND_POLICY = ((25, 0.8), (8, 0.5))
 
 def generate_booking_reference():
     """Generate a unique booking reference"""
@@ -10,14 +31,14 @@ def generate_ticket_number():
     """Generate a ticket number"""
     return '629-' + ''.join(random.choices(string.digits, k=10))
 
+@profiled()
 def calculate_total_price(flights, passengers, extras=None):
     """Calculate total booking price"""
     total = 0
 
     for flight in flights:
         for passenger in passengers:
-            travel_class = passenger.get('class', 'Economy')
-            total += flight['prices'][travel_class]
+            total += flight.prices[passenger.travel_class]
 
     # Add extras (baggage, meals, etc.)
     if extras:
@@ -25,8 +46,37 @@ def calculate_total_price(flights, passengers, extras=None):
 
     return total
 
+def price_ancillary(code, quantity=1):
+    """Description and price of some units of an ancillary service; KeyError for unknown codes"""
+    description, unit_price = ANCILLARIES[code]
+    return description, unit_price * quantity
+
+def active_ancillaries(ledger):
+    """Ledger lines still in force: neither removals nor removed"""
+    reversed_lines = {item.reverses for item in ledger if item.reverses is not None}
+    return [item for item in ledger if item.reverses is None and item.line not in reversed_lines]
+
+def cancellation_refund(total_price, days_to_departure):
+    """Amount refunded when a booking is cancelled some days before its first departure"""
+    for min_days, share in REFUND_POLICY:
+        if days_to_departure >= min_days:
+            return round(total_price * share, 2)
+    return 0.0
+
+def seats_by_cabin(passengers):
+    """Seats needed per cabin; lap infants do not take a seat"""
+    counts = {}
+    for passenger in passengers:
+        if passenger.passenger_type != "Infant":
+            counts[passenger.travel_class] = counts.get(passenger.travel_class, 0) + 1
+    return counts
+
+@profiled()
 def generate_seat_map(aircraft_model, travel_class):
-    """Generate seat map for aircraft"""
+    """Generate the seat layout of an aircraft cabin, every seat available
+
+    Which seats are taken comes from the seat inventory (see utils.service).
+    """
     seat_configs = {
         "Boeing 787-8": {
             "Economy": {"rows": 39, "seats_per_row": "ABCDEFGHJ", "pitch": "31-32 inches"},
@@ -47,16 +97,6 @@ def generate_seat_map(aircraft_model, travel_class):
     class_config = config.get(travel_class, config["Economy"])
 
     seats = []
-    occupied_seats = set()
-
-    # Randomly occupy some seats
-    total_seats = class_config["rows"] * len(class_config["seats_per_row"])
-    num_occupied = random.randint(int(total_seats * 0.3), int(total_seats * 0.7))
-
-    for _ in range(num_occupied):
-        row = random.randint(1, class_config["rows"])
-        seat_letter = random.choice(class_config["seats_per_row"])
-        occupied_seats.add(f"{row}{seat_letter}")
 
     for row in range(1, class_config["rows"] + 1):
         for seat_letter in class_config["seats_per_row"]:
@@ -68,7 +108,7 @@ def generate_seat_map(aircraft_model, travel_class):
                 "row": row,
                 "letter": seat_letter,
                 "type": seat_type,
-                "available": seat_id not in occupied_seats,
+                "available": True,
                 "price": 0 if travel_class != "Economy" else (25 if seat_type == "window" else 15 if seat_type == "aisle" else 0)
             })
 
@@ -78,26 +118,27 @@ def generate_seat_map(aircraft_model, travel_class):
         "aircraft": aircraft_model
     }
 
+@profiled()
 def validate_passenger_info(passenger):
     """Validate passenger information"""
     errors = []
 
-    if not isinstance(passenger, dict):
+    if not isinstance(passenger, Passenger):
         errors.append("Passenger data is missing or malformed.")
         return errors
 
     required_fields = ['first_name', 'last_name', 'date_of_birth', 'nationality', 'passport_number']
     for field in required_fields:
-        if not passenger.get(field):
+        if not getattr(passenger, field):
             errors.append(f"{field.replace('_', ' ').title()} is required")
 
     # Validate passport number format (basic)
-    passport = passenger.get('passport_number')
+    passport = passenger.passport_number
     if passport and len(passport) < 6:
         errors.append("Passport number must be at least 6 characters")
 
     # Validate date of birth
-    dob = passenger.get('date_of_birth')
+    dob = passenger.date_of_birth
     if dob:
         try:
             if isinstance(dob, datetime):
@@ -116,29 +157,45 @@ def validate_passenger_info(passenger):
 
     return errors
 
+def validate_travel_documents(passengers, departure_date):
+    """Check every passenger's travel documents for a departure at once; returns all errors, named"""
+    errors = []
+    for passenger in passengers:
+        name = passenger.full_name.strip() or "Passenger"
+        if not passenger.passport_number or len(passenger.passport_number) < 6:
+            errors.append(f"{name}: a passport or ID number of at least 6 characters is required")
+        if passenger.passport_expiry is None:
+            errors.append(f"{name}: passport expiry date is required")
+        elif date.fromisoformat(str(passenger.passport_expiry)) < date.fromisoformat(str(departure_date)):
+            errors.append(f"{name}: passport expires before the flight on {departure_date}")
+        if passenger.passenger_type == "Infant" and not passenger.accompanying_adult:
+            errors.append(f"{name}: infants must travel with a named accompanying adult")
+    return errors
+
+@profiled()
 def create_booking(booking_data):
     """Create a new booking"""
-    booking = {
-        "booking_reference": generate_booking_reference(),
-        "created_at": datetime.now().isoformat(),
-        "status": "Confirmed",
-        "flights": booking_data["flights"],
-        "passengers": booking_data["passengers"],
-        "contact": booking_data["contact"],
-        "total_price": booking_data["total_price"],
-        "payment_status": "Paid",
-        "tickets": []
-    }
+    booking = Booking(
+        booking_reference=generate_booking_reference(),
+        created_at=datetime.now().isoformat(),
+        status="Confirmed",
+        flights=booking_data["flights"],
+        passengers=booking_data["passengers"],
+        contact=booking_data["contact"],
+        total_price=booking_data["total_price"],
+        payment_status="Paid"
+    )
 
     # Generate tickets for each passenger
     for passenger in booking_data["passengers"]:
-        ticket = {
-            "ticket_number": generate_ticket_number(),
-            "passenger_name": f"{passenger['first_name']} {passenger['last_name']}",
-            "seat": passenger.get("seat", "Not assigned"),
-            "class": passenger.get("class", "Economy"),
-            "special_requests": passenger.get("special_requests", [])
-        }
-        booking["tickets"].append(ticket)
-
+        ticket = Ticket(
+            ticket_number=generate_ticket_number(),
+            passenger_name=passenger.full_name,
+            seat=passenger.seat or "Not assigned",
+            travel_class=passenger.travel_class,
+            special_requests=passenger.special_requests
+        )
+        booking.tickets.append(ticket)
+
+    BOOKINGS_CREATED.inc()
     return booking
@@ -0,0 +1,183 @@
+import time
+from datetime import timedelta
+
+from data.airports import AIRPORTS
+from data.bookings import bookings_on_flight, rebook_flights
+from data.flights import get_route_flights
+from data.inventory import (cabin_seats_left, close_flight, flight_key, get_flight, release_cabin_seats,
+                            reserve_cabin_seats_batch)
+from data.schedule_time import compute_schedule
+from data.status import HUB_CODE, is_cancelled
+from utils.booking import seats_by_cabin
+from utils.profiling import profiled
+
+# Bulk re-accommodation: when a flight is cancelled, every booking on it is
+# moved in one batch to direct flights on the same route or to connections
+# over the hub, over the following days.
+
+# Days after the cancelled departure searched for alternatives
+REACCOMMODATION_DAYS = 2
+
+# Shortest connection at the hub, in minutes
+MIN_CONNECTION_MINUTES = 90
+
+# Bookings in better cabins are re-accommodated first
+CABIN_PRIORITY = {"First": 0, "Business": 1, "Economy": 2}
+
+# Plans are recomputed if seats are sold between planning and commit
+COMMIT_ATTEMPTS = 3
+
+
+@profiled()
+def reaccommodate(key, days=REACCOMMODATION_DAYS):
+    """Move every booking off a cancelled flight; returns a summary of the moves
+
+    Bookings are taken in priority order (best cabin, then earliest booked)
+    and each party is kept together in its cabin on the earliest-arriving
+    itinerary with room for it. All seats are then taken in one atomic batch
+    and all bookings updated together; bookings with no itinerary left are
+    marked "Disrupted" for an agent to handle. Bookings cancelled or moved
+    by another run in the meantime are left as they are and their seats
+    released.
+    """
+    started = time.perf_counter()
+    cancelled = get_flight(key)
+    key = flight_key(cancelled)
+    close_flight(key)
+
+    bookings = [booking for booking in bookings_on_flight(key) if booking.status != "Cancelled"]
+    bookings.sort(key=lambda booking: (_booking_priority(booking), booking.created_at))
+    itineraries = find_itineraries(cancelled, days)
+
+    for _ in range(COMMIT_ATTEMPTS):
+        assignments, unplaced = plan_assignments(bookings, itineraries)
+        if reserve_cabin_seats_batch(_seats_taken(assignments)):
+            break
+    else:
+        assignments, unplaced = {}, bookings
+
+    # Bookings cancelled or moved since planning are skipped under the
+    # bookings lock, and the seats taken for them go back on sale
+    try:
+        skipped = set(rebook_flights(
+            {reference: (key, itinerary) for reference, (_, itinerary) in assignments.items()},
+            [(booking.booking_reference, key) for booking in unplaced]
+        ))
+    except Exception:
+        _release_seats(_seats_taken(assignments))
+        raise
+    _release_seats(_seats_taken({reference: plan for reference, plan in assignments.items() if reference in skipped}))
+
+    return {
+        "flight": key,
+        "bookings": len(bookings) - len(skipped),
+        "passengers": sum(len(booking.passengers) for booking in bookings if booking.booking_reference not in skipped),
+        "rebooked": {reference: itinerary for reference, (_, itinerary) in assignments.items() if reference not in skipped},
+        "disrupted": [booking.booking_reference for booking in unplaced if booking.booking_reference not in skipped],
+        "seconds": time.perf_counter() - started
+    }
+
+
+def find_itineraries(cancelled, days=REACCOMMODATION_DAYS):
+    """Alternative itineraries for a cancelled flight, earliest arrival first
+
+    Direct flights on the same route (including the same flight number on
+    later days), and for routes that do not touch the hub, two-leg
+    connections over it with at least MIN_CONNECTION_MINUTES between legs.
+    Only flights departing no earlier than the cancelled one and not
+    themselves cancelled on their date are considered.
+    """
+    hub_city = AIRPORTS[HUB_CODE]["city"]
+    dates = [cancelled.departure_date + timedelta(days=offset) for offset in range(days + 1)]
+    earliest = (cancelled.departure_date, cancelled.departure_time)
+    cancelled_key = flight_key(cancelled)
+
+    def usable(flights):
+        return [
+            flight for flight in flights
+            if flight_key(flight) != cancelled_key
+            and (flight.departure_date, flight.departure_time) >= earliest
+            and not is_cancelled(flight.flight_number, flight.departure_date)
+        ]
+
+    directs = [flight for day in dates for flight in usable(get_route_flights(cancelled.origin, cancelled.destination, day))]
+    first_legs = second_legs = []
+    if HUB_CODE not in (cancelled.origin_code, cancelled.destination_code):
+        first_legs = [flight for day in dates for flight in usable(get_route_flights(cancelled.origin, hub_city, day))]
+        second_legs = [
+            flight for day in dates + [dates[-1] + timedelta(days=1)]
+            for flight in get_route_flights(hub_city, cancelled.destination, day)
+            if not is_cancelled(flight.flight_number, flight.departure_date)
+        ]
+
+    # UTC departure and arrival of every candidate flight in one vectorized pass
+    candidates = directs + first_legs + second_legs
+    schedule = compute_schedule(
+        [flight.departure_date for flight in candidates],
+        [flight.departure_time for flight in candidates],
+        [flight.duration_minutes for flight in candidates],
+        [flight.origin_code for flight in candidates],
+        [flight.destination_code for flight in candidates]
+    )
+    departures = dict(zip(map(flight_key, candidates), schedule["departure_utc"].tolist()))
+    arrivals = dict(zip(map(flight_key, candidates), schedule["arrival_utc"].tolist()))
+
+    itineraries = [(arrivals[flight_key(flight)], (flight_key(flight),)) for flight in directs]
+    for first in first_legs:
+        ready = arrivals[flight_key(first)] + MIN_CONNECTION_MINUTES
+        for second in second_legs:
+            if departures[flight_key(second)] >= ready:
+                itineraries.append((arrivals[flight_key(second)], (flight_key(first), flight_key(second))))
+
+    itineraries.sort()
+    return [itinerary for _, itinerary in itineraries]
+
+
+def plan_assignments(bookings, itineraries):
+    """Assign each booking, in order, to the first itinerary with room for its whole party
+
+    Works on a snapshot of the seat counters; returns ({reference: (booking,
+    itinerary)}, unplaced bookings).
+    """
+    seats_left = {}
+    assignments = {}
+    unplaced = []
+
+    for booking in bookings:
+        needed = seats_by_cabin(booking.passengers)
+        for itinerary in itineraries:
+            counters = [((leg, cabin), count) for leg in itinerary for cabin, count in needed.items()]
+            for counter, _ in counters:
+                if counter not in seats_left:
+                    seats_left[counter] = cabin_seats_left(*counter)
+            if all(seats_left[counter] >= count for counter, count in counters):
+                for counter, count in counters:
+                    seats_left[counter] -= count
+                assignments[booking.booking_reference] = (booking, itinerary)
+                break
+        else:
+            unplaced.append(booking)
+
+    return assignments, unplaced
+
+
+def _seats_taken(assignments):
+    """Seats per (flight key, cabin) needed by a plan"""
+    counts = {}
+    for booking, itinerary in assignments.values():
+        for cabin, count in seats_by_cabin(booking.passengers).items():
+            for leg in itinerary:
+                counts[(leg, cabin)] = counts.get((leg, cabin), 0) + count
+    return counts
+
+
+def _release_seats(counts):
+    """Put seats taken by reserve_cabin_seats_batch back on sale"""
+    for (leg, cabin), count in counts.items():
+        release_cabin_seats(leg, cabin, count)
+
+
+def _booking_priority(booking):
+    """Rank of the best cabin on a booking"""
+    return min((CABIN_PRIORITY.get(passenger.travel_class, len(CABIN_PRIORITY)) for passenger in booking.passengers),
+               default=len(CABIN_PRIORITY))
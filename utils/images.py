@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import urllib.request
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from data.airports import AIRPORTS
+from data.flights import AIRCRAFT_TYPES
+from utils.metrics import REGISTRY
+
+# Content-addressed image store; override with IMAGE_STORE_DIR on hosts with a shared asset volume
+IMAGE_STORE_DIR = Path(os.environ.get("IMAGE_STORE_DIR", Path(__file__).resolve().parent.parent / "assets" / "images"))
+
+# Widths pre-rendered for every stored image
+THUMBNAIL_WIDTHS = (150, 300)
+
+PLACEHOLDER_COLOR = "#E5E7EB"
+PLACEHOLDER_ACCENT = "#9CA3AF"
+
+THUMBNAIL_HITS = REGISTRY.counter("kq_cache_requests_total", "Cache lookups by cache and result",
+                                  {"cache": "thumbnails", "result": "hit"})
+THUMBNAIL_MISSES = REGISTRY.counter("kq_cache_requests_total", "Cache lookups by cache and result",
+                                    {"cache": "thumbnails", "result": "miss"})
+
+
+class ImageStore:
+    """Local content-addressed image store serving pre-rendered thumbnails from memory"""
+
+    def __init__(self, root=IMAGE_STORE_DIR, widths=THUMBNAIL_WIDTHS):
+        self.root = Path(root)
+        self.widths = tuple(widths)
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+        self._thumbnails = {}
+        self._placeholders = {}
+
+    def store(self, url, data):
+        """Add an image's bytes to the store under its content hash and render its thumbnails"""
+        digest = hashlib.sha256(data).hexdigest()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        original = self.root / f"{digest}.img"
+        if not original.exists():
+            original.write_bytes(data)
+
+        for width in self.widths:
+            thumbnail = self._thumbnail_path(digest, width)
+            if not thumbnail.exists():
+                thumbnail.parent.mkdir(parents=True, exist_ok=True)
+                thumbnail.write_bytes(render_thumbnail(data, width))
+
+        with self._lock:
+            self._manifest[url] = digest
+            (self.root / "manifest.json").write_text(json.dumps(self._manifest, indent=2, sort_keys=True))
+
+        return digest
+
+    def warm(self):
+        """Load every stored thumbnail into memory"""
+        with self._lock:
+            digests = set(self._manifest.values())
+
+        for digest in digests:
+            for width in self.widths:
+                self._load_thumbnail(digest, width)
+
+        return len(self._thumbnails)
+
+    def get_thumbnail(self, url, width=THUMBNAIL_WIDTHS[0]):
+        """Get PNG/JPEG bytes for an image at a width, or a placeholder if it is not stored"""
+        digest = self._manifest.get(url)
+        if digest is not None:
+            thumbnail = self._thumbnails.get((digest, width)) or self._load_thumbnail(digest, width)
+            if thumbnail is not None:
+                THUMBNAIL_HITS.inc()
+                return thumbnail
+
+        THUMBNAIL_MISSES.inc()
+        return self.get_placeholder(width)
+
+    def get_placeholder(self, width=THUMBNAIL_WIDTHS[0]):
+        """Get a neutral placeholder image at a width"""
+        placeholder = self._placeholders.get(width)
+        if placeholder is None:
+            placeholder = self._placeholders[width] = render_placeholder(width)
+        return placeholder
+
+    def _load_thumbnail(self, digest, width):
+        """Read a pre-rendered thumbnail from disk into memory"""
+        path = self._thumbnail_path(digest, width)
+        if not path.exists():
+            return None
+
+        thumbnail = self._thumbnails[(digest, width)] = path.read_bytes()
+        return thumbnail
+
+    def _thumbnail_path(self, digest, width):
+        """Path of a pre-rendered thumbnail"""
+        return self.root / "thumbnails" / str(width) / f"{digest}.jpg"
+
+    def _load_manifest(self):
+        """Read the URL to content-hash manifest"""
+        manifest = self.root / "manifest.json"
+        if not manifest.exists():
+            return {}
+        return json.loads(manifest.read_text())
+
+
+def render_thumbnail(data, width):
+    """Resize an image to a width, keeping its aspect ratio"""
+    image = Image.open(BytesIO(data)).convert("RGB")
+    height = max(1, round(image.height * width / image.width))
+    thumbnail = image.resize((width, height), Image.LANCZOS)
+
+    buffered = BytesIO()
+    thumbnail.save(buffered, format="JPEG", quality=85, optimize=True)
+    return buffered.getvalue()
+
+
+def render_placeholder(width):
+    """Draw a plain placeholder at a 3:2 aspect ratio"""
+    height = width * 2 // 3
+    image = Image.new("RGB", (width, height), PLACEHOLDER_COLOR)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width - 1, height - 1], outline=PLACEHOLDER_ACCENT)
+    draw.line([0, 0, width - 1, height - 1], fill=PLACEHOLDER_ACCENT)
+    draw.line([0, height - 1, width - 1, 0], fill=PLACEHOLDER_ACCENT)
+
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Get the process-wide image store, loading its thumbnails on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore()
+            _store.warm()
+        return _store
+
+
+def get_thumbnail(url, width=THUMBNAIL_WIDTHS[0]):
+    """Get a stored image's thumbnail, or a placeholder; never touches the network"""
+    return get_image_store().get_thumbnail(url, width)
+
+
+def known_image_urls():
+    """Every remote image referenced by the flight and airport data"""
+    urls = [aircraft["image"] for aircraft in AIRCRAFT_TYPES]
+    urls += [airport["image"] for airport in AIRPORTS.values() if airport.get("image")]
+    return list(dict.fromkeys(urls))
+
+
+def prefetch(urls, store=None):
+    """Download images into the store; run at build time on a connected host"""
+    store = store or ImageStore()
+    failed = []
+
+    for url in urls:
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                store.store(url, response.read())
+        except (OSError, ValueError) as error:
+            failed.append((url, error))
+
+    return failed
+
+
+if __name__ == "__main__":
+    # Build the local store: python -m utils.images prefetch
+    if sys.argv[1:] != ["prefetch"]:
+        sys.exit("usage: python -m utils.images prefetch")
+
+    failures = prefetch(known_image_urls())
+    for url, error in failures:
+        print(f"failed: {url}: {error}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,271 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+
+# Headless load test: drives scripted journeys through app.py with AppTest,
+# one simulated session per journey, spread over worker processes, offline.
+#   python -m utils.loadtest --sessions 32 --workers 4
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+# Seconds a single rerun may take before AppTest gives up
+RERUN_TIMEOUT_SECONDS = 60
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+class JourneySession:
+    """One simulated browser session, counting reruns and timing each journey step"""
+
+    def __init__(self, app_path=APP_PATH, timeout=RERUN_TIMEOUT_SECONDS):
+        self.app = AppTest.from_file(str(app_path), default_timeout=timeout)
+        self.reruns = 0
+        self.steps = []
+
+    def run(self):
+        """Rerun the script, failing on any exception it rendered"""
+        self.app.run()
+        self.reruns += 1
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].value)
+
+    def open_page(self, url_path):
+        """Navigate to a page through the app's ?page= link, as following a link to it would"""
+        self.app.query_params["page"] = url_path
+        self.run()
+
+    def click(self, key):
+        self.app.button(key=key).click()
+        self.run()
+
+    def fill(self, values):
+        """Type into text inputs by widget key (takes effect on the next rerun)"""
+        for key, value in values.items():
+            self.app.text_input(key=key).input(value)
+
+    def step(self, name, action):
+        """Time one journey step, recording its latency and rerun count"""
+        reruns_before = self.reruns
+        started = time.perf_counter()
+        action(self)
+        self.steps.append({
+            "step": name,
+            "seconds": time.perf_counter() - started,
+            "reruns": self.reruns - reruns_before
+        })
+
+
+def _search(session):
+    session.run()
+    session.click("search_flights_btn")
+
+
+def _select_flights(session):
+    session.click("select_outbound_0")
+    session.click("select_return_1")
+
+
+def _book(session):
+    session.open_page("book")
+    session.fill({"contact_email": "loadtest@example.com", "contact_phone": "700000000", "contact_name": "Load Test"})
+    for checkbox in session.app.checkbox:
+        if checkbox.label.startswith("I accept"):
+            checkbox.check()
+    session.click("continue_to_passenger_details")
+
+
+def _seats(session):
+    session.open_page("seats")
+    for flight_key in session.app.session_state["booking_data"]["flights"]:
+        _select_seat(session, flight_key[0])
+    session.click("continue_with_seats")
+
+
+def _select_seat(session, flight_number):
+    """Click free seats on a flight's map until one is held for the session"""
+    prefix = f"seat_{flight_number}_"
+    for button in [button for button in session.app.button if (button.key or "").startswith(prefix)]:
+        if session.app.button(key=button.key).disabled:
+            continue
+        session.click(button.key)
+        if session.app.session_state["seat_selections"].get(flight_number):
+            return
+    raise RuntimeError(f"No free seat could be held on {flight_number}")
+
+
+def _passenger_info(session):
+    session.open_page("passengers")
+    session.fill({
+        "first_name_0": "Load", "last_name_0": "Test", "passport_0": "A1234567", "issuing_country_0": "Kenya",
+        "emergency_name": "Contact", "emergency_phone": "700000001"
+    })
+    # Check-in checks the passport is valid on the day of travel
+    session.app.date_input(key="passport_expiry_0").set_value(date.today() + timedelta(days=3650))
+    session.click("complete_booking_btn")
+
+
+def _confirm(session):
+    session.open_page("confirmed")
+
+
+def _check_in(session):
+    booking = session.app.session_state["current_booking"]
+    session.open_page("check-in")
+    session.fill({"checkin_booking_ref": booking.booking_reference, "checkin_last_name": "Test"})
+    session.click("find_booking_checkin")
+    session.fill({"checkin_email": "loadtest@example.com"})
+    session.click("complete_checkin")
+
+
+# Search → book → seats → passenger info → confirm → check-in
+JOURNEY = (
+    ("search", _search),
+    ("select_flights", _select_flights),
+    ("book", _book),
+    ("seats", _seats),
+    ("passenger_info", _passenger_info),
+    ("confirm", _confirm),
+    ("check_in", _check_in)
+)
+
+
+def run_worker(sessions, app_path=APP_PATH, trace_memory=False):
+    """Run journeys in one process, interleaving their steps so all sessions are live at once
+
+    AppTest sets up a process-wide runtime for every rerun, so sessions in one
+    process cannot rerun in parallel threads; parallelism comes from workers.
+    With ``trace_memory`` the run is traced with tracemalloc, which slows
+    every allocation, so its timings are only good for the memory figures.
+    """
+    set_log_level("error")
+    if trace_memory:
+        tracemalloc.start()
+    live = [JourneySession(app_path) for _ in range(sessions)]
+    errors = [None] * sessions
+
+    for name, action in JOURNEY:
+        for index, session in enumerate(live):
+            if errors[index] is None:
+                try:
+                    session.step(name, action)
+                except Exception as exc:
+                    errors[index] = f"{name}: {type(exc).__name__}: {exc}"
+
+    peak_traced = None
+    if trace_memory:
+        peak_traced = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return {
+        "results": [
+            {"steps": session.steps, "reruns": session.reruns, "error": error}
+            for session, error in zip(live, errors)
+        ],
+        "peak_traced_mb": peak_traced,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_load_test(sessions, workers, app_path=APP_PATH):
+    """Split journeys across worker processes and merge their reports
+
+    Latency comes from an untraced pass. Peak traced memory comes from a
+    second pass afterwards, which runs one worker's share of journeys under
+    tracemalloc in a fresh process.
+    """
+    shares = [sessions // workers + (1 if worker < sessions % workers else 0) for worker in range(workers)]
+    shares = [share for share in shares if share]
+    context = multiprocessing.get_context("spawn")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shares), mp_context=context) as pool:
+        outcomes = list(pool.map(run_worker, shares, [app_path] * len(shares)))
+    wall_seconds = time.perf_counter() - started
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        traced = pool.submit(run_worker, shares[0], app_path, True).result()
+
+    report = summarize([result for outcome in outcomes for result in outcome["results"]], wall_seconds)
+    report["errors"] += [f"memory pass: {result['error']}" for result in traced["results"] if result["error"]]
+    report["workers"] = len(shares)
+    report["peak_traced_mb"] = traced["peak_traced_mb"]
+    report["peak_rss_mb"] = max(outcome["peak_rss_mb"] for outcome in outcomes)
+    return report
+
+
+def summarize(results, wall_seconds):
+    """Per-step latency percentiles and rerun counts across journeys"""
+    by_step = {}
+    for result in results:
+        for step in result["steps"]:
+            by_step.setdefault(step["step"], []).append((step["seconds"], step["reruns"]))
+
+    steps = []
+    for name, _ in JOURNEY:
+        samples = by_step.get(name)
+        if not samples:
+            continue
+        latencies = np.array([seconds for seconds, _ in samples]) * 1000
+        reruns = [count for _, count in samples]
+        percentiles = np.percentile(latencies, LATENCY_PERCENTILES)
+        steps.append({
+            "step": name,
+            "count": len(samples),
+            **{f"p{p}_ms": float(value) for p, value in zip(LATENCY_PERCENTILES, percentiles)},
+            "max_ms": float(latencies.max()),
+            "reruns": sum(reruns) / len(reruns)
+        })
+
+    errors = [result["error"] for result in results if result["error"]]
+    completed = len(results) - len(errors)
+    return {
+        "sessions": len(results),
+        "completed": completed,
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "journeys_per_second": completed / wall_seconds if wall_seconds else 0.0,
+        "reruns_per_journey": sum(result["reruns"] for result in results) / max(1, len(results)),
+        "steps": steps
+    }
+
+
+def format_report(report):
+    """Render a load-test report as a plain-text table"""
+    lines = [
+        f"{report['completed']}/{report['sessions']} journeys in {report['wall_seconds']:.1f}s "
+        f"on {report['workers']} workers ({report['journeys_per_second']:.2f} journeys/s)",
+        f"reruns per journey: {report['reruns_per_journey']:.1f}   "
+        f"peak traced per worker: {report['peak_traced_mb']:.1f} MB   peak RSS per worker: {report['peak_rss_mb']:.1f} MB",
+        "",
+        f"{'step':<16}{'n':>5}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'reruns':>8}"
+    ]
+    for step in report["steps"]:
+        lines.append(
+            f"{step['step']:<16}{step['count']:>5}{step['p50_ms']:>10.1f}{step['p90_ms']:>10.1f}"
+            f"{step['p99_ms']:>10.1f}{step['max_ms']:>10.1f}{step['reruns']:>8.1f}"
+        )
+    for error in dict.fromkeys(report["errors"]):
+        lines.append(f"error: {error}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive scripted journeys through app.py with AppTest")
+    parser.add_argument("--sessions", type=int, default=8, help="journeys to run, one session each")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes, each interleaving its sessions")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    load_report = run_load_test(args.sessions, args.workers)
+    print(json.dumps(load_report, indent=2) if args.json else format_report(load_report))
+    sys.exit(1 if load_report["errors"] else 0)
@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond lookups to multi-second renders
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Seconds between writes of the Prometheus text file
+TEXTFILE_INTERVAL_SECONDS = 15
+
+
+class _ShardedMetric:
+    """Per-thread shards: each thread updates only its own shard, without locking
+
+    Readers sum the shards. Streamlit runs every rerun on a fresh thread, so
+    shards of finished threads are folded into a retired total whenever a new
+    shard is created.
+    """
+
+    def __init__(self, name, help_text, labels, shard_size):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._shard_size = shard_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = [0] * shard_size
+
+    def _new_shard(self):
+        """Create and register the calling thread's shard"""
+        shard = [0] * self._shard_size
+        with self._lock:
+            live = []
+            for thread, old_shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, old_shard))
+                else:
+                    for i, value in enumerate(old_shard):
+                        self._retired[i] += value
+            live.append((threading.current_thread(), shard))
+            self._shards = live
+        self._local.shard = shard
+        return shard
+
+    def _totals(self):
+        """Sum every shard"""
+        with self._lock:
+            totals = list(self._retired)
+            for _, shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class Counter(_ShardedMetric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=None):
+        super().__init__(name, help_text, labels or {}, 1)
+
+    def inc(self, amount=1):
+        """Add to the counter"""
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._new_shard()[0] += amount
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+    def samples(self):
+        """Prometheus samples as (suffix, extra labels, value)"""
+        return [("", {}, self.value)]
+
+
+class Histogram(_ShardedMetric):
+    """Histogram with fixed upper bounds; the last shard slot holds the running sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labels or {}, len(self.buckets) + 2)
+
+    def observe(self, value):
+        """Record one observation"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def time(self):
+        """Context manager observing the seconds spent in a block"""
+        return _Timer(self)
+
+    def samples(self):
+        """Prometheus samples as (suffix, extra labels, value)"""
+        totals = self._totals()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, totals):
+            cumulative += count
+            samples.append(("_bucket", {"le": _format_value(bound)}, cumulative))
+        cumulative += totals[len(self.buckets)]
+        samples.append(("_bucket", {"le": "+Inf"}, cumulative))
+        samples.append(("_sum", {}, totals[-1]))
+        samples.append(("_count", {}, cumulative))
+        return samples
+
+
+class _Timer:
+    """Times a block into a histogram"""
+
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class MetricsRegistry:
+    """In-process metric families, exportable in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, help_text, labels=None):
+        """Get or create a counter"""
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def _get_or_create(self, metric_class, name, help_text, labels, **options):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = metric_class(name, help_text, labels, **options)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def render(self):
+        """Render every metric in Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+        family = None
+        for (name, _), metric in metrics:
+            if name != family:
+                family = name
+                lines.append(f"# HELP {name} {metric.help_text}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            for suffix, extra_labels, value in metric.samples():
+                lines.append(f"{name}{suffix}{_format_labels({**metric.labels, **extra_labels})} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write the metrics to a file (for node_exporter's textfile collector)"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as textfile:
+            textfile.write(self.render())
+        os.replace(temporary, path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+# Process-wide registry used by the data, utils and pages layers
+REGISTRY = MetricsRegistry()
+
+_exporter_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_http_exporter(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve /metrics from a daemon thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_textfile_exporter(path, interval=TEXTFILE_INTERVAL_SECONDS, registry=REGISTRY):
+    """Rewrite the metrics file every interval seconds from a daemon thread"""
+    def write_forever():
+        while True:
+            registry.write_textfile(path)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=write_forever, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_exporters_from_env():
+    """Start the exporters configured by METRICS_PORT / METRICS_TEXTFILE, once per process"""
+    global _exporters_started
+    with _exporter_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if os.environ.get("METRICS_PORT"):
+        start_http_exporter(int(os.environ["METRICS_PORT"]), os.environ.get("METRICS_HOST", "127.0.0.1"))
+    if os.environ.get("METRICS_TEXTFILE"):
+        start_textfile_exporter(os.environ["METRICS_TEXTFILE"])
@@ -0,0 +1,146 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Functions shown in the cProfile summary of a rerun
+CPROFILE_TOP_FUNCTIONS = 20
+
+# Each Streamlit session runs its script on its own thread, so the active
+# rerun profile is tracked per thread. Timers are no-ops when none is active.
+_active = threading.local()
+
+
+class RerunProfile:
+    """Timings collected during one script rerun"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.calls = {}
+        self.wall_ms = 0.0
+        self.memory_delta_kb = None
+        self.memory_peak_kb = None
+        self.cprofile_report = None
+
+    def record(self, name, elapsed_ms):
+        """Add one timed call"""
+        stats = self.calls.get(name)
+        if stats is None:
+            self.calls[name] = [1, elapsed_ms, elapsed_ms]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed_ms
+            stats[2] = max(stats[2], elapsed_ms)
+
+    def summary(self):
+        """Plain-dict summary suitable for session state"""
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "wall_ms": self.wall_ms,
+            "calls": {name: tuple(stats) for name, stats in self.calls.items()},
+            "memory_delta_kb": self.memory_delta_kb,
+            "memory_peak_kb": self.memory_peak_kb,
+            "cprofile_report": self.cprofile_report
+        }
+
+
+def profiled(name=None):
+    """Decorator timing a function whenever a rerun profile is active on this thread"""
+    def decorate(function):
+        label = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_active, "profile", None)
+            if profile is None:
+                return function(*args, **kwargs)
+
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.record(label, (time.perf_counter() - started) * 1000)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def profile_block(name):
+    """Time a block whenever a rerun profile is active on this thread"""
+    profile = getattr(_active, "profile", None)
+    if profile is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def profile_rerun(name, use_cprofile=False, trace_memory=False):
+    """Collect timings, and optionally a cProfile report and memory delta, for one rerun
+
+    tracemalloc is process-wide: once started it keeps tracing, and the
+    memory figures include allocations made by other sessions meanwhile.
+    """
+    profile = RerunProfile(name)
+    previous = getattr(_active, "profile", None)
+    _active.profile = profile
+
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    profiler = cProfile.Profile() if use_cprofile else None
+    if profiler:
+        profiler.enable()
+
+    started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.wall_ms = (time.perf_counter() - started) * 1000
+
+        if profiler:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(CPROFILE_TOP_FUNCTIONS)
+            profile.cprofile_report = report.getvalue()
+
+        if trace_memory and tracemalloc.is_tracing():
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            profile.memory_delta_kb = (memory_after - memory_before) / 1024
+            profile.memory_peak_kb = memory_peak / 1024
+
+        _active.profile = previous
+
+
+def slowest_calls(summaries, limit=15):
+    """Aggregate call timings across rerun summaries, slowest total first"""
+    totals = {}
+    for summary in summaries:
+        for name, (count, total_ms, max_ms) in summary["calls"].items():
+            stats = totals.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += count
+            stats[1] += total_ms
+            stats[2] = max(stats[2], max_ms)
+
+    ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+    return [
+        {"call": name, "count": count, "total_ms": total_ms, "mean_ms": total_ms / count, "max_ms": max_ms}
+        for name, (count, total_ms, max_ms) in ranked[:limit]
+    ]
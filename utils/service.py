@@ -0,0 +1,807 @@
+import base64
+import json
+import queue
+import random
+import threading
+import time
+from dataclasses import replace
+from types import MappingProxyType
+from datetime import date
+from itertools import islice
+
+from data import waitlist
+from data.bookings import (cancel_booking, check_in_booking, get_booking, post_ancillaries, reverse_ancillary,
+                           save_booking, set_booking_status)
+from data.flights import search_flights, stream_flights
+from data.inventory import (cabin_seats_unsold, flight_legs, get_flight, get_flights, is_closed, normalize_key,
+                            release_cabin_seats, reserve_cabin_seats)
+from data.models import BoardingPass, SeatMap
+from data.schedule_time import format_local_time, parse_local_time
+from data.status import BOARDING_WINDOW_MINUTES, add_status_listener, get_flight_status, is_cancelled, update_flight_status
+from utils import disruption
+from utils.booking import (ANCILLARIES, calculate_total_price, cancellation_refund, create_booking, generate_seat_map,
+                           price_ancillary, seats_by_cabin, validate_passenger_info, validate_travel_documents)
+from utils.metrics import REGISTRY
+
+# Booking operations as plain functions, shared by the Streamlit pages and
+# the HTTP front end in utils/api.py. Failures raise ServiceError subclasses.
+
+# Flights per page of a paged search
+SEARCH_PAGE_SIZE = 20
+
+# Seconds a seat hold lasts before other holders may take the seat
+HOLD_SECONDS = 15 * 60
+
+# Booking statuses that may check in; "Disrupted" bookings need an agent first
+CHECK_IN_STATUSES = ("Confirmed", "Rebooked", "Checked In")
+
+SEAT_HOLD_CONFLICTS = REGISTRY.counter("kq_seat_hold_conflicts_total", "Seat selections rejected",
+                                       {"reason": "taken"})
+CABIN_SOLD_OUT = REGISTRY.counter("kq_seat_hold_conflicts_total", "Seat selections rejected",
+                                  {"reason": "sold_out"})
+REACCOMMODATION_FAILURES = REGISTRY.counter("kq_reaccommodation_failures_total",
+                                            "Feed cancellations that could not be re-accommodated")
+
+
+class ServiceError(Exception):
+    """A request the service cannot fulfil"""
+
+    status = 400
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class NotFound(ServiceError):
+    status = 404
+
+
+class Conflict(ServiceError):
+    status = 409
+
+
+class InvalidRequest(ServiceError):
+    status = 422
+
+
+# Seat layouts and seat holds per (flight key, cabin). A hold is (holder,
+# expiry); confirmed seats are held by their booking reference with no expiry.
+# Which other seats are open follows the cabin's unsold seats in the
+# inventory (see _open_seats).
+_seats_lock = threading.Lock()
+_seat_maps = {}
+_holds = {}
+
+# Flights cancelled on the status feed, waiting for the re-accommodation worker
+_cancelled_flights = queue.Queue()
+_reaccommodation_lock = threading.Lock()
+_reaccommodation_worker = None
+
+# Each cabin's seat version, bumped whenever its holds change, one lapses or
+# its unsold seats move, the SeatMap snapshot built for the current version
+# and the unsold seats it was built with
+_seat_map_versions = {}
+_seat_map_snapshots = {}
+_seat_map_unsold = {}
+
+
+def search(origin, destination, departure_date, return_date=None, passengers=1, travel_class="Economy"):
+    """Search flights; returns {"outbound": [...], "return": [...]} or [] for unknown cities"""
+    return search_flights(origin, destination, departure_date, return_date, passengers, travel_class)
+
+
+def search_page(origin, destination, departure_date, return_date=None, passengers=1, travel_class="Economy",
+                limit=SEARCH_PAGE_SIZE):
+    """First page of each direction of a search
+
+    Returns ({direction: flights}, {direction: cursor}); a cursor is None
+    when the direction has no more results, else it fetches the next page
+    through next_page. Results are taken lazily, so only a page and one
+    look-ahead flight are read per direction however many match.
+    """
+    query = [origin, destination, str(departure_date), return_date and str(return_date), passengers, travel_class]
+    streams = stream_flights(origin, destination, departure_date, return_date, passengers, travel_class)
+    pages, cursors = {}, {}
+    for direction, stream in streams.items():
+        pages[direction], cursors[direction] = _page(stream, query, direction, limit)
+    return pages, cursors
+
+
+def next_page(cursor, limit=SEARCH_PAGE_SIZE):
+    """The page of results a cursor points at; returns (direction, flights, next cursor)
+
+    The search resumes where the previous page stopped rather than running
+    again from the start.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        origin, destination, departure_date, return_date, passengers, travel_class = state["query"]
+        direction, position = state["direction"], int(state["position"])
+        streams = stream_flights(origin, destination, date.fromisoformat(departure_date),
+                                 return_date and date.fromisoformat(return_date), passengers, travel_class,
+                                 {direction: position})
+    except (ValueError, KeyError, TypeError):
+        raise InvalidRequest("Invalid search cursor") from None
+
+    flights, cursor = _page(streams.get(direction, iter(())), state["query"], direction, limit)
+    return direction, flights, cursor
+
+
+def price(flight_keys, passengers, extras=None):
+    """Total price of a set of flights for some passengers, plus extras"""
+    try:
+        flights = get_flights(flight_keys)
+    except KeyError as exc:
+        raise NotFound(f"Unknown flight {exc.args[0]}") from None
+    try:
+        return calculate_total_price(flights, passengers, extras)
+    except KeyError as exc:
+        raise InvalidRequest(f"Cabin {exc.args[0]} is not sold on these flights") from None
+
+
+def get_seat_map(flight_key, travel_class):
+    """Snapshot of a flight cabin's seats; only seats open for sale are available
+
+    Seats held by anyone, confirmed to a booking or sold without a seat
+    number are unavailable, so the free seats match the cabin's inventory.
+
+    Snapshots are shared by every caller until the cabin's version changes,
+    so repeated reads cost a lookup.
+    """
+    flight_key = normalize_key(flight_key)
+    cabin = (flight_key, travel_class)
+    now = time.time()
+    with _seats_lock:
+        seat_map = _cabin_seat_map(flight_key, travel_class)
+        version = _seat_map_version(cabin, now)
+        snapshot = _seat_map_snapshots.get(cabin)
+        if snapshot is None or snapshot.version != version:
+            live = [hold for hold in _holds.get(cabin, {}).values() if _is_live(hold, now)]
+            unsold = _seat_map_unsold[cabin] = cabin_seats_unsold(flight_key, travel_class)
+            open_seats = _open_seats(cabin, seat_map, now, unsold)
+            snapshot = _seat_map_snapshots[cabin] = SeatMap(
+                flight_key=flight_key,
+                travel_class=travel_class,
+                aircraft=seat_map["aircraft"],
+                config=MappingProxyType(seat_map["config"]),
+                seats=tuple(
+                    MappingProxyType({**seat, "available": seat["seat_id"] in open_seats})
+                    for seat in seat_map["seats"]
+                ),
+                version=version,
+                valid_until=min((expiry for _, expiry in live if expiry is not None), default=None)
+            )
+    return snapshot
+
+
+def seat_map_version(flight_key, travel_class):
+    """Current version of a flight cabin's seats; a cached snapshot is stale once this differs"""
+    with _seats_lock:
+        return _seat_map_version((normalize_key(flight_key), travel_class), time.time())
+
+
+def hold_seats(flight_key, travel_class, seat_ids, holder):
+    """Hold open seats for a holder, all or none; returns the hold expiry (epoch seconds)
+
+    Seats the holder already holds may be held again, which renews them.
+    """
+    flight_key = normalize_key(flight_key)
+    cabin = (flight_key, travel_class)
+    now = time.time()
+
+    with _seats_lock:
+        seat_map = _cabin_seat_map(flight_key, travel_class)
+        holds = _holds.setdefault(cabin, {})
+        sellable = _open_seats(cabin, seat_map, now, cabin_seats_unsold(flight_key, travel_class)) | {
+            seat_id for seat_id, hold in holds.items() if hold[0] == holder and _is_live(hold, now)
+        }
+
+        known = {seat["seat_id"] for seat in seat_map["seats"]}
+        unknown = [seat_id for seat_id in seat_ids if seat_id not in known]
+        taken = [seat_id for seat_id in seat_ids if seat_id in known and seat_id not in sellable]
+        if unknown or taken:
+            SEAT_HOLD_CONFLICTS.inc()
+            raise Conflict("Seats are no longer available", unknown + taken)
+
+        expires_at = now + HOLD_SECONDS
+        for seat_id in seat_ids:
+            holds[seat_id] = (holder, expires_at)
+        _bump_seat_map_version(cabin)
+
+    return expires_at
+
+
+def release_seats(flight_key, travel_class, holder, seat_ids=None):
+    """Release a holder's seats on a flight cabin (all of them if seat_ids is None)"""
+    cabin = (normalize_key(flight_key), travel_class)
+    with _seats_lock:
+        holds = _holds.get(cabin, {})
+        for seat_id, (seat_holder, _) in list(holds.items()):
+            if seat_holder == holder and (seat_ids is None or seat_id in seat_ids):
+                del holds[seat_id]
+                _bump_seat_map_version(cabin)
+
+
+def create(flight_keys, passengers, contact, extras=None, seat_selections=None, holder=None, waitlist_entry_id=None):
+    """Validate, price and store a booking
+
+    ``seat_selections`` maps flight number to seat ids in the order of the
+    passengers who take a seat (lap infants do not); every one must still be
+    held by ``holder`` in that passenger's cabin, and is confirmed for the
+    new booking. Selections on the first flight are printed on the tickets.
+    The booking gets copies of ``passengers``, which are left unchanged.
+    With ``waitlist_entry_id`` the booking takes the seats offered to that
+    waitlist request instead of reserving new ones; ``contact`` must have the
+    request's email.
+    """
+    errors = []
+    for index, passenger in enumerate(passengers):
+        errors += [f"Passenger {index + 1}: {error}" for error in validate_passenger_info(passenger)]
+    if not contact or not contact.get("email"):
+        errors.append("Contact email is required")
+    if errors:
+        raise InvalidRequest("Invalid booking request", errors)
+
+    if not flight_keys:
+        raise InvalidRequest("A booking needs at least one flight")
+    try:
+        flights = get_flights(flight_keys)
+    except KeyError as exc:
+        raise NotFound(f"Unknown flight {exc.args[0]}") from None
+
+    # Seats come only from held selections, never from the passenger data sent in
+    passengers = [replace(passenger, seat=None, assigned_seats=list(passenger.assigned_seats),
+                          special_requests=list(passenger.special_requests)) for passenger in passengers]
+    seated = [passenger for passenger in passengers if passenger.passenger_type != "Infant"]
+    selected = [
+        (passenger, (normalize_key(key), passenger.travel_class), seat_id, position == 0)
+        for position, (key, flight) in enumerate(zip(flight_keys, flights))
+        for passenger, seat_id in zip(seated, (seat_selections or {}).get(flight.flight_number, []))
+    ]
+    if selected and holder is None:
+        raise InvalidRequest("Seat selections need the holder that holds them")
+    if len({(cabin, seat_id) for _, cabin, seat_id, _ in selected}) < len(selected):
+        raise InvalidRequest("A seat is selected for more than one passenger")
+
+    cabin_counts = seats_by_cabin(passengers)
+    if waitlist_entry_id is None:
+        _reserve_cabins(flight_keys, cabin_counts)
+    else:
+        _check_waitlist_offer(waitlist_entry_id, contact["email"], flight_keys, cabin_counts)
+
+    for passenger, _, seat_id, first_flight in selected:
+        if first_flight:
+            passenger.seat = seat_id
+
+    try:
+        booking = create_booking({
+            "flights": [normalize_key(key) for key in flight_keys],
+            "passengers": passengers,
+            "contact": contact,
+            "total_price": price(flight_keys, passengers, extras)
+        })
+        # Holds are checked and confirmed, and a waitlist offer accepted,
+        # together with storing the booking
+        with _seats_lock:
+            if waitlist_entry_id is not None and waitlist.accept_offer(waitlist_entry_id) is None:
+                raise Conflict("The waitlist offer is not open")
+            try:
+                _confirm_holds([(cabin, seat_id) for _, cabin, seat_id, _ in selected], holder,
+                               booking.booking_reference)
+                save_booking(booking)
+            except Exception:
+                if waitlist_entry_id is not None:
+                    waitlist.reopen_offer(waitlist_entry_id)
+                raise
+    except Exception:
+        # Seats offered to a waitlist request stay reserved for it
+        if waitlist_entry_id is None:
+            _release_cabins(flight_keys, cabin_counts)
+        raise
+
+    return booking
+
+
+def join_waitlist(flight_key, travel_class, seats, contact, fare_class="Classic", tier=None):
+    """Queue for seats on a sold-out cabin; returns the entry and its queue position (None once offered)"""
+    try:
+        get_flight(flight_key)
+    except KeyError:
+        raise NotFound(f"Unknown flight {flight_key[0]} on {flight_key[1]}") from None
+    if not contact or not contact.get("email"):
+        raise InvalidRequest("Contact email is required")
+    try:
+        entry = waitlist.join_waitlist(flight_key, travel_class, seats, contact, fare_class, tier)
+    except ValueError as exc:
+        raise InvalidRequest(str(exc)) from None
+    return entry, waitlist.waitlist_position(entry.entry_id)
+
+
+def waitlist_status(entry_id, email):
+    """A waitlist entry and its queue position (None unless still waiting)
+
+    ``email`` must be the contact email the request was made with.
+    """
+    _waitlist_entry(entry_id, email)
+    waitlist.expire_offers()
+    return waitlist.get_waitlist_entry(entry_id), waitlist.waitlist_position(entry_id)
+
+
+def leave_waitlist(entry_id, email):
+    """Withdraw a waitlist request made with ``email``, returning any seats offered to it"""
+    entry = _waitlist_entry(entry_id, email)
+    if entry.status not in ("Waiting", "Offered"):
+        raise Conflict(f"The waitlist request is already {entry.status.lower()}")
+    return waitlist.leave_waitlist(entry_id)
+
+
+def retrieve(booking_reference, last_name=None):
+    """Get a booking, optionally requiring a passenger with the given last name"""
+    booking = get_booking(booking_reference or "")
+    if booking is None or (last_name and not _passengers_named(booking, last_name)):
+        raise NotFound("Booking not found")
+    return booking
+
+
+def check_in(booking_reference, last_name, seat=None):
+    """Check in the passengers with a last name on a booking's first flight; returns their boarding passes
+
+    ``seat`` is asked for the first of them who takes a seat; it must be
+    free. The others without a seat are seated together (see check_in_group).
+    """
+    booking = _retrieve_named(booking_reference, last_name)
+    named = {id(passenger) for passenger in _passengers_named(booking, last_name)}
+    indices = [index for index, passenger in enumerate(booking.passengers) if id(passenger) in named]
+    seated = [index for index in indices if booking.passengers[index].passenger_type != "Infant"]
+    return _check_in_passengers(booking, indices, {seated[0]: seat} if seat and seated else {})
+
+
+def check_in_group(booking_reference, last_name, seat_requests=None):
+    """Check in every passenger on a booking's first flight at once; returns all their boarding passes
+
+    Any passenger's last name identifies the booking. All travel documents
+    are checked together and nothing changes unless every one passes. Then
+    the seats asked for in ``seat_requests`` (passenger index to seat id)
+    and seats side by side in their own cabin for everyone else without one
+    are taken in a single step, all or none, before every boarding pass is
+    issued.
+    """
+    booking = _retrieve_named(booking_reference, last_name)
+    return _check_in_passengers(booking, range(len(booking.passengers)), seat_requests or {})
+
+
+def _retrieve_named(booking_reference, last_name):
+    """A booking identified by reference and a passenger's last name, which is required"""
+    if not isinstance(last_name, str) or not last_name.strip():
+        raise InvalidRequest("A passenger's last name is required")
+    return retrieve(booking_reference, last_name)
+
+
+def _check_in_passengers(booking, indices, seat_requests):
+    """Check in some of a booking's passengers (by index), seating them all or none; returns their boarding passes"""
+    _check_in_allowed(booking.status)
+
+    flight = get_flight(booking.flights[0])
+    passengers = [booking.passengers[index] for index in indices]
+    errors = validate_travel_documents(passengers, flight.departure_date)
+    if errors:
+        raise InvalidRequest("Travel documents need attention", errors)
+
+    # Lap infants do not take a seat
+    seated = [index for index in indices if booking.passengers[index].passenger_type != "Infant"]
+    seat_requests = {int(index): seat_id for index, seat_id in seat_requests.items() if int(index) in seated}
+    # Each passenger sits in the cabin they are booked in
+    cabins = {}
+    for index in seated:
+        cabin = (normalize_key(booking.flights[0]), booking.passengers[index].travel_class)
+        cabins.setdefault(cabin, []).append(index)
+
+    # Seats are planned in every cabin, then the booking is updated under its
+    # own lock and only if it may still check in, then the seats are confirmed
+    with _seats_lock:
+        now = time.time()
+        plans = {
+            cabin: _assign_group_seats(cabin, booking, indices_in_cabin,
+                                       {index: seat_requests[index] for index in indices_in_cabin if index in seat_requests},
+                                       now)
+            for cabin, indices_in_cabin in cabins.items()
+        }
+        seats = {index: seat_id for cabin_seats, _ in plans.values() for index, seat_id in cabin_seats.items()}
+        _check_in_allowed(check_in_booking(booking.booking_reference, seats, CHECK_IN_STATUSES))
+        for cabin, (cabin_seats, released) in plans.items():
+            _confirm_group_seats(cabin, booking.booking_reference, cabin_seats, released)
+
+    return _boarding_passes(booking, flight, passengers)
+
+
+def _check_in_allowed(status):
+    """Raise Conflict unless a booking with this status may check in"""
+    if status == "Cancelled":
+        raise Conflict("Booking is cancelled")
+    if status == "Disrupted":
+        raise Conflict("Booking was disrupted by a flight cancellation; please contact us to be rebooked")
+    if status not in CHECK_IN_STATUSES:
+        raise Conflict(f"Booking cannot be checked in while {status}")
+
+
+def _boarding_passes(booking, flight, passengers):
+    """Boarding passes for some of a booking's passengers on one flight"""
+    status = get_flight_status(flight.flight_number, flight.departure_date)
+    return [
+        BoardingPass(
+            passenger_name=passenger.full_name,
+            flight_number=flight.flight_number,
+            route=f"{flight.origin} → {flight.destination}",
+            departure_date=str(flight.departure_date),
+            departure_time=flight.departure_time,
+            boarding_time=boarding_time(flight),
+            seat=passenger.seat or ("Lap infant" if passenger.passenger_type == "Infant" else "Assigned at gate"),
+            gate=status["gate"],
+            terminal=status["terminal"],
+            travel_class=passenger.travel_class,
+            booking_reference=booking.booking_reference,
+            barcode=f"*{booking.booking_reference}*{flight.flight_number}*",
+            sequence=random.randint(1, 200)
+        )
+        for passenger in passengers
+    ]
+
+
+def boarding_time(flight):
+    """Local time boarding opens for a flight"""
+    return format_local_time(parse_local_time(flight.departure_time) - BOARDING_WINDOW_MINUTES)
+
+
+def cancel(booking_reference, last_name=None):
+    """Cancel a booking and free its confirmed seats; with ``last_name``, a passenger must have it
+
+    The refund, set on the returned booking, follows utils.booking.REFUND_POLICY
+    by the days left before the first flight.
+    """
+    booking = retrieve(booking_reference, last_name)
+    days_to_departure = (get_flight(booking.flights[0]).departure_date - date.today()).days
+    refund = cancellation_refund(booking.total_price, days_to_departure)
+    if cancel_booking(booking.booking_reference, refund) == "Cancelled":
+        return booking
+
+    cabin_counts = seats_by_cabin(booking.passengers)
+    for key in booking.flights:
+        for travel_class in cabin_counts:
+            release_seats(key, travel_class, booking.booking_reference)
+    _release_cabins(booking.flights, cabin_counts)
+
+    return booking
+
+
+def add_ancillaries(booking_reference, items, last_name=None):
+    """Add services to a booking; returns its new ledger lines
+
+    ``items`` are {"code", "quantity"?, "passenger"?} dicts, priced from
+    utils.booking.ANCILLARIES. The booking total moves by the new lines only.
+    With ``last_name``, a passenger on the booking must have it.
+    """
+    booking = retrieve(booking_reference, last_name)
+    posted, rejected = post_ancillaries({booking.booking_reference: _ancillary_lines(items, booking)})
+    if rejected:
+        raise Conflict(rejected[booking.booking_reference])
+    return posted[booking.booking_reference]
+
+
+def apply_ancillaries(orders, last_names=None):
+    """Add services to many bookings in one step, e.g. for an upsell campaign
+
+    ``orders`` maps booking reference to items as for add_ancillaries. Every
+    item is validated before anything is posted; bookings that are missing
+    or cancelled are skipped, as are bookings without a passenger named as
+    in ``last_names`` (reference to last name) when it is given. Returns
+    ({reference: new lines}, {reference: reason skipped}).
+    """
+    lines, unmatched, errors = {}, {}, []
+    for reference, items in orders.items():
+        booking = get_booking(reference)
+        if last_names is not None and (booking is None or not _passengers_named(booking, last_names.get(reference) or "")):
+            unmatched[reference] = "Booking not found"
+            continue
+        try:
+            lines[reference] = _ancillary_lines(items, booking)
+        except InvalidRequest as exc:
+            errors += [f"{reference}: {error}" for error in exc.errors]
+    if errors:
+        raise InvalidRequest("Invalid ancillary order", errors)
+    posted, rejected = post_ancillaries(lines)
+    return posted, {**unmatched, **rejected}
+
+
+def remove_ancillary(booking_reference, line, last_name=None):
+    """Remove a service from a booking by appending a line reversing it; returns that line
+
+    With ``last_name``, a passenger on the booking must have it.
+    """
+    booking = retrieve(booking_reference, last_name)
+    try:
+        return reverse_ancillary(booking.booking_reference, line)
+    except KeyError:
+        raise NotFound(f"Booking {booking.booking_reference} has no ancillary line {line}") from None
+    except ValueError as exc:
+        raise Conflict(str(exc)) from None
+
+
+def reaccommodate(flight_key):
+    """Cancel a flight and move its bookings to alternatives (see utils.disruption)
+
+    An operations action: it is not on the public API, and is run for
+    cancellations reported on the status feed. The flight is reported
+    cancelled to the status store so boards and later searches see it.
+    """
+    try:
+        flight = get_flight(flight_key)
+    except KeyError:
+        raise NotFound(f"Unknown flight {flight_key[0]} on {flight_key[1]}") from None
+    summary = disruption.reaccommodate(flight_key)
+    if not is_cancelled(flight.flight_number, flight.departure_date):
+        update_flight_status(flight.flight_number, flight.departure_date, status="Cancelled")
+    return summary
+
+
+def _on_status_change(flight_number, fields):
+    """Queue a flight's bookings for re-accommodation when an operations feed cancels it"""
+    legs = flight_legs(flight_number, fields["departure_date"])
+    if fields.get("status") != "Cancelled" or all(is_closed(key) for key in legs):
+        return
+    global _reaccommodation_worker
+    with _reaccommodation_lock:
+        if _reaccommodation_worker is None:
+            _reaccommodation_worker = threading.Thread(target=_reaccommodate_cancelled, name="reaccommodation",
+                                                       daemon=True)
+            _reaccommodation_worker.start()
+    _cancelled_flights.put((flight_number, fields["departure_date"]))
+
+
+def _reaccommodate_cancelled():
+    """Re-accommodate queued cancellations one at a time, off the status feed's thread
+
+    A cancelled flight number cancels every leg flown under it that day.
+    """
+    while True:
+        flight_number, departure_date = _cancelled_flights.get()
+        for flight_key in flight_legs(flight_number, departure_date):
+            if is_closed(flight_key):
+                continue
+            try:
+                reaccommodate(flight_key)
+            except NotFound:
+                pass
+            except Exception:
+                REACCOMMODATION_FAILURES.inc()
+
+
+def _page(stream, query, direction, limit):
+    """Take one page from a lazy stream of (position, flight), and a cursor to the next if there is one"""
+    page = list(islice(stream, limit + 1))
+    if len(page) <= limit:
+        return [flight for _, flight in page], None
+    state = {"query": query, "direction": direction, "position": page[limit][0]}
+    return [flight for _, flight in page[:limit]], base64.urlsafe_b64encode(json.dumps(state).encode("utf-8")).decode("ascii")
+
+
+def _ancillary_lines(items, booking=None):
+    """Price ancillary items into ledger line tuples, raising InvalidRequest listing every bad item"""
+    lines, errors = [], []
+    for index, item in enumerate(items):
+        code, quantity, passenger_index = item.get("code"), item.get("quantity", 1), item.get("passenger")
+        if code not in ANCILLARIES:
+            errors.append(f"Item {index + 1}: unknown service {code!r}")
+        elif not isinstance(quantity, int) or quantity < 1:
+            errors.append(f"Item {index + 1}: quantity must be a positive whole number")
+        elif passenger_index is not None and (not isinstance(passenger_index, int) or booking is not None
+                                              and not 0 <= passenger_index < len(booking.passengers)):
+            errors.append(f"Item {index + 1}: no passenger {passenger_index} on the booking")
+        else:
+            description, amount = price_ancillary(code, quantity)
+            lines.append((code, description, quantity, amount, passenger_index))
+    if not items:
+        errors.append("No services given")
+    if errors:
+        raise InvalidRequest("Invalid ancillary order", errors)
+    return lines
+
+
+def _reserve_cabins(flight_keys, cabin_counts):
+    """Take seats on every flight and cabin, or none of them"""
+    reserved = []
+    for key in flight_keys:
+        for travel_class, count in cabin_counts.items():
+            if not reserve_cabin_seats(key, travel_class, count):
+                for reserved_key, reserved_class, reserved_count in reserved:
+                    release_cabin_seats(reserved_key, reserved_class, reserved_count)
+                CABIN_SOLD_OUT.inc()
+                raise Conflict(f"Not enough {travel_class} seats left on {key[0]}")
+            reserved.append((key, travel_class, count))
+
+
+def _waitlist_entry(entry_id, email):
+    """A waitlist entry, found only with the contact email it was made with
+
+    Entry ids are sequential, so an id alone must not reveal or claim an entry.
+    """
+    entry = waitlist.get_waitlist_entry(entry_id)
+    if entry is None or not isinstance(email, str) or \
+            email.strip().lower() != str(entry.contact.get("email", "")).strip().lower():
+        raise NotFound("Waitlist entry not found")
+    return entry
+
+
+def _check_waitlist_offer(entry_id, email, flight_keys, cabin_counts):
+    """Check a booking may take the seats offered to a waitlist request by the same contact
+
+    The offer is only accepted once the booking is stored (see create).
+    """
+    entry = _waitlist_entry(entry_id, email)
+    if [normalize_key(key) for key in flight_keys] != [entry.flight_key] or cabin_counts != {entry.travel_class: entry.seats}:
+        raise InvalidRequest("The booking does not match the waitlisted flight, cabin and party size")
+    waitlist.expire_offers()
+    if entry.status != "Offered":
+        raise Conflict("The waitlist offer is not open")
+
+
+def _release_cabins(flight_keys, cabin_counts):
+    for key in flight_keys:
+        for travel_class, count in cabin_counts.items():
+            release_cabin_seats(key, travel_class, count)
+
+
+def _cabin_seat_map(flight_key, travel_class):
+    """Seat layout of a flight's cabin, generated once (call with _seats_lock held)
+
+    ``open_order`` lists its seats in a fixed shuffle per cabin, the order
+    in which they are open for sale (see _open_seats).
+    """
+    cabin = (flight_key, travel_class)
+    seat_map = _seat_maps.get(cabin)
+    if seat_map is None:
+        try:
+            flight = get_flight(flight_key)
+        except KeyError:
+            raise NotFound(f"Unknown flight {flight_key[0]} on {flight_key[1]}") from None
+        layout = generate_seat_map(flight.aircraft, travel_class)
+        seat_ids = [seat["seat_id"] for seat in layout["seats"]]
+        seat_map = _seat_maps[cabin] = {
+            **layout, "open_order": random.Random(f"{flight_key}-{travel_class}").sample(seat_ids, len(seat_ids))
+        }
+    return seat_map
+
+
+def _open_seats(cabin, seat_map, now, unsold):
+    """Seat ids open for sale in a cabin with ``unsold`` seats left in the inventory (call with _seats_lock held)
+
+    Held and confirmed seats are taken. Seats held but not yet booked are
+    still counted as unsold, so the rest of the unsold seats are open, taken
+    in the cabin's open order; the others were sold without a seat number or
+    never put on sale. A sale therefore closes one seat and leaves the rest.
+    """
+    holds = _holds.get(cabin, {})
+    live = {seat_id: hold for seat_id, hold in holds.items() if _is_live(hold, now)}
+    pending = sum(1 for _, expiry in live.values() if expiry is not None)
+    free = [seat_id for seat_id in seat_map["open_order"] if seat_id not in live]
+    return set(free[:max(0, unsold - pending)])
+
+
+def _assign_group_seats(cabin, booking, seated, seat_requests, now):
+    """Plan seats for a booking's passengers, all or none (call with _seats_lock held)
+
+    Passengers keep seats they already have; requested seats must be open
+    or already the booking's. The rest are seated together in the first
+    row of open seats with room for all of them, or in the first free seats
+    otherwise, open ones first. Passengers booked without a seat already
+    count as sold, so they may take a seat that is not open.
+    Returns ({passenger index: seat id} for passengers whose seat changes,
+    seats the booking gives up); nothing is held until _confirm_group_seats.
+    """
+    reference = booking.booking_reference
+    seat_map = _cabin_seat_map(*cabin)
+    holds = _holds.setdefault(cabin, {})
+    open_ids = _open_seats(cabin, seat_map, now, cabin_seats_unsold(*cabin))
+    own_ids = {seat_id for seat_id, hold in holds.items() if hold[0] == reference}
+    free = [
+        seat for seat in seat_map["seats"]
+        if seat["seat_id"] not in holds or not _is_live(holds[seat["seat_id"]], now) or seat["seat_id"] in own_ids
+    ]
+    # Open seats first, so the seats shown as sold stay with other passengers where possible
+    free.sort(key=lambda seat: seat["seat_id"] not in open_ids)
+
+    unavailable = [seat_id for seat_id in seat_requests.values() if seat_id not in open_ids | own_ids]
+    if unavailable or len(set(seat_requests.values())) < len(seat_requests):
+        SEAT_HOLD_CONFLICTS.inc()
+        raise Conflict("Seats are no longer available", unavailable)
+
+    kept = {booking.passengers[index].seat for index in seated if index not in seat_requests}
+    unseated = [index for index in seated if index not in seat_requests and not booking.passengers[index].seat]
+    candidates = [seat for seat in free if seat["seat_id"] not in kept and seat["seat_id"] not in seat_requests.values()]
+
+    rows = {}
+    for seat in candidates:
+        if seat["seat_id"] in open_ids:
+            rows.setdefault(seat["row"], []).append(seat["seat_id"])
+    together = next((seat_ids for seat_ids in rows.values() if len(seat_ids) >= len(unseated)), None)
+    chosen = (together or [seat["seat_id"] for seat in candidates])[:len(unseated)]
+    if len(chosen) < len(unseated):
+        CABIN_SOLD_OUT.inc()
+        raise Conflict(f"Not enough free seats left on {cabin[0][0]}")
+
+    # Seats given up for a requested one go back on sale
+    released = [
+        booking.passengers[index].seat for index, seat_id in seat_requests.items()
+        if booking.passengers[index].seat and booking.passengers[index].seat != seat_id
+        and holds.get(booking.passengers[index].seat, (None,))[0] == reference
+    ]
+    return {**seat_requests, **dict(zip(unseated, chosen))}, released
+
+
+def _confirm_group_seats(cabin, reference, seats, released):
+    """Confirm planned seats to a booking and free the ones it gave up (call with _seats_lock held)"""
+    holds = _holds.setdefault(cabin, {})
+    for seat_id in released:
+        holds.pop(seat_id, None)
+    for seat_id in seats.values():
+        holds[seat_id] = (reference, None)
+    if seats or released:
+        _bump_seat_map_version(cabin)
+
+
+def _seat_map_version(cabin, now):
+    """A cabin's seat version, moved on if a hold in its snapshot has lapsed or its unsold seats moved
+
+    Call with _seats_lock held.
+    """
+    snapshot = _seat_map_snapshots.get(cabin)
+    if snapshot is not None and snapshot.version == _seat_map_versions.get(cabin, 0) and (
+            snapshot.valid_until is not None and snapshot.valid_until <= now
+            or _seat_map_unsold.get(cabin) != cabin_seats_unsold(*cabin)):
+        _bump_seat_map_version(cabin)
+    return _seat_map_versions.get(cabin, 0)
+
+
+def _bump_seat_map_version(cabin):
+    """Mark a cabin's seats as changed (call with _seats_lock held)"""
+    _seat_map_versions[cabin] = _seat_map_versions.get(cabin, 0) + 1
+
+
+def _is_live(hold, now):
+    return hold[1] is None or hold[1] > now
+
+
+def _confirm_holds(selected, holder, booking_reference):
+    """Turn a holder's live holds on selected (cabin, seat id) pairs into a booking's seats, all or none
+
+    Raises Conflict if any hold has lapsed or been taken. The holder's other
+    holds on the same cabins are released. Call with _seats_lock held.
+    """
+    now = time.time()
+    lost = [
+        seat_id for cabin, seat_id in selected
+        if _holds.get(cabin, {}).get(seat_id, (None,))[0] != holder or not _is_live(_holds[cabin][seat_id], now)
+    ]
+    if lost:
+        SEAT_HOLD_CONFLICTS.inc()
+        raise Conflict("Seat holds have expired or the seats were taken", lost)
+
+    for cabin in {cabin for cabin, _ in selected}:
+        holds = _holds[cabin]
+        for seat_id, (seat_holder, _) in list(holds.items()):
+            if seat_holder == holder:
+                del holds[seat_id]
+        _bump_seat_map_version(cabin)
+    for cabin, seat_id in selected:
+        _holds[cabin][seat_id] = (booking_reference, None)
+
+
+def _passengers_named(booking, last_name):
+    last_name = last_name.strip().lower()
+    if not last_name:
+        return []
+    return [passenger for passenger in booking.passengers if passenger.last_name.strip().lower() == last_name]
+
+
+# Flights cancelled on the status feed are re-accommodated as they happen
+add_status_listener(_on_status_change)
@@ -1,3 +1,8 @@
+import sys
+import types
+import uuid
+from collections.abc import Mapping
+import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
 
@@ -6,6 +11,10 @@ def initialize_session():
     if 'search_results' not in st.session_state:
         st.session_state.search_results = None
     
+    # Per direction, the page of sorted and filtered results shown
+    if 'result_pages' not in st.session_state:
+        st.session_state.result_pages = {}
+    
     if 'selected_flights' not in st.session_state:
         st.session_state.selected_flights = {}
     
@@ -21,6 +30,18 @@ def initialize_session():
     if 'seat_selections' not in st.session_state:
         st.session_state.seat_selections = {}
     
+    # Seat map snapshots by (flight key, cabin), refreshed when their version changes
+    if 'seat_maps' not in st.session_state:
+        st.session_state.seat_maps = {}
+    
+    # Ids of the waitlist requests made in this session, claimed once seats are offered
+    if 'waitlist_entries' not in st.session_state:
+        st.session_state.waitlist_entries = []
+    
+    # Identifies this session's seat holds in the shared seat inventory
+    if 'hold_id' not in st.session_state:
+        st.session_state.hold_id = uuid.uuid4().hex
+    
     if 'search_params' not in st.session_state:
         st.session_state.search_params = {
             'origin': 'Nairobi',
@@ -37,6 +58,7 @@ def initialize_session():
 def reset_booking_flow():
     """Reset booking flow session state"""
     st.session_state.search_results = None
+    st.session_state.result_pages = {}
     st.session_state.selected_flights = {}
     st.session_state.passengers = []
     st.session_state.booking_data = {}
@@ -55,3 +77,42 @@ def save_search_params(params):
 def get_search_params():
     """Get current search parameters"""
     return st.session_state.search_params
+
+def get_session_state_size():
+    """Get the approximate memory held by this session's state, in bytes per key"""
+    seen = set()
+    sizes = {key: _deep_sizeof(value, seen) for key, value in st.session_state.to_dict().items()}
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+def _deep_sizeof(value, seen):
+    """Size of an object plus everything it references that was not already counted
+
+    Walks containers and mappings, the fields of slotted records and the
+    attributes of other instances; numpy arrays count their data buffer.
+    """
+    if id(value) in seen or isinstance(value, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+        return 0
+    seen.add(id(value))
+    
+    size = sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        # A view's buffer is not included in its own getsizeof
+        if not value.flags.owndata:
+            size += value.nbytes
+        if value.dtype == object:
+            size += sum(_deep_sizeof(item, seen) for item in value.flat)
+    elif isinstance(value, Mapping):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in value)
+    elif not isinstance(value, (str, bytes, int, float, complex, bool)):
+        for cls in type(value).__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name not in ('__dict__', '__weakref__'):
+                    size += _deep_sizeof(getattr(value, name, None), seen)
+        if hasattr(value, '__dict__'):
+            size += _deep_sizeof(vars(value), seen)
+    
+    return size